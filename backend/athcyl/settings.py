@@ -153,9 +153,52 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # Configuración para subida de archivos
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB
+# Los archivos de más de 2.5 MB se escriben en un archivo temporal en lugar de en memoria
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(int(2.5 * 1024 * 1024))))
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('DATA_UPLOAD_MAX_MEMORY_SIZE', str(10 * 1024 * 1024)))  # 10 MB (sin contar archivos)
 FILE_UPLOAD_PERMISSIONS = 0o644  # Permisos de archivos subido
+# Manejadores de subida que calculan el SHA-256 del archivo mientras llega
+FILE_UPLOAD_HANDLERS = [
+    'trainings.uploads.HashingMemoryFileUploadHandler',
+    'trainings.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# CONFIGURACIÓN DE INGESTA DE ARCHIVOS DE ENTRENAMIENTO
+# Número de puntos de ruta que se insertan en cada bulk_create
+TRACKPOINT_BATCH_SIZE = int(os.getenv('TRACKPOINT_BATCH_SIZE', '2000'))
+# En PostgreSQL, cargar los puntos con COPY en lugar de bulk_create
+TRACKPOINT_USE_COPY = os.getenv('TRACKPOINT_USE_COPY', 'True').lower() == 'true'
+
+# Procesar los archivos subidos en segundo plano (manage.py run_processing_worker)
+TRAINING_ASYNC_PROCESSING = os.getenv('TRAINING_ASYNC_PROCESSING', 'True').lower() == 'true'
+# Intentos por trabajo, segundos de reserva de un trabajo y retraso base entre reintentos
+PROCESSING_JOB_MAX_ATTEMPTS = int(os.getenv('PROCESSING_JOB_MAX_ATTEMPTS', '3'))
+PROCESSING_JOB_LEASE_SECONDS = int(os.getenv('PROCESSING_JOB_LEASE_SECONDS', '600'))
+PROCESSING_JOB_RETRY_DELAY = int(os.getenv('PROCESSING_JOB_RETRY_DELAY', '30'))
+# Si un archivo ya subido se repite, reutilizar el archivo guardado en lugar de otra copia
+TRAINING_DEDUP_REUSE_FILE = os.getenv('TRAINING_DEDUP_REUSE_FILE', 'True').lower() == 'true'
+# Subidas por fragmentos (reanudables): tamaño máximo de fragmento y de archivo,
+# vida de una subida sin terminar y carpeta donde se van escribiendo los fragmentos
+TRAINING_UPLOAD_CHUNK_SIZE = int(os.getenv('TRAINING_UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+TRAINING_UPLOAD_MAX_SIZE = int(os.getenv('TRAINING_UPLOAD_MAX_SIZE', str(200 * 1024 * 1024)))
+TRAINING_UPLOAD_SESSION_TTL = int(os.getenv('TRAINING_UPLOAD_SESSION_TTL', str(24 * 60 * 60)))
+TRAINING_UPLOAD_STAGING_DIR = os.getenv('TRAINING_UPLOAD_STAGING_DIR', str(BASE_DIR / 'uploads_staging'))
+# Importación de archivos zip: procesos en paralelo del worker y máximo de actividades por zip
+TRAINING_ARCHIVE_IMPORT_WORKERS = int(os.getenv('TRAINING_ARCHIVE_IMPORT_WORKERS', '4'))
+TRAINING_ARCHIVE_MAX_MEMBERS = int(os.getenv('TRAINING_ARCHIVE_MAX_MEMBERS', '10000'))
+# Previsualizaciones de archivos (upload_and_process): vida del token, tamaño máximo de los
+# puntos de cada una y de todas juntas, y carpeta compartida por los procesos donde se guardan
+TRAINING_PREVIEW_TIMEOUT = int(os.getenv('TRAINING_PREVIEW_TIMEOUT', '900'))
+TRAINING_PREVIEW_MAX_BYTES = int(os.getenv('TRAINING_PREVIEW_MAX_BYTES', str(16 * 1024 * 1024)))
+TRAINING_PREVIEW_MAX_TOTAL_BYTES = int(os.getenv('TRAINING_PREVIEW_MAX_TOTAL_BYTES', str(256 * 1024 * 1024)))
+TRAINING_PREVIEW_DIR = os.getenv('TRAINING_PREVIEW_DIR', os.path.join(TRAINING_UPLOAD_STAGING_DIR, 'previews'))
+
+# Estadísticas de usuario: aplicar solo la diferencia de cada entrenamiento guardado o
+# eliminado en lugar de recalcularlas completas (reconciliación: manage.py recompute_user_stats)
+USER_STATS_INCREMENTAL = os.getenv('USER_STATS_INCREMENTAL', 'True').lower() == 'true'
+# Las vistas sirven las estadísticas guardadas; si su último recálculo completo tiene
+# más de estos segundos, se recalculan en segundo plano (trabajo refresh_stats)
+USER_STATS_MAX_AGE = int(os.getenv('USER_STATS_MAX_AGE', str(6 * 60 * 60)))
 
 # TIPO DE CLAVE PRIMARIA POR DEFECTO
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
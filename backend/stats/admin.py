@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserStats, ActivitySummary
+from .models import UserStats, ActivityTypeStats, ActivitySummary, TrainingLoadDay
 
 @admin.register(UserStats)
 class UserStatsAdmin(admin.ModelAdmin):
@@ -18,6 +18,24 @@ class UserStatsAdmin(admin.ModelAdmin):
         ('Fechas', {'fields': ('first_training_date', 'last_training_date', 'last_updated')}),
     )
 
+@admin.register(ActivityTypeStats)
+class ActivityTypeStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'activity_type', 'total_trainings', 'total_distance', 'total_duration', 'last_updated')
+    list_filter = ('activity_type',)
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('user', 'activity_type', 'total_trainings', 'total_distance', 'total_duration',
+                      'total_calories', 'avg_distance_per_training', 'avg_duration_per_training',
+                      'avg_speed', 'avg_heart_rate', 'longest_distance', 'longest_duration',
+                      'highest_speed', 'highest_elevation_gain', 'first_training_date',
+                      'last_training_date', 'last_updated')
+    fieldsets = (
+        (None, {'fields': ('user', 'activity_type')}),
+        ('Totales', {'fields': ('total_trainings', 'total_distance', 'total_duration', 'total_calories')}),
+        ('Promedios', {'fields': ('avg_distance_per_training', 'avg_duration_per_training', 'avg_speed', 'avg_heart_rate')}),
+        ('Récords', {'fields': ('longest_distance', 'longest_duration', 'highest_speed', 'highest_elevation_gain')}),
+        ('Fechas', {'fields': ('first_training_date', 'last_training_date', 'last_updated')}),
+    )
+
 @admin.register(ActivitySummary)
 class ActivitySummaryAdmin(admin.ModelAdmin):
     list_display = ('user', 'period_type', 'year', 'month', 'week', 'day', 'training_count', 'total_distance')
@@ -29,5 +47,13 @@ class ActivitySummaryAdmin(admin.ModelAdmin):
         (None, {'fields': ('user', 'period_type')}),
         ('Período', {'fields': ('year', 'month', 'week', 'day', 'start_date', 'end_date')}),
         ('Estadísticas', {'fields': ('training_count', 'total_distance', 'total_duration', 'total_calories')}),
+        ('Zonas de FC', {'fields': ('hr_zone1_seconds', 'hr_zone2_seconds', 'hr_zone3_seconds', 'hr_zone4_seconds', 'hr_zone5_seconds')}),
         ('Metadatos', {'fields': ('created_at', 'updated_at')}),
     )
+
+@admin.register(TrainingLoadDay)
+class TrainingLoadDayAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'load', 'ctl', 'atl', 'tsb')
+    search_fields = ('user__username', 'user__email')
+    date_hierarchy = 'date'
+    readonly_fields = ('user', 'date', 'load', 'ctl', 'atl', 'tsb')
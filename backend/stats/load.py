@@ -0,0 +1,153 @@
+"""
+Curvas de forma física, fatiga y estado de forma (CTL/ATL/TSB).
+
+Cada día la carga del usuario (suma de Training.load_score, ver
+trainings.load) alimenta dos medias exponenciales:
+- CTL (carga crónica, forma física): constante de CTL_DAYS días
+- ATL (carga aguda, fatiga): constante de ATL_DAYS días
+- TSB (estado de forma) = CTL - ATL del día anterior
+
+Los valores de cada día solo dependen del día anterior y de la carga de
+ese día, así que se guardan en TrainingLoadDay y, al crear, modificar o
+eliminar un entrenamiento, solo se recalcula la cola de la serie desde
+su fecha (recompute_training_load, programado desde stats.updates). La
+serie de cualquier rango de fechas sale de los valores guardados con una
+sola consulta (training_load_series).
+"""
+
+import datetime
+import logging
+
+from django.db.models import DateField, Max, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from trainings.models import Training
+
+from .models import TrainingLoadDay
+
+logger = logging.getLogger('stats')
+
+# Constantes de tiempo (días) de las medias exponenciales
+CTL_DAYS = 42
+ATL_DAYS = 7
+
+UN_DIA = datetime.timedelta(days=1)
+
+
+def next_day(ctl, atl, carga):
+    """
+    Valores de un día a partir de los del día anterior y su carga.
+
+    Returns:
+        (ctl, atl, tsb) del día
+    """
+    tsb = ctl - atl
+    ctl += (carga - ctl) / CTL_DAYS
+    atl += (carga - atl) / ATL_DAYS
+    return ctl, atl, tsb
+
+
+def recompute_training_load(user, desde=None, batch_size=1000):
+    """
+    Recalcula la serie de un usuario desde una fecha hasta su último
+    entrenamiento.
+
+    Se parte de los valores guardados del día anterior a desde y se leen
+    las cargas de los días siguientes con una consulta agrupada por fecha;
+    los días anteriores no se tocan. Las filas se escriben con
+    bulk_create(update_conflicts=True) y se eliminan las que sobran (la
+    serie se acorta si se elimina el último entrenamiento).
+
+    Args:
+        desde: primer día afectado (None: toda la serie)
+
+    Returns:
+        int: número de días escritos
+    """
+    semilla = None
+    if desde is not None:
+        semilla = TrainingLoadDay.objects.filter(user=user, date__lt=desde).order_by('-date').first()
+
+    entrenamientos = Training.objects.filter(user=user, date__isnull=False)
+    if semilla is not None:
+        entrenamientos = entrenamientos.filter(date__gt=semilla.date)
+    cargas = dict(
+        entrenamientos.values('date').annotate(carga=Sum('load_score')).order_by().values_list('date', 'carga')
+    )
+
+    if not cargas:
+        # No quedan entrenamientos desde desde: la serie termina en el último que queda
+        sobrantes = TrainingLoadDay.objects.filter(user=user)
+        ultimo = Training.objects.filter(user=user, date__isnull=False).aggregate(ultimo=Max('date'))['ultimo']
+        if ultimo is not None:
+            sobrantes = sobrantes.filter(date__gt=ultimo)
+        sobrantes.delete()
+        return 0
+
+    if semilla is not None:
+        dia, ctl, atl = semilla.date + UN_DIA, semilla.ctl, semilla.atl
+    else:
+        dia, ctl, atl = min(cargas), 0.0, 0.0
+    ultimo = max(cargas)
+
+    dias = []
+    while dia <= ultimo:
+        carga = cargas.get(dia) or 0.0
+        ctl, atl, tsb = next_day(ctl, atl, carga)
+        dias.append(TrainingLoadDay(user=user, date=dia, load=carga, ctl=ctl, atl=atl, tsb=tsb))
+        dia += UN_DIA
+
+    TrainingLoadDay.objects.bulk_create(
+        dias,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['load', 'ctl', 'atl', 'tsb'],
+    )
+    sobrantes = TrainingLoadDay.objects.filter(user=user)
+    if desde is not None:
+        sobrantes = sobrantes.filter(date__gte=min(desde, dias[0].date))
+    sobrantes.exclude(date__gte=dias[0].date, date__lte=ultimo).delete()
+
+    logger.info(f"Carga de entrenamiento del usuario {user.pk} recalculada desde {dias[0].date}: {len(dias)} días")
+    return len(dias)
+
+
+def training_load_series(user, desde, hasta):
+    """
+    Serie diaria de carga, CTL, ATL y TSB entre dos fechas (incluidas).
+
+    Una sola consulta: los días guardados del rango más el último guardado
+    antes de él (subconsulta), del que se parte si el rango empieza en un
+    día sin fila. Los días posteriores al último entrenamiento no se
+    guardan: sus valores se obtienen dejando caer las medias sin carga.
+
+    Returns:
+        lista de dict con date, load, ctl, atl y tsb (uno por día)
+    """
+    anterior = TrainingLoadDay.objects.filter(user=user, date__lte=desde).order_by('-date').values('date')[:1]
+    guardados = TrainingLoadDay.objects.filter(
+        user=user,
+        date__lte=hasta,
+        date__gte=Coalesce(Subquery(anterior), Value(desde), output_field=DateField()),
+    ).order_by('date').values('date', 'load', 'ctl', 'atl', 'tsb')
+    guardados = {fila['date']: fila for fila in guardados}
+
+    serie = []
+    ctl = atl = None
+    dia = min(desde, min(guardados, default=desde))
+    while dia <= hasta:
+        fila = guardados.get(dia)
+        if fila is not None:
+            ctl, atl = fila['ctl'], fila['atl']
+        elif ctl is not None:
+            # Después del último entrenamiento: sin carga
+            ctl, atl, tsb = next_day(ctl, atl, 0.0)
+            fila = {'date': dia, 'load': 0.0, 'ctl': ctl, 'atl': atl, 'tsb': tsb}
+        else:
+            # Antes del primer entrenamiento
+            fila = {'date': dia, 'load': 0.0, 'ctl': 0.0, 'atl': 0.0, 'tsb': 0.0}
+        if dia >= desde:
+            serie.append(fila)
+        dia += UN_DIA
+    return serie
@@ -0,0 +1,57 @@
+"""
+Comando que recalcula por completo la carga de entrenamiento de los usuarios.
+
+Al guardar un entrenamiento se calcula su carga (trainings.load) y la
+serie diaria de forma física y fatiga se actualiza solo desde su fecha
+(stats.load). Este comando rehace ambas desde cero: la carga de cada
+entrenamiento (guardada con bulk_update) y la serie completa de cada
+usuario. Pensado para entrenamientos anteriores a la carga o tras cambiar
+la forma de calcularla.
+
+Uso:
+python manage.py recompute_training_load
+python manage.py recompute_training_load --user 42
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from stats.load import recompute_training_load
+from trainings.load import training_load
+from trainings.models import Training
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la carga de los entrenamientos y la serie diaria de forma física y fatiga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID del usuario (por defecto, todos)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Entrenamientos guardados en cada bulk_update')
+
+    def handle(self, *args, **options):
+        usuarios = get_user_model().objects.filter(trainings__isnull=False).distinct()
+        if options['user']:
+            usuarios = usuarios.filter(pk=options['user'])
+
+        entrenamientos = dias = 0
+        for user in usuarios.iterator():
+            lote = []
+            for training in Training.objects.filter(user=user).order_by('id').iterator(chunk_size=options['batch_size']):
+                # El usuario ya está cargado: evita una consulta por entrenamiento
+                training.user = user
+                carga = training_load(training)
+                if carga != training.load_score:
+                    training.load_score = carga
+                    lote.append(training)
+                if len(lote) >= options['batch_size']:
+                    Training.objects.bulk_update(lote, ['load_score'])
+                    entrenamientos += len(lote)
+                    lote = []
+            if lote:
+                Training.objects.bulk_update(lote, ['load_score'])
+                entrenamientos += len(lote)
+            dias += recompute_training_load(user)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'📈 Carga recalculada: {entrenamientos} entrenamientos actualizados, {dias} días de serie'
+        ))
@@ -0,0 +1,33 @@
+"""
+Comando que recalcula por completo las estadísticas de los usuarios.
+
+Con USER_STATS_INCREMENTAL las estadísticas se mantienen aplicando solo
+la diferencia de cada entrenamiento guardado o eliminado; los cambios que
+no pasan por las señales (queryset.update, cargas directas en la base de
+datos) o el redondeo acumulado pueden desviarlas. Este comando es la
+reconciliación: pensado para ejecutarse periódicamente (cron). Calcula
+todas las estadísticas (también las de cada tipo de actividad) con
+consultas GROUP BY y las guarda con bulk_update
+(UserStats.update_stats_bulk).
+
+Uso:
+python manage.py recompute_user_stats
+python manage.py recompute_user_stats --user 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from stats.models import UserStats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula por completo las estadísticas de los usuarios (reconciliación)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID del usuario (por defecto, todos)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Estadísticas guardadas en cada bulk_update')
+
+    def handle(self, *args, **options):
+        user_ids = [options['user']] if options['user'] else None
+        total = UserStats.update_stats_bulk(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'📊 Estadísticas recalculadas: {total} usuarios con entrenamientos'))
@@ -0,0 +1,55 @@
+"""
+Comando que rehace los resúmenes de actividad de todos los usuarios.
+
+Los resúmenes (diarios, semanales, mensuales y anuales) se mantienen al
+guardar cada entrenamiento; este comando los rehace desde los
+entrenamientos para corregir desviaciones (cambios que no pasan por las
+señales, cargas directas en la base de datos). Los usuarios se procesan
+por grupos: una consulta GROUP BY y un upsert masivo por grupo y tipo de
+período (stats.rollups.rebuild_summaries).
+
+Uso:
+python manage.py regenerate_activity_summaries
+python manage.py regenerate_activity_summaries --user 42 --period weekly --period monthly
+"""
+
+from django.core.management.base import BaseCommand
+
+from stats.models import ActivitySummary
+from stats.rollups import PERIOD_TYPES, rebuild_summaries
+from trainings.models import Training
+
+
+class Command(BaseCommand):
+    help = 'Rehace los resúmenes de actividad desde los entrenamientos, por grupos de usuarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID del usuario (por defecto, todos)')
+        parser.add_argument('--period', action='append', choices=PERIOD_TYPES, help='Tipo de período (repetible; por defecto, todos)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Usuarios por grupo')
+
+    def handle(self, *args, **options):
+        period_types = options['period'] or PERIOD_TYPES
+
+        if options['user']:
+            user_ids = [options['user']]
+        else:
+            # Usuarios con entrenamientos o con resúmenes (que quizá sobren)
+            user_ids = sorted(
+                set(Training.objects.values_list('user_id', flat=True).distinct())
+                | set(ActivitySummary.objects.values_list('user_id', flat=True).distinct())
+            )
+
+        chunk_size = max(1, options['chunk_size'])
+        totales = {'creados': 0, 'actualizados': 0, 'eliminados': 0}
+        for i in range(0, len(user_ids), chunk_size):
+            grupo = user_ids[i:i + chunk_size]
+            resultado = rebuild_summaries(grupo, period_types)
+            for clave, valor in resultado.items():
+                totales[clave] += valor
+            self.stdout.write(f'  {min(i + chunk_size, len(user_ids))}/{len(user_ids)} usuarios')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📅 Resúmenes regenerados: {totales['creados']} creados, "
+            f"{totales['actualizados']} actualizados, {totales['eliminados']} eliminados"
+        ))
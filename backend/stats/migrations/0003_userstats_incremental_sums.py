@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:00
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def rellenar_sumas(apps, schema_editor):
+    """Calcula las sumas de velocidad y ritmo cardíaco de las estadísticas existentes"""
+    UserStats = apps.get_model('stats', 'UserStats')
+    Training = apps.get_model('trainings', 'Training')
+
+    for estadisticas in UserStats.objects.all():
+        entrenamientos = Training.objects.filter(user_id=estadisticas.user_id, date__isnull=False)
+        sumas = entrenamientos.aggregate(
+            speed_sum=Sum('avg_speed', filter=Q(avg_speed__gt=0)),
+            speed_count=Count('id', filter=Q(avg_speed__gt=0)),
+            heart_rate_sum=Sum('avg_heart_rate', filter=Q(avg_heart_rate__gt=0)),
+            heart_rate_count=Count('id', filter=Q(avg_heart_rate__gt=0)),
+        )
+        UserStats.objects.filter(pk=estadisticas.pk).update(
+            **{campo: valor or 0 for campo, valor in sumas.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0002_initial'),
+        ('trainings', '0007_training_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='heart_rate_count',
+            field=models.IntegerField(db_column='entrenamientos_con_ritmo_cardíaco', default=0, help_text='Entrenamientos con ritmo cardíaco promedio', verbose_name='Entrenamientos con ritmo cardíaco'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='heart_rate_sum',
+            field=models.FloatField(db_column='suma_ritmos_cardíacos', default=0, help_text='Suma de los ritmos cardíacos promedio', verbose_name='Suma de ritmos cardíacos'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='speed_count',
+            field=models.IntegerField(db_column='entrenamientos_con_velocidad', default=0, help_text='Entrenamientos con velocidad promedio', verbose_name='Entrenamientos con velocidad'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='speed_sum',
+            field=models.FloatField(db_column='suma_velocidades', default=0, help_text='Suma de las velocidades promedio (km/h)', verbose_name='Suma de velocidades'),
+        ),
+        migrations.RunPython(rellenar_sumas, migrations.RunPython.noop),
+    ]
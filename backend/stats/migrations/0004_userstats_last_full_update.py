@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0003_userstats_incremental_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='last_full_update',
+            field=models.DateTimeField(blank=True, db_column='último_recálculo_completo', null=True, verbose_name='Último recálculo completo'),
+        ),
+    ]
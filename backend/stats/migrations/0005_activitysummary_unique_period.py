@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:00
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+
+def reconstruir_resumenes(apps, schema_editor):
+    """
+    Rehace todos los resúmenes desde los entrenamientos.
+
+    Elimina los duplicados que permitía unique_together (los campos vacíos
+    no cuentan en la unicidad) y crea los semanales, mensuales y anuales
+    que faltaban: a partir de ahora se mantienen aplicando diferencias,
+    así que tienen que partir de valores correctos.
+    """
+    ActivitySummary = apps.get_model('stats', 'ActivitySummary')
+    Training = apps.get_model('trainings', 'Training')
+
+    ActivitySummary.objects.all().delete()
+
+    periodos = {
+        'daily': TruncDay('date'),
+        'weekly': TruncWeek('date'),
+        'monthly': TruncMonth('date'),
+        'yearly': TruncYear('date'),
+    }
+    for period_type, trunc in periodos.items():
+        grupos = Training.objects.filter(date__isnull=False).annotate(
+            inicio=trunc,
+        ).values('user_id', 'inicio').annotate(
+            training_count=Count('id'),
+            total_distance=Sum('distance'),
+            total_duration=Sum('duration'),
+            total_calories=Sum('calories'),
+        ).order_by()
+
+        resumenes = []
+        for grupo in grupos.iterator():
+            inicio = grupo['inicio']
+            if isinstance(inicio, datetime.datetime):
+                inicio = inicio.date()
+            if period_type == 'daily':
+                fin, campos = inicio, {'year': inicio.year, 'month': inicio.month, 'day': inicio.day}
+            elif period_type == 'weekly':
+                año_iso, semana, _ = inicio.isocalendar()
+                fin, campos = inicio + datetime.timedelta(days=6), {'year': año_iso, 'week': semana}
+            elif period_type == 'monthly':
+                siguiente = (inicio + datetime.timedelta(days=32)).replace(day=1)
+                fin, campos = siguiente - datetime.timedelta(days=1), {'year': inicio.year, 'month': inicio.month}
+            else:
+                fin, campos = datetime.date(inicio.year, 12, 31), {'year': inicio.year}
+            resumenes.append(ActivitySummary(
+                user_id=grupo['user_id'],
+                period_type=period_type,
+                start_date=inicio,
+                end_date=fin,
+                training_count=grupo['training_count'],
+                total_distance=grupo['total_distance'] or 0,
+                total_duration=grupo['total_duration'] or datetime.timedelta(0),
+                total_calories=grupo['total_calories'] or 0,
+                **campos,
+            ))
+        ActivitySummary.objects.bulk_create(resumenes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0004_userstats_last_full_update'),
+        ('trainings', '0008_alter_processingjob_kind'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='activitysummary',
+            unique_together=set(),
+        ),
+        migrations.RunPython(reconstruir_resumenes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activitysummary',
+            constraint=models.UniqueConstraint(fields=('user', 'period_type', 'start_date'), name='resumen_unico_por_periodo'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:00
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+import django.db.models.deletion
+
+
+def rellenar_estadisticas_por_tipo(apps, schema_editor):
+    """Calcula las estadísticas por tipo de actividad de los entrenamientos existentes (un GROUP BY)"""
+    ActivityTypeStats = apps.get_model('stats', 'ActivityTypeStats')
+    Training = apps.get_model('trainings', 'Training')
+
+    grupos = Training.objects.filter(date__isnull=False).order_by().values('user', 'activity_type').annotate(
+        total_trainings=Count('id'),
+        total_distance=Sum('distance'),
+        total_duration=Sum('duration'),
+        total_calories=Sum('calories'),
+        speed_sum=Sum('avg_speed', filter=Q(avg_speed__gt=0)),
+        speed_count=Count('id', filter=Q(avg_speed__gt=0)),
+        heart_rate_sum=Sum('avg_heart_rate', filter=Q(avg_heart_rate__gt=0)),
+        heart_rate_count=Count('id', filter=Q(avg_heart_rate__gt=0)),
+        longest_distance=Max('distance'),
+        longest_duration=Max('duration'),
+        highest_speed=Max('max_speed'),
+        highest_elevation_gain=Max('elevation_gain'),
+        first_training_date=Min('date'),
+        last_training_date=Max('date'),
+    )
+
+    lote = []
+    for valores in grupos.iterator(chunk_size=1000):
+        user_id = valores.pop('user')
+        campos = {campo: valor for campo, valor in valores.items() if valor is not None}
+        estadisticas = ActivityTypeStats(user_id=user_id, **campos)
+        total = estadisticas.total_trainings
+        estadisticas.avg_distance_per_training = estadisticas.total_distance / total
+        estadisticas.avg_duration_per_training = estadisticas.total_duration / total
+        estadisticas.avg_speed = estadisticas.speed_sum / estadisticas.speed_count if estadisticas.speed_count else 0
+        estadisticas.avg_heart_rate = estadisticas.heart_rate_sum / estadisticas.heart_rate_count if estadisticas.heart_rate_count else 0
+        lote.append(estadisticas)
+        if len(lote) >= 1000:
+            ActivityTypeStats.objects.bulk_create(lote)
+            lote = []
+    ActivityTypeStats.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stats', '0005_activitysummary_unique_period'),
+        ('trainings', '0008_alter_processingjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityTypeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_trainings', models.IntegerField(db_column='total_entrenamientos', default=0, verbose_name='Total de entrenamientos')),
+                ('total_distance', models.FloatField(db_column='distancia_total', default=0, help_text='Distancia total en kilómetros', verbose_name='Distancia total')),
+                ('total_duration', models.DurationField(db_column='duracion_total', default=datetime.timedelta(0), verbose_name='Duración total')),
+                ('total_calories', models.IntegerField(db_column='calorías_total', default=0, verbose_name='Total de calorías')),
+                ('avg_distance_per_training', models.FloatField(db_column='distancia_promedio_por_entrenamiento', default=0, help_text='Distancia promedio por entrenamiento en km', verbose_name='Distancia promedio')),
+                ('avg_duration_per_training', models.DurationField(db_column='duracion_promedio_por_entrenamiento', default=datetime.timedelta(0), verbose_name='Duración promedio')),
+                ('avg_speed', models.FloatField(db_column='velocidad_promedio', default=0, help_text='Velocidad promedio en km/h', verbose_name='Velocidad promedio')),
+                ('avg_heart_rate', models.FloatField(db_column='ritmo_cardíaco_promedio', default=0, help_text='Ritmo cardíaco promedio', verbose_name='Ritmo cardíaco promedio')),
+                ('speed_sum', models.FloatField(db_column='suma_velocidades', default=0, help_text='Suma de las velocidades promedio (km/h)', verbose_name='Suma de velocidades')),
+                ('speed_count', models.IntegerField(db_column='entrenamientos_con_velocidad', default=0, help_text='Entrenamientos con velocidad promedio', verbose_name='Entrenamientos con velocidad')),
+                ('heart_rate_sum', models.FloatField(db_column='suma_ritmos_cardíacos', default=0, help_text='Suma de los ritmos cardíacos promedio', verbose_name='Suma de ritmos cardíacos')),
+                ('heart_rate_count', models.IntegerField(db_column='entrenamientos_con_ritmo_cardíaco', default=0, help_text='Entrenamientos con ritmo cardíaco promedio', verbose_name='Entrenamientos con ritmo cardíaco')),
+                ('longest_distance', models.FloatField(db_column='distancia_más_larga', default=0, help_text='Distancia más larga en km', verbose_name='Distancia más larga')),
+                ('longest_duration', models.DurationField(db_column='duracion_más_larga', default=datetime.timedelta(0), verbose_name='Duración más larga')),
+                ('highest_speed', models.FloatField(db_column='velocidad_más_alta', default=0, help_text='Velocidad más alta en km/h', verbose_name='Velocidad más alta')),
+                ('highest_elevation_gain', models.FloatField(db_column='mayor_desnivel', default=0, help_text='Mayor ganancia de elevación en metros', verbose_name='Mayor desnivel')),
+                ('first_training_date', models.DateField(blank=True, db_column='fecha_del_primer_entrenamiento', null=True, verbose_name='Fecha del primer entrenamiento')),
+                ('last_training_date', models.DateField(blank=True, db_column='fecha_del_último_entrenamiento', null=True, verbose_name='Fecha del último entrenamiento')),
+                ('last_updated', models.DateTimeField(auto_now=True, db_column='última_actualización', verbose_name='Última actualización')),
+                ('last_full_update', models.DateTimeField(blank=True, db_column='último_recálculo_completo', null=True, verbose_name='Último recálculo completo')),
+                ('activity_type', models.CharField(db_column='tipo_de_actividad', max_length=20, verbose_name='Tipo de actividad')),
+                ('user', models.ForeignKey(db_column='usuario', on_delete=django.db.models.deletion.CASCADE, related_name='activity_type_stats', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Estadísticas por tipo de actividad',
+                'verbose_name_plural': 'Estadísticas por tipo de actividad',
+                'db_table': 'estadisticas_por_tipo_actividad',
+                'ordering': ['-total_trainings'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activitytypestats',
+            constraint=models.UniqueConstraint(fields=('user', 'activity_type'), name='estadisticas_unicas_por_tipo'),
+        ),
+        migrations.RunPython(rellenar_estadisticas_por_tipo, migrations.RunPython.noop),
+    ]
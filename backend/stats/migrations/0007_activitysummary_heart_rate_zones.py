@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0006_activitytypestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitysummary',
+            name='hr_zone1_seconds',
+            field=models.FloatField(default=0, help_text='Segundos en zona 1', verbose_name='Tiempo en zona 1'),
+        ),
+        migrations.AddField(
+            model_name='activitysummary',
+            name='hr_zone2_seconds',
+            field=models.FloatField(default=0, help_text='Segundos en zona 2', verbose_name='Tiempo en zona 2'),
+        ),
+        migrations.AddField(
+            model_name='activitysummary',
+            name='hr_zone3_seconds',
+            field=models.FloatField(default=0, help_text='Segundos en zona 3', verbose_name='Tiempo en zona 3'),
+        ),
+        migrations.AddField(
+            model_name='activitysummary',
+            name='hr_zone4_seconds',
+            field=models.FloatField(default=0, help_text='Segundos en zona 4', verbose_name='Tiempo en zona 4'),
+        ),
+        migrations.AddField(
+            model_name='activitysummary',
+            name='hr_zone5_seconds',
+            field=models.FloatField(default=0, help_text='Segundos en zona 5', verbose_name='Tiempo en zona 5'),
+        ),
+    ]
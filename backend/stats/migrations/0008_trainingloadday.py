@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stats', '0007_activitysummary_heart_rate_zones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingLoadDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('load', models.FloatField(default=0, help_text='Suma de la carga (TRIMP) de los entrenamientos del día', verbose_name='Carga')),
+                ('ctl', models.FloatField(default=0, help_text='Carga crónica (forma física, media exponencial de 42 días)', verbose_name='CTL')),
+                ('atl', models.FloatField(default=0, help_text='Carga aguda (fatiga, media exponencial de 7 días)', verbose_name='ATL')),
+                ('tsb', models.FloatField(default=0, help_text='Estado de forma: CTL - ATL del día anterior', verbose_name='TSB')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_load_days', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Carga de entrenamiento diaria',
+                'verbose_name_plural': 'Cargas de entrenamiento diarias',
+                'db_table': 'carga_entrenamiento_diaria',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trainingloadday',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='carga_unica_por_dia'),
+        ),
+    ]
@@ -3,30 +3,72 @@ Modelos para el seguimiento de estadísticas de entrenamiento.
 
 Este módulo define los modelos para almacenar y calcular:
 - Estadísticas globales de entrenamiento por usuario
+- Estadísticas de cada usuario por tipo de actividad
 - Resúmenes de actividad por períodos (diario, semanal, mensual, anual)
+- Carga de entrenamiento diaria con sus curvas de forma física y fatiga
 
 Autor: Juan Manuel Ordás Periscal
 Fecha: Mayo 2025
 """
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
 from users.models import User
+from trainings.models import HR_ZONE_FIELDS
 import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-class UserStats(models.Model):
+# Segundos tras los que las estadísticas se consideran desactualizadas (si no se configura USER_STATS_MAX_AGE)
+DEFAULT_STATS_MAX_AGE = 6 * 60 * 60
+
+# Campos de Training de los que dependen las estadísticas y los resúmenes del usuario
+STATS_SOURCE_FIELDS = (
+    'user_id', 'date', 'distance', 'duration', 'calories',
+    'avg_speed', 'avg_heart_rate', 'max_speed', 'elevation_gain',
+    'activity_type', 'load_score',
+) + HR_ZONE_FIELDS
+
+# Récords: campo de UserStats -> (campo de Training, True si es el máximo y False si es el mínimo)
+STATS_RECORD_FIELDS = {
+    'longest_distance': ('distance', True),
+    'longest_duration': ('duration', True),
+    'highest_speed': ('max_speed', True),
+    'highest_elevation_gain': ('elevation_gain', True),
+    'first_training_date': ('date', False),
+    'last_training_date': ('date', True),
+}
+
+# Campos de UserStats calculados a partir de los entrenamientos
+STATS_COMPUTED_FIELDS = (
+    'total_trainings', 'total_distance', 'total_duration', 'total_calories',
+    'avg_distance_per_training', 'avg_duration_per_training', 'avg_speed', 'avg_heart_rate',
+    'speed_sum', 'speed_count', 'heart_rate_sum', 'heart_rate_count',
+    'longest_distance', 'longest_duration', 'highest_speed', 'highest_elevation_gain',
+    'first_training_date', 'last_training_date',
+)
+
+# Valor de un récord cuando no hay entrenamientos
+STATS_RECORD_DEFAULTS = {
+    'longest_distance': 0,
+    'longest_duration': datetime.timedelta(0),
+    'highest_speed': 0,
+    'highest_elevation_gain': 0,
+    'first_training_date': None,
+    'last_training_date': None,
+}
+
+class TrainingStats(models.Model):
     """
-    Modelo para almacenar estadísticas agregadas del usuario.
+    Base de las estadísticas agregadas de un conjunto de entrenamientos.
     
-    Contiene métricas totales, promedios y récords basados
-    en todos los entrenamientos del usuario.
+    Contiene métricas totales, promedios y récords; cada subclase indica
+    de qué entrenamientos se calculan (training_filter).
     """
     
-    # Relación con el usuario (one-to-one)
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats', verbose_name="Usuario", db_column="usuario")
-    
     # Estadísticas totales
     total_trainings = models.IntegerField(default=0, verbose_name="Total de entrenamientos", db_column="total_entrenamientos")
     total_distance = models.FloatField(default=0, help_text="Distancia total en kilómetros", verbose_name="Distancia total", db_column="distancia_total")
@@ -39,6 +81,12 @@ class UserStats(models.Model):
     avg_speed = models.FloatField(default=0, help_text="Velocidad promedio en km/h", verbose_name="Velocidad promedio", db_column="velocidad_promedio")
     avg_heart_rate = models.FloatField(default=0, help_text="Ritmo cardíaco promedio", verbose_name="Ritmo cardíaco promedio", db_column="ritmo_cardíaco_promedio")
     
+    # Sumas para mantener los promedios de forma incremental
+    speed_sum = models.FloatField(default=0, help_text="Suma de las velocidades promedio (km/h)", verbose_name="Suma de velocidades", db_column="suma_velocidades")
+    speed_count = models.IntegerField(default=0, help_text="Entrenamientos con velocidad promedio", verbose_name="Entrenamientos con velocidad", db_column="entrenamientos_con_velocidad")
+    heart_rate_sum = models.FloatField(default=0, help_text="Suma de los ritmos cardíacos promedio", verbose_name="Suma de ritmos cardíacos", db_column="suma_ritmos_cardíacos")
+    heart_rate_count = models.IntegerField(default=0, help_text="Entrenamientos con ritmo cardíaco promedio", verbose_name="Entrenamientos con ritmo cardíaco", db_column="entrenamientos_con_ritmo_cardíaco")
+    
     # Récords
     longest_distance = models.FloatField(default=0, help_text="Distancia más larga en km", verbose_name="Distancia más larga", db_column="distancia_más_larga")
     longest_duration = models.DurationField(default=datetime.timedelta(0), verbose_name="Duración más larga", db_column="duracion_más_larga")
@@ -51,140 +99,137 @@ class UserStats(models.Model):
     
     # Metadatos
     last_updated = models.DateTimeField(auto_now=True, verbose_name="Última actualización", db_column="última_actualización")
+    # Último recálculo completo (los cambios incrementales no lo actualizan)
+    last_full_update = models.DateTimeField(blank=True, null=True, verbose_name="Último recálculo completo", db_column="último_recálculo_completo")
     
-    def __str__(self):
-        """Representación en texto del objeto"""
-        return f"Estadísticas de {self.user.username}"
+    def is_stale(self, max_age=None):
+        """
+        Indica si las estadísticas deberían recalcularse por completo: nunca
+        se han calculado así o el último recálculo es más antiguo que
+        USER_STATS_MAX_AGE segundos (entre recálculos se mantienen con
+        cambios incrementales, que pueden desviarse).
+        """
+        if self.last_full_update is None:
+            return True
+        if max_age is None:
+            max_age = getattr(settings, 'USER_STATS_MAX_AGE', DEFAULT_STATS_MAX_AGE)
+        return timezone.now() - self.last_full_update > datetime.timedelta(seconds=max_age)
     
     def update_stats(self):
         """
         Actualiza todas las estadísticas basadas en los entrenamientos del usuario.
         
-        Este método recalcula todas las métricas a partir de los entrenamientos
-        actuales del usuario, asegurando que las estadísticas estén siempre actualizadas.
+        Totales, sumas, récords y fechas salen de una sola consulta
+        aggregate() calculada por la base de datos (no se lee ningún
+        entrenamiento); los promedios se derivan de esos totales.
         """
-        logger.info(f"Actualizando estadísticas para el usuario {self.user.username}...")
+        logger.info(f"Actualizando estadísticas para el usuario {self.user_id}...")
         
         # Importar aquí para evitar importación circular
         from trainings.models import Training
         
-        # Obtener todos los entrenamientos del usuario que tengan datos válidos
-        entrenamientos = Training.objects.filter(user=self.user).exclude(
-            date__isnull=True
+        valores = Training.objects.filter(**self.training_filter(), date__isnull=False).aggregate(
+            **self.aggregate_expressions()
         )
-        cantidad = entrenamientos.count()
-        
-        if cantidad == 0:
-            # No hay entrenamientos, reiniciar estadísticas
-            logger.info("El usuario no tiene entrenamientos, reiniciando estadísticas.")
-            self._reset_stats()
-            self.save()
-            return
-        
-        logger.info(f"Encontrados {cantidad} entrenamientos.")
-        
-        # Variables para calcular totales
-        distancia_total = 0
-        segundos_totales = 0
-        calorias_totales = 0
-        
-        # Listas para calcular promedios
-        distancias = []
-        duraciones = []
-        velocidades = []
-        ritmos_cardiacos = []
+        self._apply_aggregates(valores)
+        self.last_full_update = timezone.now()
+        self.save()
+        logger.info(f"Estadísticas actualizadas correctamente para el usuario {self.user_id} ({self.total_trainings} entrenamientos).")
+    
+    @staticmethod
+    def aggregate_expressions():
+        """
+        Expresiones de agregación de las estadísticas sobre los entrenamientos
+        con fecha (igual en aggregate() para un usuario y en annotate() por usuario).
+        """
+        return {
+            'total_trainings': Count('id'),
+            'total_distance': Sum('distance'),
+            'total_duration': Sum('duration'),
+            'total_calories': Sum('calories'),
+            # Como antes, las velocidades y ritmos vacíos o a cero no cuentan en el promedio
+            'speed_sum': Sum('avg_speed', filter=Q(avg_speed__gt=0)),
+            'speed_count': Count('id', filter=Q(avg_speed__gt=0)),
+            'heart_rate_sum': Sum('avg_heart_rate', filter=Q(avg_heart_rate__gt=0)),
+            'heart_rate_count': Count('id', filter=Q(avg_heart_rate__gt=0)),
+            'longest_distance': Max('distance'),
+            'longest_duration': Max('duration'),
+            'highest_speed': Max('max_speed'),
+            'highest_elevation_gain': Max('elevation_gain'),
+            'first_training_date': Min('date'),
+            'last_training_date': Max('date'),
+        }
+    
+    def _apply_aggregates(self, valores):
+        """Copia los valores de aggregate_expressions y deriva los promedios"""
+        self._reset_stats()
+        for campo in self.aggregate_expressions():
+            if valores.get(campo) is not None:
+                setattr(self, campo, valores[campo])
+        self._update_averages()
+    
+    @classmethod
+    def apply_change(cls, user, change, **lookup):
+        """
+        Aplica de forma incremental el cambio de uno o varios entrenamientos
+        (ver stats.updates.StatsChange) sin recorrer el resto.
         
-        # Variables para récords
-        distancia_maxima = 0
-        duracion_maxima = datetime.timedelta(0)
-        velocidad_maxima = 0
-        desnivel_maximo = 0
+        Los totales y las sumas se actualizan con expresiones F() en una
+        sola sentencia UPDATE (atómica frente a otros cambios simultáneos).
+        Un récord solo se vuelve a consultar (top-1 sobre un índice) si el
+        entrenamiento que lo tenía ha empeorado o se ha eliminado; si no,
+        basta con compararlo con los valores nuevos.
         
-        # Fechas de los entrenamientos
-        fechas = []
+        La reconciliación es update_stats (comando recompute_user_stats).
         
-        # Procesar cada entrenamiento
-        for entrenamiento in entrenamientos:
-            # Distancia
-            if entrenamiento.distance:
-                distancia_total += entrenamiento.distance
-                distancias.append(entrenamiento.distance)
-                # Actualizar récord si es necesario
-                if entrenamiento.distance > distancia_maxima:
-                    distancia_maxima = entrenamiento.distance
-            
-            # Duración
-            if entrenamiento.duration:
-                segundos_totales += entrenamiento.duration.total_seconds()
-                duraciones.append(entrenamiento.duration)
-                # Actualizar récord si es necesario
-                if entrenamiento.duration > duracion_maxima:
-                    duracion_maxima = entrenamiento.duration
-            
-            # Calorías
-            if entrenamiento.calories:
-                calorias_totales += entrenamiento.calories
-            
-            # Velocidad
-            if entrenamiento.avg_speed:
-                velocidades.append(entrenamiento.avg_speed)
-            
-            # Velocidad máxima (récord)
-            if entrenamiento.max_speed and entrenamiento.max_speed > velocidad_maxima:
-                velocidad_maxima = entrenamiento.max_speed
-            
-            # Ritmo cardíaco
-            if entrenamiento.avg_heart_rate:
-                ritmos_cardiacos.append(entrenamiento.avg_heart_rate)
-            
-            # Elevación (desnivel)
-            if entrenamiento.elevation_gain and entrenamiento.elevation_gain > desnivel_maximo:
-                desnivel_maximo = entrenamiento.elevation_gain
-            
-            # Fecha
-            if entrenamiento.date:
-                fechas.append(entrenamiento.date)
+        Args:
+            lookup: filtros adicionales que identifican la fila (activity_type)
         
-        # Actualizar totales
-        self.total_trainings = cantidad
-        self.total_distance = distancia_total
-        self.total_duration = datetime.timedelta(seconds=segundos_totales)
-        self.total_calories = calorias_totales
+        Returns:
+            False si el usuario aún no tiene estadísticas (hay que calcularlas completas)
+        """
+        with transaction.atomic():
+            cambios = {field: F(field) + value for field, value in change.delta.items()}
+            # update() no aplica auto_now
+            cambios['last_updated'] = timezone.now()
+            # El UPDATE bloquea la fila hasta el final de la transacción
+            if not cls.objects.filter(user=user, **lookup).update(**cambios):
+                return False
+            estadisticas = cls.objects.get(user=user, **lookup)
+            estadisticas._apply_records(change)
+            estadisticas._update_averages()
+            estadisticas.save()
+        return True
+    
+    def _apply_records(self, change):
+        """Actualiza los récords afectados por un cambio incremental"""
+        from trainings.models import Training
         
-        # Actualizar promedios
-        if cantidad > 0:
-            self.avg_distance_per_training = distancia_total / cantidad
-            self.avg_duration_per_training = datetime.timedelta(seconds=segundos_totales / cantidad)
-        else:
-            self.avg_distance_per_training = 0
-            self.avg_duration_per_training = datetime.timedelta(0)
+        for record, (source, maximo) in STATS_RECORD_FIELDS.items():
+            actual = getattr(self, record)
+            perdido = change.lost.get(record)
+            if perdido is not None and actual is not None and (perdido >= actual if maximo else perdido <= actual):
+                # El entrenamiento que tenía el récord ha cambiado o ya no está
+                filtros = {**self.training_filter(), 'date__isnull': False, f'{source}__isnull': False}
+                valor = Training.objects.filter(**filtros).order_by(f'-{source}' if maximo else source).values_list(source, flat=True).first()
+                setattr(self, record, valor if valor is not None else STATS_RECORD_DEFAULTS[record])
+                continue
             
-        if velocidades:
-            self.avg_speed = sum(velocidades) / len(velocidades)
-        else:
-            self.avg_speed = 0
-            
-        if ritmos_cardiacos:
-            self.avg_heart_rate = sum(ritmos_cardiacos) / len(ritmos_cardiacos)
-        else:
-            self.avg_heart_rate = 0
-        
-        # Actualizar récords
-        self.longest_distance = distancia_maxima
-        self.longest_duration = duracion_maxima
-        self.highest_speed = velocidad_maxima
-        self.highest_elevation_gain = desnivel_maximo
-        
-        # Actualizar fechas
-        if fechas:
-            self.first_training_date = min(fechas)
-            self.last_training_date = max(fechas)
-        else:
-            self.first_training_date = None
-            self.last_training_date = None
-        
-        self.save()
-        logger.info(f"Estadísticas actualizadas correctamente para {self.user.username}.")
+            candidato = change.candidates.get(record)
+            if candidato is None:
+                continue
+            if actual is None or (candidato > actual if maximo else candidato < actual):
+                setattr(self, record, candidato)
+    
+    def _update_averages(self):
+        """Recalcula los promedios a partir de los totales y las sumas guardadas"""
+        if self.total_trainings <= 0:
+            self._reset_stats()
+            return
+        self.avg_distance_per_training = self.total_distance / self.total_trainings
+        self.avg_duration_per_training = self.total_duration / self.total_trainings
+        self.avg_speed = self.speed_sum / self.speed_count if self.speed_count > 0 else 0
+        self.avg_heart_rate = self.heart_rate_sum / self.heart_rate_count if self.heart_rate_count > 0 else 0
     
     def _reset_stats(self):
         """Reinicia todas las estadísticas a cero"""
@@ -196,6 +241,10 @@ class UserStats(models.Model):
         self.avg_duration_per_training = datetime.timedelta(0)
         self.avg_speed = 0
         self.avg_heart_rate = 0
+        self.speed_sum = 0
+        self.speed_count = 0
+        self.heart_rate_sum = 0
+        self.heart_rate_count = 0
         self.longest_distance = 0
         self.longest_duration = datetime.timedelta(0)
         self.highest_speed = 0
@@ -203,11 +252,211 @@ class UserStats(models.Model):
         self.first_training_date = None
         self.last_training_date = None
     
+    def training_filter(self):
+        """Filtro de los entrenamientos que cuentan en estas estadísticas"""
+        return {'user': self.user_id}
+    
+    class Meta:
+        abstract = True
+
+class UserStats(TrainingStats):
+    """
+    Modelo para almacenar estadísticas agregadas del usuario.
+    
+    Contiene métricas totales, promedios y récords basados
+    en todos los entrenamientos del usuario.
+    """
+    
+    # Relación con el usuario (one-to-one)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats', verbose_name="Usuario", db_column="usuario")
+    
+    def __str__(self):
+        """Representación en texto del objeto"""
+        return f"Estadísticas de {self.user.username}"
+    
+    def update_stats(self):
+        """
+        Actualiza todas las estadísticas del usuario, también las de cada
+        tipo de actividad (ActivityTypeStats).
+        """
+        super().update_stats()
+        ActivityTypeStats.update_stats_bulk([self.user_id])
+    
+    @classmethod
+    def update_stats_bulk(cls, user_ids=None, batch_size=500):
+        """
+        Recalcula las estadísticas de muchos usuarios (reconciliación nocturna).
+        
+        Una sola consulta GROUP BY por usuario sobre los entrenamientos y
+        bulk_update por lotes de estadísticas; las de los usuarios sin
+        entrenamientos con fecha se reinician con un único UPDATE. Las
+        estadísticas por tipo de actividad de esos usuarios se recalculan
+        también (ActivityTypeStats.update_stats_bulk).
+        
+        Args:
+            user_ids: usuarios a recalcular (por defecto, todos)
+        
+        Returns:
+            número de usuarios con entrenamientos recalculados
+        """
+        from trainings.models import Training
+        
+        ActivityTypeStats.update_stats_bulk(user_ids, batch_size=batch_size)
+        
+        entrenamientos = Training.objects.filter(date__isnull=False)
+        estadisticas = cls.objects.all()
+        if user_ids is not None:
+            entrenamientos = entrenamientos.filter(user__in=user_ids)
+            estadisticas = estadisticas.filter(user__in=user_ids)
+        
+        grupos = entrenamientos.order_by().values('user').annotate(**cls.aggregate_expressions())
+        
+        total = 0
+        lote = []
+        for valores in grupos.iterator(chunk_size=batch_size):
+            lote.append(valores)
+            if len(lote) >= batch_size:
+                total += cls._update_group(lote)
+                lote = []
+        if lote:
+            total += cls._update_group(lote)
+        
+        # Usuarios con estadísticas pero sin entrenamientos con fecha
+        vacias = cls()
+        vacias._reset_stats()
+        estadisticas.exclude(user__trainings__date__isnull=False).update(
+            last_updated=timezone.now(),
+            last_full_update=timezone.now(),
+            **{campo: getattr(vacias, campo) for campo in STATS_COMPUTED_FIELDS},
+        )
+        return total
+    
+    @classmethod
+    def _update_group(cls, grupo):
+        """Guarda las estadísticas de un lote de filas del GROUP BY de update_stats_bulk"""
+        existentes = {
+            estadisticas.user_id: estadisticas
+            for estadisticas in cls.objects.filter(user__in=[valores['user'] for valores in grupo])
+        }
+        ahora = timezone.now()
+        actualizar, crear = [], []
+        for valores in grupo:
+            estadisticas = existentes.get(valores['user'])
+            if estadisticas is None:
+                estadisticas = cls(user_id=valores['user'])
+                crear.append(estadisticas)
+            else:
+                actualizar.append(estadisticas)
+            estadisticas._apply_aggregates(valores)
+            estadisticas.last_updated = ahora
+            estadisticas.last_full_update = ahora
+        
+        cls.objects.bulk_update(actualizar, STATS_COMPUTED_FIELDS + ('last_updated', 'last_full_update'))
+        cls.objects.bulk_create(crear)
+        return len(grupo)
+    
     class Meta:
         verbose_name = "Estadísticas de usuario"
         verbose_name_plural = "Estadísticas de usuarios"
         db_table = "estadisticas_usuario"  # Nombre de tabla en español
 
+class ActivityTypeStats(TrainingStats):
+    """
+    Estadísticas de un usuario para un tipo de actividad (correr, ciclismo...).
+    
+    Mismos totales, promedios y récords que UserStats, pero solo con los
+    entrenamientos de ese tipo. Se mantienen igual: con los cambios
+    incrementales de cada entrenamiento y recalculándolas junto con las
+    del usuario. Solo hay fila para los tipos que el usuario ha practicado.
+    """
+    
+    # Relación con el usuario
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_type_stats', verbose_name="Usuario", db_column="usuario")
+    activity_type = models.CharField(max_length=20, verbose_name="Tipo de actividad", db_column="tipo_de_actividad")
+    
+    def __str__(self):
+        """Representación en texto del objeto"""
+        return f"Estadísticas de {self.activity_type} de {self.user.username}"
+    
+    def training_filter(self):
+        """Filtro de los entrenamientos que cuentan en estas estadísticas"""
+        return {'user': self.user_id, 'activity_type': self.activity_type}
+    
+    @classmethod
+    def update_stats_bulk(cls, user_ids=None, batch_size=500):
+        """
+        Recalcula las estadísticas por tipo de actividad de muchos usuarios.
+        
+        Una sola consulta GROUP BY (usuario, tipo de actividad) sobre los
+        entrenamientos con fecha; las filas se guardan por lotes con
+        bulk_update/bulk_create y se eliminan las de los tipos que ya no
+        tienen entrenamientos.
+        
+        Args:
+            user_ids: usuarios a recalcular (por defecto, todos)
+        
+        Returns:
+            número de filas (usuario, tipo de actividad) recalculadas
+        """
+        from trainings.models import Training
+        
+        inicio_ejecucion = timezone.now()
+        entrenamientos = Training.objects.filter(date__isnull=False)
+        estadisticas = cls.objects.all()
+        if user_ids is not None:
+            entrenamientos = entrenamientos.filter(user__in=user_ids)
+            estadisticas = estadisticas.filter(user__in=user_ids)
+        
+        grupos = entrenamientos.order_by().values('user', 'activity_type').annotate(**cls.aggregate_expressions())
+        
+        total = 0
+        lote = []
+        for valores in grupos.iterator(chunk_size=batch_size):
+            lote.append(valores)
+            if len(lote) >= batch_size:
+                total += cls._update_group(lote, inicio_ejecucion)
+                lote = []
+        if lote:
+            total += cls._update_group(lote, inicio_ejecucion)
+        
+        # Tipos de actividad que no se han recalculado: ya no tienen entrenamientos
+        estadisticas.filter(Q(last_full_update__lt=inicio_ejecucion) | Q(last_full_update__isnull=True)).delete()
+        return total
+    
+    @classmethod
+    def _update_group(cls, grupo, ahora):
+        """Guarda las estadísticas de un lote de filas del GROUP BY de update_stats_bulk"""
+        usuarios = {valores['user'] for valores in grupo}
+        existentes = {
+            (estadisticas.user_id, estadisticas.activity_type): estadisticas
+            for estadisticas in cls.objects.filter(user__in=usuarios)
+        }
+        actualizar, crear = [], []
+        for valores in grupo:
+            estadisticas = existentes.get((valores['user'], valores['activity_type']))
+            if estadisticas is None:
+                estadisticas = cls(user_id=valores['user'], activity_type=valores['activity_type'])
+                crear.append(estadisticas)
+            else:
+                actualizar.append(estadisticas)
+            estadisticas._apply_aggregates(valores)
+            estadisticas.last_updated = ahora
+            estadisticas.last_full_update = ahora
+        
+        cls.objects.bulk_update(actualizar, STATS_COMPUTED_FIELDS + ('last_updated', 'last_full_update'))
+        cls.objects.bulk_create(crear)
+        return len(grupo)
+    
+    class Meta:
+        constraints = [
+            # Una fila por usuario y tipo de actividad
+            models.UniqueConstraint(fields=['user', 'activity_type'], name='estadisticas_unicas_por_tipo'),
+        ]
+        ordering = ['-total_trainings']
+        verbose_name = "Estadísticas por tipo de actividad"
+        verbose_name_plural = "Estadísticas por tipo de actividad"
+        db_table = "estadisticas_por_tipo_actividad"  # Nombre de tabla en español
+
 class ActivitySummary(models.Model):
     """
     Modelo para almacenar resúmenes de actividad por período.
@@ -245,12 +494,22 @@ class ActivitySummary(models.Model):
     total_duration = models.DurationField(default=datetime.timedelta(0), verbose_name="Duración total")
     total_calories = models.FloatField(default=0, verbose_name="Calorías totales")
     
+    # Tiempo en cada zona de frecuencia cardíaca
+    hr_zone1_seconds = models.FloatField(default=0, help_text="Segundos en zona 1", verbose_name="Tiempo en zona 1")
+    hr_zone2_seconds = models.FloatField(default=0, help_text="Segundos en zona 2", verbose_name="Tiempo en zona 2")
+    hr_zone3_seconds = models.FloatField(default=0, help_text="Segundos en zona 3", verbose_name="Tiempo en zona 3")
+    hr_zone4_seconds = models.FloatField(default=0, help_text="Segundos en zona 4", verbose_name="Tiempo en zona 4")
+    hr_zone5_seconds = models.FloatField(default=0, help_text="Segundos en zona 5", verbose_name="Tiempo en zona 5")
+    
     # Metadatos
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
     
     class Meta:
-        unique_together = ('user', 'period_type', 'year', 'month', 'week', 'day')
+        constraints = [
+            # Un resumen por usuario y período (la fecha de inicio identifica el período)
+            models.UniqueConstraint(fields=['user', 'period_type', 'start_date'], name='resumen_unico_por_periodo'),
+        ]
         ordering = ['-year', '-month', '-week', '-day']
         verbose_name = "Resumen de actividad"
         verbose_name_plural = "Resúmenes de actividad"
@@ -265,4 +524,35 @@ class ActivitySummary(models.Model):
         elif self.period_type == 'monthly':
             return f"Resumen mensual: {self.month}/{self.year} ({self.user.username})"
         else:  # yearly
-            return f"Resumen anual: {self.year} ({self.user.username})"
\ No newline at end of file
+            return f"Resumen anual: {self.year} ({self.user.username})"
+
+
+class TrainingLoadDay(models.Model):
+    """
+    Carga de entrenamiento de un usuario en un día y sus medias
+    exponenciales (ver stats.load).
+    
+    La serie es continua: hay una fila por cada día entre el primer y el
+    último entrenamiento del usuario, también los días sin entrenar.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='training_load_days', verbose_name="Usuario")
+    date = models.DateField(verbose_name="Fecha")
+    
+    load = models.FloatField(default=0, help_text="Suma de la carga (TRIMP) de los entrenamientos del día", verbose_name="Carga")
+    ctl = models.FloatField(default=0, help_text="Carga crónica (forma física, media exponencial de 42 días)", verbose_name="CTL")
+    atl = models.FloatField(default=0, help_text="Carga aguda (fatiga, media exponencial de 7 días)", verbose_name="ATL")
+    tsb = models.FloatField(default=0, help_text="Estado de forma: CTL - ATL del día anterior", verbose_name="TSB")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='carga_unica_por_dia'),
+        ]
+        ordering = ['date']
+        verbose_name = "Carga de entrenamiento diaria"
+        verbose_name_plural = "Cargas de entrenamiento diarias"
+        db_table = "carga_entrenamiento_diaria"
+    
+    def __str__(self):
+        """Representación en texto de la carga diaria"""
+        return f"Carga {self.date}: {self.load:.0f} (CTL {self.ctl:.1f}, ATL {self.atl:.1f}) ({self.user.username})"
@@ -0,0 +1,87 @@
+"""
+Lectura de las estadísticas del usuario sin recalcularlas en la petición.
+
+Las vistas sirven siempre los valores guardados (UserStats), que se
+mantienen al día con cada entrenamiento (stats.updates). Si están
+desactualizadas (UserStats.is_stale) se devuelven igualmente y se pide un
+recálculo completo en segundo plano (trabajo refresh_stats de la cola de
+trabajos).
+
+Para que muchas peticiones simultáneas no lancen el mismo recálculo
+(single-flight), solo la primera consigue la clave de la caché con
+cache.add; además no se crea el trabajo si ya hay uno pendiente.
+"""
+
+import logging
+
+from django.core.cache import cache
+
+from trainings.processing import async_processing_enabled, enqueue_stats_refresh
+
+from .models import UserStats
+
+logger = logging.getLogger('stats')
+
+# Segundos durante los que no se vuelve a pedir el recálculo de un mismo usuario
+REFRESH_LOCK_SECONDS = 5 * 60
+
+
+def _refresh_key(user):
+    return f"user-stats-refresh:{user.pk}"
+
+
+def request_stats_refresh(user):
+    """
+    Pide el recálculo completo de las estadísticas de un usuario.
+
+    En segundo plano si TRAINING_ASYNC_PROCESSING; si no, en el momento.
+
+    Returns:
+        True si esta llamada ha lanzado el recálculo
+    """
+    if not cache.add(_refresh_key(user), True, REFRESH_LOCK_SECONDS):
+        return False
+
+    if not async_processing_enabled():
+        estadisticas, _ = UserStats.objects.get_or_create(user=user)
+        estadisticas.update_stats()
+        return True
+
+    return enqueue_stats_refresh(user) is not None
+
+
+def get_user_stats(user, refresh=False):
+    """
+    Estadísticas guardadas del usuario, sin recalcularlas.
+
+    Args:
+        refresh: pedir el recálculo aunque no estén desactualizadas
+
+    Returns:
+        (UserStats, dict con la frescura de los datos). Si el usuario aún
+        no tiene estadísticas se devuelven a cero (sin guardar).
+    """
+    estadisticas = UserStats.objects.filter(user=user).first()
+    desactualizadas = estadisticas is None or estadisticas.is_stale()
+
+    actualizando = False
+    if desactualizadas or refresh:
+        lanzado = request_stats_refresh(user)
+        if async_processing_enabled():
+            # Lanzado ahora o por una petición anterior que aún no ha terminado
+            actualizando = True
+        elif lanzado:
+            # Recalculadas en el momento
+            estadisticas = UserStats.objects.get(user=user)
+            desactualizadas = False
+
+    if estadisticas is None:
+        estadisticas = UserStats(user=user)
+
+    frescura = {
+        'actualizado': estadisticas.last_updated,
+        'recalculado': estadisticas.last_full_update,
+        'desactualizadas': desactualizadas,
+        'actualizando': actualizando,
+    }
+    return estadisticas, frescura
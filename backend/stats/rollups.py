@@ -0,0 +1,334 @@
+"""
+Resúmenes de actividad (ActivitySummary) por día, semana ISO, mes y año.
+
+Cada entrenamiento con fecha aporta a cuatro resúmenes: el de su día, el
+de su semana ISO, el de su mes y el de su año. Al crear, modificar (o
+cambiar de fecha) y eliminar un entrenamiento se aplica a esos resúmenes
+solo la diferencia (SummaryChange, apply_summary_change), con expresiones
+F() y sin volver a leer los entrenamientos; los resúmenes que se quedan
+sin entrenamientos se eliminan. Además de los totales se acumula el
+tiempo en cada zona de frecuencia cardíaca (trainings.zones).
+
+Los cambios se aplican al confirmarse la transacción en la que se guardó
+el entrenamiento (stats.updates): los de una transacción o un savepoint
+deshecho se descartan. Si aun así un cambio no cuadra con el resumen
+guardado (no existe o se quedaría con menos de cero entrenamientos), ese
+resumen se recalcula desde los entrenamientos.
+
+Cada resumen se identifica por (usuario, tipo de período, fecha de inicio).
+recompute_summaries recalcula desde los entrenamientos los resúmenes de
+unas fechas concretas (reconciliación tras una operación masiva) y
+rebuild_summaries rehace todos los de un grupo de usuarios con una
+consulta agrupada por tipo de período y un upsert masivo.
+"""
+
+import datetime
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from trainings.models import HR_ZONE_FIELDS, Training
+
+from .models import ActivitySummary
+
+logger = logging.getLogger('stats')
+
+PERIOD_TYPES = ('daily', 'weekly', 'monthly', 'yearly')
+
+# Campo del resumen -> campo de Training que suma
+SUMMARY_SUM_FIELDS = {
+    'total_distance': 'distance',
+    'total_duration': 'duration',
+    'total_calories': 'calories',
+    **{campo: campo for campo in HR_ZONE_FIELDS},
+}
+
+# Campos acumulados de un resumen
+SUMMARY_TOTAL_FIELDS = ('training_count',) + tuple(SUMMARY_SUM_FIELDS)
+
+# Tipo de período -> función que lleva una fecha al inicio de su período (TruncWeek: lunes ISO)
+PERIOD_TRUNCS = {
+    'daily': TruncDay,
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+    'yearly': TruncYear,
+}
+
+
+def period_bounds(period_type, fecha):
+    """
+    Período de un tipo que contiene una fecha.
+
+    Returns:
+        dict con start_date, end_date y los identificadores year, month,
+        week y day del resumen (la semana es la ISO: de lunes a domingo,
+        con el año ISO)
+    """
+    if period_type == 'daily':
+        return {'start_date': fecha, 'end_date': fecha,
+                'year': fecha.year, 'month': fecha.month, 'week': None, 'day': fecha.day}
+    if period_type == 'weekly':
+        año_iso, semana, dia_semana = fecha.isocalendar()
+        inicio = fecha - datetime.timedelta(days=dia_semana - 1)
+        return {'start_date': inicio, 'end_date': inicio + datetime.timedelta(days=6),
+                'year': año_iso, 'month': None, 'week': semana, 'day': None}
+    if period_type == 'monthly':
+        inicio = fecha.replace(day=1)
+        siguiente = (inicio + datetime.timedelta(days=32)).replace(day=1)
+        return {'start_date': inicio, 'end_date': siguiente - datetime.timedelta(days=1),
+                'year': fecha.year, 'month': fecha.month, 'week': None, 'day': None}
+    if period_type == 'yearly':
+        return {'start_date': datetime.date(fecha.year, 1, 1), 'end_date': datetime.date(fecha.year, 12, 31),
+                'year': fecha.year, 'month': None, 'week': None, 'day': None}
+    raise ValueError(f"Tipo de período no válido: {period_type}")
+
+
+def summary_contribution(values):
+    """
+    Lo que aporta un entrenamiento a los resúmenes de sus períodos.
+
+    Args:
+        values: dict con date y los campos de SUMMARY_SUM_FIELDS, o None si
+            el entrenamiento no existe
+    """
+    if not values or values.get('date') is None:
+        return {}
+    return _summary_totals({
+        'training_count': 1,
+        **{campo: values.get(origen) for campo, origen in SUMMARY_SUM_FIELDS.items()},
+    })
+
+
+def summary_aggregates():
+    """Expresiones de agregación de los totales de un resumen sobre los entrenamientos"""
+    return {
+        'training_count': Count('id'),
+        **{campo: Sum(origen) for campo, origen in SUMMARY_SUM_FIELDS.items()},
+    }
+
+
+def _summary_totals(valores):
+    """Totales de un resumen a partir de summary_aggregates (las sumas vacías a cero)"""
+    totales = {campo: valores[campo] or 0 for campo in SUMMARY_TOTAL_FIELDS}
+    totales['total_duration'] = valores['total_duration'] or datetime.timedelta(0)
+    return totales
+
+
+class SummaryChange:
+    """
+    Cambio acumulado de los resúmenes de un usuario.
+
+    Atributos:
+        deltas: (tipo de período, fecha de inicio) -> incremento de cada
+            campo de SUMMARY_TOTAL_FIELDS
+    """
+
+    def __init__(self):
+        self.deltas = {}
+
+    @classmethod
+    def from_values(cls, old, new):
+        """Cambio al pasar un entrenamiento de los valores old a new (None si no existe)"""
+        change = cls()
+        change._add_training(new, 1)
+        change._add_training(old, -1)
+        return change
+
+    def merge(self, other):
+        for bucket, delta in other.deltas.items():
+            for field, value in delta.items():
+                self._add(bucket, field, value)
+
+    def __bool__(self):
+        return bool(self.deltas)
+
+    def _add_training(self, values, sign):
+        aportacion = summary_contribution(values)
+        if not aportacion:
+            return
+        for period_type in PERIOD_TYPES:
+            bucket = (period_type, period_bounds(period_type, values['date'])['start_date'])
+            for field, value in aportacion.items():
+                self._add(bucket, field, value if sign > 0 else -value)
+
+    def _add(self, bucket, field, value):
+        delta = self.deltas.setdefault(bucket, {})
+        total = delta[field] + value if field in delta else value
+        if total:
+            delta[field] = total
+        else:
+            delta.pop(field, None)
+        if not delta:
+            del self.deltas[bucket]
+
+
+def apply_summary_change(user, change):
+    """
+    Aplica un SummaryChange a los resúmenes del usuario.
+
+    Cada resumen afectado se actualiza con una sentencia UPDATE con F(); si
+    aún no existe se crea con el cambio como valor inicial, y si se queda
+    sin entrenamientos se elimina. Los que no cuadran con el cambio se
+    recalculan desde los entrenamientos.
+    """
+    for (period_type, start_date), delta in sorted(change.deltas.items()):
+        with transaction.atomic():
+            _apply_bucket_delta(user, period_type, start_date, delta)
+
+
+def _apply_bucket_delta(user, period_type, start_date, delta):
+    resumenes = ActivitySummary.objects.filter(user=user, period_type=period_type, start_date=start_date)
+    cambios = {field: F(field) + value for field, value in delta.items()}
+    # update() no aplica auto_now
+    cambios['updated_at'] = timezone.now()
+
+    if not resumenes.update(**cambios):
+        valores = {field: delta.get(field, 0) for field in SUMMARY_TOTAL_FIELDS}
+        valores['total_duration'] = delta.get('total_duration', datetime.timedelta(0))
+        if valores['training_count'] <= 0:
+            # Nada sobre lo que aplicar el cambio: el resumen no existía
+            logger.warning(f"Resumen {period_type} de {start_date} inexistente para el usuario {user.pk}, se recalcula")
+            recompute_summaries(user, [start_date], period_types=(period_type,))
+            return
+        try:
+            with transaction.atomic():
+                ActivitySummary.objects.create(user=user, period_type=period_type, **period_bounds(period_type, start_date), **valores)
+            return
+        except IntegrityError:
+            # Otra petición lo ha creado a la vez: aplicar el cambio sobre el suyo
+            resumenes.update(**cambios)
+
+    if delta.get('training_count', 0) < 0:
+        if resumenes.filter(training_count__lt=0).exists():
+            logger.warning(f"Resumen {period_type} de {start_date} descuadrado para el usuario {user.pk}, se recalcula")
+            recompute_summaries(user, [start_date], period_types=(period_type,))
+            return
+        resumenes.filter(training_count=0).delete()
+
+
+def recompute_summaries(user, dates, period_types=PERIOD_TYPES):
+    """
+    Recalcula desde los entrenamientos los resúmenes de los períodos que
+    contienen esas fechas (una consulta aggregate por período).
+    """
+    for period_type in period_types:
+        periodos = {period_bounds(period_type, fecha)['start_date'] for fecha in dates if fecha is not None}
+        for start_date in sorted(periodos):
+            limites = period_bounds(period_type, start_date)
+            totales = Training.objects.filter(
+                user=user, date__gte=limites['start_date'], date__lte=limites['end_date'],
+            ).aggregate(**summary_aggregates())
+            if not totales['training_count']:
+                ActivitySummary.objects.filter(user=user, period_type=period_type, start_date=start_date).delete()
+                continue
+            ActivitySummary.objects.update_or_create(
+                user=user,
+                period_type=period_type,
+                start_date=start_date,
+                defaults={**limites, **_summary_totals(totales)},
+            )
+        logger.info(f"Resúmenes {period_type} recalculados: {len(periodos)}")
+
+
+def rebuild_summaries(user_ids, period_types=PERIOD_TYPES, batch_size=1000):
+    """
+    Rehace desde los entrenamientos todos los resúmenes de unos usuarios.
+
+    Por cada tipo de período: una consulta GROUP BY (usuario, inicio del
+    período con Trunc*) sobre los entrenamientos, escrita con
+    bulk_create(update_conflicts=True) sobre (usuario, tipo, fecha de
+    inicio). Los resúmenes que no ha tocado el upsert (períodos que se han
+    quedado sin entrenamientos) se eliminan.
+
+    Returns:
+        dict con los resúmenes creados, actualizados y eliminados
+    """
+    resultado = {'creados': 0, 'actualizados': 0, 'eliminados': 0}
+    user_ids = list(user_ids)
+
+    for period_type in period_types:
+        inicio_ejecucion = timezone.now()
+        resumenes_tipo = ActivitySummary.objects.filter(user__in=user_ids, period_type=period_type)
+        existentes = set(resumenes_tipo.values_list('user_id', 'start_date'))
+
+        grupos = Training.objects.filter(user__in=user_ids, date__isnull=False).annotate(
+            inicio=PERIOD_TRUNCS[period_type]('date'),
+        ).values('user', 'inicio').annotate(**summary_aggregates()).order_by()
+
+        resumenes = []
+        for grupo in grupos.iterator(chunk_size=batch_size):
+            inicio = grupo['inicio']
+            if isinstance(inicio, datetime.datetime):
+                inicio = inicio.date()
+            clave = (grupo['user'], inicio)
+            if clave in existentes:
+                resultado['actualizados'] += 1
+            else:
+                resultado['creados'] += 1
+            resumenes.append(ActivitySummary(
+                user_id=grupo['user'],
+                period_type=period_type,
+                **period_bounds(period_type, inicio),
+                **_summary_totals(grupo),
+            ))
+
+        ActivitySummary.objects.bulk_create(
+            resumenes,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user', 'period_type', 'start_date'],
+            update_fields=['end_date', 'year', 'month', 'week', 'day', *SUMMARY_TOTAL_FIELDS, 'updated_at'],
+        )
+        # bulk_create pone updated_at (auto_now) a todos los que ha escrito
+        resultado['eliminados'] += resumenes_tipo.filter(updated_at__lt=inicio_ejecucion).delete()[0]
+
+    return resultado
+
+
+def period_totals(user, period_type, start=None, end=None, activity_type=None):
+    """
+    Totales por período de un usuario, en orden cronológico.
+
+    Sin filtro de tipo de actividad se leen directamente los resúmenes
+    guardados; con él, una sola consulta agrupada sobre los entrenamientos
+    de ese tipo. En ambos casos se devuelven los períodos completos que se
+    solapan con el rango [start, end].
+
+    Returns:
+        lista de dict con start_date, year, month, week y los campos de
+        SUMMARY_TOTAL_FIELDS
+    """
+    campos = ('start_date', 'year', 'month', 'week') + SUMMARY_TOTAL_FIELDS
+
+    if activity_type is None:
+        resumenes = ActivitySummary.objects.filter(user=user, period_type=period_type)
+        if start is not None:
+            resumenes = resumenes.filter(start_date__gte=period_bounds(period_type, start)['start_date'])
+        if end is not None:
+            resumenes = resumenes.filter(start_date__lte=end)
+        return list(resumenes.order_by('start_date').values(*campos))
+
+    entrenamientos = Training.objects.filter(user=user, date__isnull=False, activity_type=activity_type)
+    if start is not None:
+        entrenamientos = entrenamientos.filter(date__gte=period_bounds(period_type, start)['start_date'])
+    if end is not None:
+        entrenamientos = entrenamientos.filter(date__lte=period_bounds(period_type, end)['end_date'])
+
+    grupos = entrenamientos.annotate(
+        inicio=PERIOD_TRUNCS[period_type]('date'),
+    ).values('inicio').annotate(**summary_aggregates()).order_by('inicio')
+
+    totales = []
+    for grupo in grupos:
+        inicio = grupo.pop('inicio')
+        if isinstance(inicio, datetime.datetime):
+            inicio = inicio.date()
+        limites = period_bounds(period_type, inicio)
+        totales.append({
+            **{campo: limites[campo] for campo in ('start_date', 'year', 'month', 'week')},
+            **_summary_totals(grupo),
+        })
+    return totales
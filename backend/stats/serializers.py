@@ -10,7 +10,8 @@ Fecha: Mayo 2025
 """
 
 from rest_framework import serializers
-from .models import UserStats, ActivitySummary
+from trainings.models import Training
+from .models import UserStats, ActivityTypeStats, ActivitySummary
 import datetime
 
 class UserStatsSerializer(serializers.ModelSerializer):
@@ -25,10 +26,33 @@ class UserStatsSerializer(serializers.ModelSerializer):
             'total_calories', 'avg_distance_per_training', 'avg_duration_per_training',
             'avg_speed', 'avg_heart_rate', 'longest_distance', 'longest_duration',
             'highest_speed', 'highest_elevation_gain', 'first_training_date',
-            'last_training_date', 'last_updated'
+            'last_training_date', 'last_updated', 'last_full_update'
         ]
         read_only_fields = fields  # Todos los campos son de solo lectura
 
+class ActivityTypeStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializador para las estadísticas de un usuario en un tipo de actividad.
+    """
+    
+    tipo_actividad_texto = serializers.SerializerMethodField(method_name='get_tipo_actividad_texto')
+    
+    class Meta:
+        model = ActivityTypeStats
+        fields = [
+            'id', 'user', 'activity_type', 'tipo_actividad_texto', 'total_trainings',
+            'total_distance', 'total_duration', 'total_calories',
+            'avg_distance_per_training', 'avg_duration_per_training',
+            'avg_speed', 'avg_heart_rate', 'longest_distance', 'longest_duration',
+            'highest_speed', 'highest_elevation_gain', 'first_training_date',
+            'last_training_date', 'last_updated', 'last_full_update'
+        ]
+        read_only_fields = fields  # Todos los campos son de solo lectura
+    
+    def get_tipo_actividad_texto(self, obj):
+        """Nombre legible del tipo de actividad"""
+        return dict(Training.ACTIVITY_CHOICES).get(obj.activity_type, obj.activity_type)
+
 class ActivitySummarySerializer(serializers.ModelSerializer):
     """
     Serializador para resúmenes de actividad por períodos.
@@ -43,7 +67,9 @@ class ActivitySummarySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'period_type', 'year', 'month', 'week', 'day',
             'start_date', 'end_date', 'training_count', 'total_distance',
-            'total_duration', 'total_calories', 'periodo_texto'
+            'total_duration', 'total_calories',
+            'hr_zone1_seconds', 'hr_zone2_seconds', 'hr_zone3_seconds', 'hr_zone4_seconds', 'hr_zone5_seconds',
+            'periodo_texto'
         ]
         read_only_fields = fields  # Todos los campos son de solo lectura
     
@@ -1,8 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from trainings.models import Training
-from .models import ActivitySummary
-import datetime
+from .updates import schedule_load_change, schedule_summary_change, training_values
 import logging
 
 logger = logging.getLogger('stats')
@@ -10,93 +9,41 @@ logger = logging.getLogger('stats')
 @receiver(post_save, sender=Training)
 def actualizar_resumenes_actividad(sender, instance, created, **kwargs):
     """
-    Actualiza los resúmenes de actividad diaria cuando se guarda un entrenamiento.
-    VERSIÓN CORREGIDA - Maneja diferentes tipos de fecha correctamente.
+    Actualiza los resúmenes de actividad (diario, semanal, mensual y anual)
+    cuando se guarda un entrenamiento.
+    
+    Solo se aplica la diferencia con los valores anteriores (también si el
+    entrenamiento ha cambiado de fecha), una vez al confirmar la
+    transacción (ver stats.updates y stats.rollups). La serie de carga de
+    entrenamiento se recalcula desde el primer día afectado (stats.load).
     """
+    # Guardados que no tocan ningún campo de las estadísticas
+    if not getattr(instance, '_stats_affected', True):
+        return
+    
     try:
-        # Obtenemos la fecha del entrenamiento
-        fecha = instance.date
-        
-        # Si no hay fecha, no podemos crear un resumen
-        if fecha is None:
+        if instance.date is None:
             logger.warning(f"El entrenamiento {instance.id} no tiene fecha, no se puede crear resumen de actividad")
-            return
-        
-        # CORRECCIÓN: Asegurar que fecha es un objeto date, no string
-        if isinstance(fecha, str):
-            try:
-                # Intentar convertir string a date
-                if 'T' in fecha:
-                    # Formato ISO con tiempo
-                    fecha = datetime.datetime.fromisoformat(fecha.replace('Z', '')).date()
-                else:
-                    # Formato simple YYYY-MM-DD
-                    fecha = datetime.datetime.strptime(fecha, '%Y-%m-%d').date()
-            except (ValueError, TypeError) as e:
-                logger.error(f"No se pudo convertir la fecha '{fecha}' a objeto date: {e}")
-                return
-        elif isinstance(fecha, datetime.datetime):
-            # Si es datetime, extraer solo la fecha
-            fecha = fecha.date()
-        elif not isinstance(fecha, datetime.date):
-            logger.error(f"La fecha del entrenamiento {instance.id} no es válida: {type(fecha)} - {fecha}")
-            return
-            
-        # Actualizamos el resumen diario (lo creamos si no existe)
-        resumen_diario, es_nuevo = ActivitySummary.objects.get_or_create(
-            user=instance.user,
-            period_type='daily',  # Tipo de período: diario
-            year=fecha.year,      # Año
-            month=fecha.month,    # Mes
-            day=fecha.day,        # Día
-            defaults={
-                'start_date': fecha,  # Fecha de inicio (la misma)
-                'end_date': fecha     # Fecha de fin (la misma)
-            }
-        )
-        
-        # Obtenemos todos los entrenamientos del día para este usuario
-        entrenamientos_dia = Training.objects.filter(
-            user=instance.user,
-            date=fecha
-        )
-        
-        # Calculamos los totales para este día
-        resumen_diario.training_count = entrenamientos_dia.count()
-        
-        # Sumamos las distancias (si hay alguna)
-        distancia_total = 0
-        for ent in entrenamientos_dia:
-            if ent.distance:
-                distancia_total += ent.distance
-        resumen_diario.total_distance = distancia_total
-        
-        # Sumamos las calorías (si hay alguna)
-        calorias_total = 0
-        for ent in entrenamientos_dia:
-            if ent.calories:
-                calorias_total += ent.calories
-        resumen_diario.total_calories = calorias_total
-        
-        # Calculamos la duración total
-        segundos_totales = 0
-        for ent in entrenamientos_dia:
-            if ent.duration:
-                segundos_totales += ent.duration.total_seconds()
-        
-        # Convertimos los segundos a objeto timedelta
-        resumen_diario.total_duration = datetime.timedelta(seconds=segundos_totales)
-        
-        # Guardamos los cambios
-        resumen_diario.save()
-        
-        if es_nuevo:
-            logger.info(f"Nuevo resumen diario creado para {fecha}")
-        else:
-            logger.info(f"Resumen diario actualizado para {fecha}")
+        anteriores = getattr(instance, '_stats_previous', None)
+        schedule_summary_change(anteriores, training_values(instance))
+        schedule_load_change(anteriores, training_values(instance))
         
     except Exception as e:
         logger.error(f"ERROR al actualizar los resúmenes de actividad: {e}")
         # Log más detallado para debugging
         import traceback
-        logger.debug(f"Traceback completo: {traceback.format_exc()}")
\ No newline at end of file
+        logger.debug(f"Traceback completo: {traceback.format_exc()}")
+
+
+@receiver(post_delete, sender=Training)
+def actualizar_resumenes_al_eliminar(sender, instance, **kwargs):
+    """
+    Descuenta un entrenamiento eliminado de los resúmenes de sus períodos
+    y recalcula la serie de carga desde su fecha.
+    """
+    try:
+        schedule_summary_change(training_values(instance), None)
+        schedule_load_change(training_values(instance), None)
+        
+    except Exception as e:
+        logger.error(f"ERROR al actualizar los resúmenes de actividad después de eliminar: {e}")
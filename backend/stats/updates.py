@@ -0,0 +1,390 @@
+"""
+Actualización diferida y agrupada de los datos derivados de los entrenamientos.
+
+Un entrenamiento se guarda varias veces al crearlo (creación, resultado
+del procesado del archivo, errores...) y cada guardado disparaba el
+recálculo completo de UserStats y del resumen diario. Ahora las señales
+solo anotan qué hay que recalcular (schedule_stats_update) y el trabajo
+se hace cuando se confirma la transacción (transaction.on_commit); dentro
+de batch_stats_updates, una sola vez por usuario por muchos guardados que
+haya habido:
+- Las estadísticas del usuario una sola vez: con USER_STATS_INCREMENTAL
+  se aplica solo la diferencia entre los valores anteriores y los nuevos
+  de los entrenamientos (StatsChange, UserStats.apply_change); si no, se
+  recalculan completas (UserStats.update_stats)
+- Las estadísticas por tipo de actividad (ActivityTypeStats) igual, con
+  un StatsChange por cada tipo afectado
+- Los resúmenes de actividad (día, semana, mes y año) con la diferencia
+  de cada entrenamiento (stats.rollups.SummaryChange)
+- La serie de carga de entrenamiento (stats.load) desde el primer día
+  afectado
+
+Cada cambio se registra con su propio on_commit, también dentro de
+batch_stats_updates: si la transacción o el savepoint en el que se guardó
+el entrenamiento se deshace, Django descarta su callback y el cambio no
+se aplica. Fuera de una transacción el recálculo es inmediato.
+
+Para operaciones masivas:
+- batch_stats_updates(): acumula lo confirmado del bloque y lo aplica una
+  sola vez al salir (o al confirmarse la transacción que lo contiene)
+- suspend_stats_updates(): descarta las actualizaciones del bloque; el
+  llamador recalcula por su cuenta (refresh_user_stats)
+"""
+
+import contextlib
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from trainings.models import Training
+from users.models import User
+
+from .load import recompute_training_load
+from .models import STATS_RECORD_FIELDS, STATS_SOURCE_FIELDS, ActivityTypeStats, UserStats
+from .rollups import SummaryChange, apply_summary_change, recompute_summaries
+
+logger = logging.getLogger('stats')
+
+# Estado por hilo: bloques suspend/batch abiertos y lo acumulado en batch
+_estado = threading.local()
+
+
+def incremental_stats_enabled():
+    """Indica si UserStats se mantiene con cambios incrementales (USER_STATS_INCREMENTAL)"""
+    return getattr(settings, 'USER_STATS_INCREMENTAL', True)
+
+
+def training_values(instance):
+    """Valores de un entrenamiento de los que dependen las estadísticas (STATS_SOURCE_FIELDS, ya convertidos a su tipo)"""
+    valores = {'user_id': instance.user_id}
+    for nombre in STATS_SOURCE_FIELDS[1:]:
+        valores[nombre] = Training._meta.get_field(nombre).to_python(getattr(instance, nombre))
+    return valores
+
+
+def training_contribution(values):
+    """
+    Lo que aporta un entrenamiento a los totales y sumas de UserStats.
+
+    Args:
+        values: dict con STATS_SOURCE_FIELDS, o None si el entrenamiento no existe
+    """
+    # Igual que update_stats: los entrenamientos sin fecha no cuentan
+    if not values or values.get('date') is None:
+        return {}
+    return {
+        'total_trainings': 1,
+        'total_distance': values['distance'] or 0,
+        'total_duration': values['duration'] or datetime.timedelta(0),
+        'total_calories': values['calories'] or 0,
+        'speed_sum': values['avg_speed'] or 0,
+        'speed_count': 1 if values['avg_speed'] else 0,
+        'heart_rate_sum': values['avg_heart_rate'] or 0,
+        'heart_rate_count': 1 if values['avg_heart_rate'] else 0,
+    }
+
+
+class StatsChange:
+    """
+    Cambio acumulado de las estadísticas de un usuario.
+
+    Atributos:
+        delta: campo de UserStats -> incremento de los totales y sumas
+        candidates: récord -> mejor valor nuevo (puede superar el récord actual)
+        lost: récord -> mejor valor que ha empeorado o se ha eliminado (si
+            era el récord, hay que volver a consultarlo)
+    """
+
+    def __init__(self):
+        self.delta = {}
+        self.candidates = {}
+        self.lost = {}
+
+    @classmethod
+    def from_values(cls, old, new):
+        """Cambio al pasar un entrenamiento de los valores old a new (None si no existe)"""
+        change = cls()
+        anterior, nuevo = training_contribution(old), training_contribution(new)
+        for field, value in nuevo.items():
+            change._add_delta(field, value)
+        for field, value in anterior.items():
+            change._add_delta(field, -value)
+
+        for record, (source, maximo) in STATS_RECORD_FIELDS.items():
+            valor_nuevo = new[source] if nuevo else None
+            valor_anterior = old[source] if anterior else None
+            if valor_nuevo is not None and valor_nuevo != valor_anterior:
+                change._add_best(change.candidates, record, valor_nuevo, maximo)
+            if valor_anterior is not None and (
+                valor_nuevo is None or (valor_nuevo < valor_anterior if maximo else valor_nuevo > valor_anterior)
+            ):
+                change._add_best(change.lost, record, valor_anterior, maximo)
+        return change
+
+    def merge(self, other):
+        for field, value in other.delta.items():
+            self._add_delta(field, value)
+        for record, (_, maximo) in STATS_RECORD_FIELDS.items():
+            if record in other.candidates:
+                self._add_best(self.candidates, record, other.candidates[record], maximo)
+            if record in other.lost:
+                self._add_best(self.lost, record, other.lost[record], maximo)
+
+    def __bool__(self):
+        return bool(self.delta or self.candidates or self.lost)
+
+    def _add_delta(self, field, value):
+        total = self.delta[field] + value if field in self.delta else value
+        if total:
+            self.delta[field] = total
+        else:
+            self.delta.pop(field, None)
+
+    @staticmethod
+    def _add_best(values, record, value, maximo):
+        actual = values.get(record)
+        if actual is None or (value > actual if maximo else value < actual):
+            values[record] = value
+
+
+class PendingStatsUpdate:
+    """
+    Lo que queda por recalcular de un usuario: el cálculo completo de
+    UserStats (stats), un cambio incremental (change) y los de cada tipo
+    de actividad (type_changes), un cambio de los resúmenes (summaries),
+    los resúmenes a recalcular desde los entrenamientos de unas fechas
+    (dates) y el primer día desde el que recalcular la serie de carga
+    (load_from).
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.stats = False
+        self.change = StatsChange()
+        self.type_changes = {}
+        self.summaries = SummaryChange()
+        self.dates = set()
+        self.load_from = None
+
+    def merge(self, stats=False, dates=(), change=None, summaries=None, type_changes=None, load_from=None):
+        self.stats = self.stats or stats
+        self.dates.update(fecha for fecha in dates if fecha is not None)
+        if load_from is not None and (self.load_from is None or load_from < self.load_from):
+            self.load_from = load_from
+        if change is not None:
+            self.change.merge(change)
+        for activity_type, cambio in (type_changes or {}).items():
+            self.type_changes.setdefault(activity_type, StatsChange()).merge(cambio)
+        if summaries is not None:
+            self.summaries.merge(summaries)
+
+    def merge_pending(self, other):
+        self.merge(other.stats, other.dates, other.change, other.summaries, other.type_changes, other.load_from)
+
+
+@contextlib.contextmanager
+def suspend_stats_updates():
+    """
+    Desactiva las actualizaciones automáticas de estadísticas y resúmenes
+    al guardar o eliminar entrenamientos dentro del bloque.
+
+    Pensado para operaciones masivas repartidas entre procesos (importación
+    de archivos zip): el llamador lo recalcula una sola vez al terminar.
+    """
+    _estado.suspendido = getattr(_estado, 'suspendido', 0) + 1
+    try:
+        yield
+    finally:
+        _estado.suspendido -= 1
+
+
+def stats_updates_suspended():
+    """Indica si las actualizaciones automáticas están suspendidas en este hilo"""
+    return getattr(_estado, 'suspendido', 0) > 0
+
+
+class StatsUpdateBatch:
+    """
+    Actualizaciones acumuladas en un bloque batch_stats_updates (una por
+    usuario).
+
+    Cada cambio se añade desde su propio callback on_commit (add), de modo
+    que los de un savepoint deshecho nunca llegan a añadirse; run se
+    programa al salir del bloque, después de todos ellos.
+    """
+
+    def __init__(self):
+        self.pendientes = {}
+
+    def add(self, pendiente):
+        self.pendientes.setdefault(pendiente.user_id, PendingStatsUpdate(pendiente.user_id)).merge_pending(pendiente)
+
+    def run(self):
+        pendientes, self.pendientes = self.pendientes, {}
+        for pendiente in pendientes.values():
+            try:
+                run_stats_update(pendiente)
+            except Exception:
+                logger.exception(f"Error al actualizar las estadísticas del usuario {pendiente.user_id}")
+
+
+@contextlib.contextmanager
+def batch_stats_updates(using=DEFAULT_DB_ALIAS):
+    """
+    Acumula las actualizaciones de estadísticas y resúmenes del bloque y
+    las aplica una sola vez al salir (una por usuario, con todas sus
+    fechas). Los bloques anidados se agrupan con el más externo.
+
+    Solo se acumulan los cambios confirmados: los de una transacción o un
+    savepoint que se deshace dentro del bloque se descartan. Si el bloque
+    está dentro de una transacción, se aplican al confirmarla.
+    """
+    exterior = getattr(_estado, 'lote', None) is None
+    if exterior:
+        _estado.lote = StatsUpdateBatch()
+    try:
+        yield
+    finally:
+        if exterior:
+            lote, _estado.lote = _estado.lote, None
+            # Se ejecuta después de los add de los cambios del bloque que sigan vigentes
+            transaction.on_commit(lote.run, using=using, robust=True)
+
+
+def schedule_stats_update(user_id, dates=(), stats=True, change=None, summaries=None, type_changes=None,
+                          load_from=None, using=DEFAULT_DB_ALIAS):
+    """
+    Programa el recálculo de los datos derivados de un usuario al
+    confirmarse la transacción en curso.
+
+    Args:
+        user_id: usuario afectado
+        dates: fechas cuyos resúmenes hay que recalcular desde los entrenamientos
+        stats: recalcular UserStats (y ActivityTypeStats) por completo
+        change: StatsChange a aplicar de forma incremental a UserStats
+        type_changes: tipo de actividad -> StatsChange a aplicar a su ActivityTypeStats
+        summaries: SummaryChange a aplicar a los resúmenes de actividad
+        load_from: primer día desde el que recalcular la serie de carga
+    """
+    if stats_updates_suspended():
+        return
+
+    pendiente = PendingStatsUpdate(user_id)
+    pendiente.merge(stats, dates, change, summaries, type_changes, load_from)
+    _schedule(pendiente, using)
+
+
+def schedule_training_change(old, new):
+    """
+    Programa la actualización de UserStats y de las estadísticas por tipo
+    de actividad por el cambio de un entrenamiento.
+
+    Args:
+        old: valores anteriores (STATS_SOURCE_FIELDS) o None si es nuevo
+        new: valores actuales o None si se ha eliminado
+    """
+    usuarios = {values['user_id'] for values in (old, new) if values}
+    for user_id in usuarios:
+        if not incremental_stats_enabled():
+            schedule_stats_update(user_id)
+            continue
+        # Si el entrenamiento cambia de usuario, uno lo pierde y otro lo gana
+        anterior = old if old and old['user_id'] == user_id else None
+        nuevo = new if new and new['user_id'] == user_id else None
+        change = StatsChange.from_values(anterior, nuevo)
+
+        # Igual con el tipo de actividad: si cambia, un tipo lo pierde y otro lo gana
+        type_changes = {}
+        for activity_type in {values['activity_type'] for values in (anterior, nuevo) if values}:
+            cambio = StatsChange.from_values(
+                anterior if anterior and anterior['activity_type'] == activity_type else None,
+                nuevo if nuevo and nuevo['activity_type'] == activity_type else None,
+            )
+            if cambio:
+                type_changes[activity_type] = cambio
+
+        if change or type_changes:
+            schedule_stats_update(user_id, stats=False, change=change, type_changes=type_changes)
+
+
+def schedule_summary_change(old, new):
+    """
+    Programa la actualización de los resúmenes de actividad por el cambio
+    de un entrenamiento (mismos argumentos que schedule_training_change).
+    """
+    usuarios = {values['user_id'] for values in (old, new) if values}
+    for user_id in usuarios:
+        summaries = SummaryChange.from_values(
+            old if old and old['user_id'] == user_id else None,
+            new if new and new['user_id'] == user_id else None,
+        )
+        if summaries:
+            schedule_stats_update(user_id, stats=False, summaries=summaries)
+
+
+def schedule_load_change(old, new):
+    """
+    Programa el recálculo de la serie de carga desde el primer día afectado
+    por el cambio de un entrenamiento (mismos argumentos que
+    schedule_training_change).
+    """
+    usuarios = {values['user_id'] for values in (old, new) if values}
+    for user_id in usuarios:
+        afectados = [
+            (values['date'], values['load_score'])
+            for values in (old, new)
+            if values and values['user_id'] == user_id and values['date'] is not None
+        ]
+        # Sin fecha no cuenta; si no cambia ni la fecha ni la carga, la serie no cambia
+        if not afectados or (len(afectados) == 2 and afectados[0] == afectados[1]):
+            continue
+        schedule_stats_update(user_id, stats=False, load_from=min(fecha for fecha, _ in afectados))
+
+
+def _schedule(pendiente, using=DEFAULT_DB_ALIAS):
+    # Un callback por cambio: Django lo descarta si su savepoint se deshace
+    lote = getattr(_estado, 'lote', None)
+    if lote is not None:
+        transaction.on_commit(lambda: lote.add(pendiente), using=using)
+    else:
+        transaction.on_commit(lambda: run_stats_update(pendiente), using=using, robust=True)
+
+
+def run_stats_update(pendiente):
+    """Recalcula lo pendiente de un usuario (se llama desde on_commit)"""
+    # El usuario puede haberse eliminado en la misma transacción (cascada)
+    user = User.objects.filter(pk=pendiente.user_id).first()
+    if user is None:
+        return
+
+    # El cálculo completo incluye cualquier cambio incremental (también los
+    # de cada tipo de actividad); sin estadísticas previas no hay nada
+    # sobre lo que aplicar el cambio
+    if pendiente.stats or (pendiente.change and not UserStats.apply_change(user, pendiente.change)):
+        estadisticas, _ = UserStats.objects.get_or_create(user=user)
+        estadisticas.update_stats()
+    elif pendiente.type_changes:
+        aplicados = [
+            ActivityTypeStats.apply_change(user, cambio, activity_type=activity_type)
+            for activity_type, cambio in pendiente.type_changes.items()
+        ]
+        if not all(aplicados):
+            # Primer entrenamiento de un tipo: se calcula desde los entrenamientos
+            ActivityTypeStats.update_stats_bulk([user.pk])
+    if pendiente.summaries:
+        apply_summary_change(user, pendiente.summaries)
+    if pendiente.dates:
+        recompute_summaries(user, pendiente.dates)
+    if pendiente.load_from is not None:
+        recompute_training_load(user, pendiente.load_from)
+
+
+def refresh_user_stats(user, dates):
+    """Recalcula de una vez las estadísticas del usuario, los resúmenes de los períodos de esos días y la serie de carga"""
+    dates = [fecha for fecha in dates if fecha is not None]
+    pendiente = PendingStatsUpdate(user.pk)
+    pendiente.merge(stats=True, dates=dates, load_from=min(dates, default=None))
+    run_stats_update(pendiente)
@@ -13,8 +13,7 @@ Fecha: Mayo 2025
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Avg, Max, Count
-from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
+from django.db.models import Sum, Avg, Max, F
 import datetime
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
@@ -23,9 +22,18 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from django.http import HttpResponse
 
-from .models import UserStats, ActivitySummary
-from .serializers import UserStatsSerializer, ActivitySummarySerializer
+from .models import UserStats, ActivityTypeStats, ActivitySummary
+from .load import training_load_series
+from .refresh import get_user_stats
+from .rollups import period_totals, rebuild_summaries
+from .serializers import UserStatsSerializer, ActivityTypeStatsSerializer, ActivitySummarySerializer
 from trainings.models import Training
+from trainings.efforts import personal_records
+from trainings.serializers import BestEffortSerializer
+
+# Días de la serie de carga si no se indica el rango, y máximo por petición
+DIAS_CARGA_POR_DEFECTO = 90
+DIAS_CARGA_MAXIMOS = 3660
 
 class StatsViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -43,15 +51,12 @@ class StatsViewSet(viewsets.ReadOnlyModelViewSet):
         Obtener estadísticas del usuario autenticado.
         
         Asegura que cada usuario sólo pueda ver sus propias estadísticas.
+        Se sirven los valores guardados; si están desactualizadas (o se pide
+        con ?actualizar=true) se recalculan en segundo plano.
         """
         usuario = self.request.user
         
-        # Obtener o crear objeto de estadísticas
-        estadisticas, creado = UserStats.objects.get_or_create(user=usuario)
-        
-        # Actualizar estadísticas si se solicita
-        if self.request.query_params.get('actualizar', 'false').lower() == 'true':
-            estadisticas.update_stats()
+        get_user_stats(usuario, refresh=self.request.query_params.get('actualizar', 'false').lower() == 'true')
             
         return UserStats.objects.filter(user=usuario)
     
@@ -61,12 +66,11 @@ class StatsViewSet(viewsets.ReadOnlyModelViewSet):
         Obtener un resumen general de las estadísticas del usuario.
         
         Incluye estadísticas globales, actividad reciente y distribución por tipo.
+        Las estadísticas se sirven tal como están guardadas; 'frescura' indica
+        cuándo se actualizaron y si se están recalculando en segundo plano.
         """
         usuario = request.user
-        estadisticas, creado = UserStats.objects.get_or_create(user=usuario)
-        
-        # Actualizar las estadísticas para asegurar que están al día
-        estadisticas.update_stats()
+        estadisticas, frescura = get_user_stats(usuario)
         
         # Calculamos datos adicionales
         hoy = datetime.date.today()
@@ -84,10 +88,10 @@ class StatsViewSet(viewsets.ReadOnlyModelViewSet):
             date__gte=hace_30_dias
         ).aggregate(total=Sum('distance'))['total'] or 0
         
-        # Distribución por tipo de actividad
-        tipos_actividad = Training.objects.filter(
-            user=usuario
-        ).values('activity_type').annotate(cantidad=Count('id')).order_by('-cantidad')
+        # Distribución por tipo de actividad (de las estadísticas por tipo guardadas)
+        tipos_actividad = ActivityTypeStats.objects.filter(
+            user=usuario, total_trainings__gt=0
+        ).values('activity_type', cantidad=F('total_trainings'))
         
         # Construir respuesta
         datos_respuesta = {
@@ -96,112 +100,199 @@ class StatsViewSet(viewsets.ReadOnlyModelViewSet):
                 'entrenamientos_ultimo_mes': entrenamientos_ultimo_mes,
                 'distancia_ultimo_mes': distancia_ultimo_mes,
             },
-            'distribucion_por_tipo': {item['activity_type']: item['cantidad'] for item in tipos_actividad}
+            'distribucion_por_tipo': {item['activity_type']: item['cantidad'] for item in tipos_actividad},
+            'frescura': frescura,
         }
         
         return Response(datos_respuesta)
     
+    @action(detail=False, methods=['get'])
+    def por_tipo(self, request):
+        """
+        Obtener las estadísticas del usuario por tipo de actividad.
+        
+        Mismos totales, promedios y récords que las estadísticas globales,
+        separados por deporte. Se leen de la tabla ActivityTypeStats (una
+        consulta, practique el usuario uno o varios deportes).
+        
+        Parámetros opcionales:
+            tipo_actividad: solo las de ese tipo
+        """
+        usuario = request.user
+        _, frescura = get_user_stats(usuario)
+        
+        estadisticas = ActivityTypeStats.objects.filter(user=usuario, total_trainings__gt=0)
+        tipo_actividad = request.query_params.get('tipo_actividad')
+        if tipo_actividad:
+            estadisticas = estadisticas.filter(activity_type=tipo_actividad)
+        
+        return Response({
+            'estadisticas': ActivityTypeStatsSerializer(estadisticas, many=True).data,
+            'frescura': frescura,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def mejores_marcas(self, request):
+        """
+        Obtener los récords personales del usuario: el mejor tiempo en cada
+        distancia estándar, la mayor distancia en cada duración y la subida
+        más larga de todo su historial.
+        
+        Se leen de los mejores esfuerzos guardados al procesar cada
+        entrenamiento, con una sola consulta.
+        
+        Parámetros opcionales:
+            tipo_actividad: solo los entrenamientos de ese tipo
+        """
+        tipo_actividad = request.query_params.get('tipo_actividad') or None
+        records = personal_records(request.user, tipo_actividad)
+        return Response(BestEffortSerializer(records, many=True).data)
+    
     @action(detail=False, methods=['get'])
     def tendencias(self, request):
         """
         Obtener tendencias de actividad por período (semanal, mensual, anual).
         
         Permite visualizar la evolución de la actividad deportiva a lo largo del tiempo.
-        Versión simplificada sin pandas.
+        Se sirve desde los resúmenes de actividad guardados (o con una sola
+        consulta agrupada si se filtra por tipo de actividad), así que no
+        depende de cuántos entrenamientos tenga el usuario.
+        
+        Parámetros opcionales:
+            desde, hasta: rango de fechas (YYYY-MM-DD); se incluyen los
+                períodos completos que se solapan con él
+            tipo_actividad: solo entrenamientos de ese tipo
         """
         usuario = request.user
         periodo = request.query_params.get('periodo', 'semanal')
         
         # Validar el período
-        if periodo not in ['semanal', 'mensual', 'anual']:
+        tipos_periodo = {'semanal': 'weekly', 'mensual': 'monthly', 'anual': 'yearly'}
+        if periodo not in tipos_periodo:
             return Response(
                 {'error': 'Período no válido. Debe ser semanal, mensual o anual.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtener todos los entrenamientos del usuario
-        entrenamientos = Training.objects.filter(user=usuario)
+        # Validar los filtros
+        try:
+            desde = self._parse_fecha(request.query_params.get('desde'))
+            hasta = self._parse_fecha(request.query_params.get('hasta'))
+        except ValueError:
+            return Response(
+                {'error': 'Fecha no válida. Usa el formato YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if desde and hasta and desde > hasta:
+            return Response(
+                {'error': 'La fecha inicial no puede ser posterior a la final.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tipo_actividad = request.query_params.get('tipo_actividad') or None
+        tipos_validos = [tipo for tipo, _ in Training.ACTIVITY_CHOICES]
+        if tipo_actividad is not None and tipo_actividad not in tipos_validos:
+            return Response(
+                {'error': f'Tipo de actividad no válido. Debe ser uno de: {", ".join(tipos_validos)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        datos = period_totals(usuario, tipos_periodo[periodo], desde, hasta, tipo_actividad)
         
-        if not entrenamientos.exists():
+        if not datos and not (desde or hasta or tipo_actividad):
             return Response({'mensaje': 'No tienes entrenamientos registrados todavía.'})
         
-        # Preparar datos según el período seleccionado
-        if periodo == 'semanal':
-            # Agrupar por semana
-            datos = entrenamientos.annotate(
-                periodo=TruncWeek('date')
-            ).values('periodo').annotate(
-                cantidad=Count('id'),
-                distancia=Sum('distance'),
-                duracion=Sum('duration'),
-                calorias=Sum('calories')
-            ).order_by('periodo')
-            etiqueta_periodo = 'Semana'
-        
-        elif periodo == 'mensual':
-            # Agrupar por mes
-            datos = entrenamientos.annotate(
-                periodo=TruncMonth('date')
-            ).values('periodo').annotate(
-                cantidad=Count('id'),
-                distancia=Sum('distance'),
-                duracion=Sum('duration'),
-                calorias=Sum('calories')
-            ).order_by('periodo')
-            etiqueta_periodo = 'Mes'
-        
-        else:  # anual
-            # Simplificamos y usamos el año directamente en lugar de ExtractYear
-            datos = []
-            years = entrenamientos.dates('date', 'year')
-            for year in years:
-                year_trainings = entrenamientos.filter(date__year=year.year)
-                year_data = {
-                    'periodo': year.year,
-                    'cantidad': year_trainings.count(),
-                    'distancia': year_trainings.aggregate(Sum('distance'))['distance__sum'] or 0,
-                    'duracion': year_trainings.aggregate(Sum('duration'))['duration__sum'] or datetime.timedelta(0),
-                    'calorias': year_trainings.aggregate(Sum('calories'))['calories__sum'] or 0
-                }
-                datos.append(year_data)
-            etiqueta_periodo = 'Año'
+        etiqueta_periodo = {'semanal': 'Semana', 'mensual': 'Mes', 'anual': 'Año'}[periodo]
         
         # Formatear la respuesta para que sea más amigable
         resultado = []
         for item in datos:
             # Convertir duración de segundos a formato legible
-            if isinstance(item['duracion'], datetime.timedelta):
-                segundos_duracion = item['duracion'].total_seconds()
-            else:
-                segundos_duracion = 0
-                
+            segundos_duracion = item['total_duration'].total_seconds() if item['total_duration'] else 0
             horas, resto = divmod(segundos_duracion, 3600)
             minutos, segundos = divmod(resto, 60)
             
-            # Formato para el período
-            if hasattr(item['periodo'], 'strftime'):
-                if periodo == 'semanal':
-                    etiqueta = f"Semana {item['periodo'].strftime('%W')} de {item['periodo'].strftime('%Y')}"
-                elif periodo == 'mensual':
-                    etiqueta = item['periodo'].strftime('%B %Y')
-                else:
-                    etiqueta = str(item['periodo'])
+            # Formato para el período (semana ISO)
+            if periodo == 'semanal':
+                etiqueta = f"Semana {item['week']:02d} de {item['year']}"
+            elif periodo == 'mensual':
+                etiqueta = item['start_date'].strftime('%B %Y')
             else:
-                etiqueta = str(item['periodo'])
+                etiqueta = str(item['year'])
             
             resultado.append({
                 'periodo': etiqueta,
-                'entrenamientos': item['cantidad'],
-                'distancia_total': round(item['distancia'] or 0, 2),
+                'inicio': item['start_date'],
+                'entrenamientos': item['training_count'],
+                'distancia_total': round(item['total_distance'] or 0, 2),
                 'duracion_total': f"{int(horas)}h {int(minutos)}m",
-                'calorias_total': item['calorias'] or 0
+                'calorias_total': item['total_calories'] or 0
             })
         
         return Response({
             'tipo_periodo': etiqueta_periodo,
+            'filtros': {'desde': desde, 'hasta': hasta, 'tipo_actividad': tipo_actividad},
             'datos': resultado
         })
     
+    @action(detail=False, methods=['get'])
+    def carga(self, request):
+        """
+        Curvas de carga de entrenamiento: forma física (CTL), fatiga (ATL)
+        y estado de forma (TSB) de cada día.
+        
+        Se sirven desde la serie diaria guardada con una sola consulta,
+        para cualquier rango de fechas (ver stats.load).
+        
+        Parámetros opcionales:
+            desde, hasta: rango de fechas (YYYY-MM-DD); por defecto, los
+                últimos DIAS_CARGA_POR_DEFECTO días hasta hoy
+        """
+        try:
+            desde = self._parse_fecha(request.query_params.get('desde'))
+            hasta = self._parse_fecha(request.query_params.get('hasta'))
+        except ValueError:
+            return Response(
+                {'error': 'Fecha no válida. Usa el formato YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        hasta = hasta or datetime.date.today()
+        desde = desde or hasta - datetime.timedelta(days=DIAS_CARGA_POR_DEFECTO - 1)
+        if desde > hasta:
+            return Response(
+                {'error': 'La fecha inicial no puede ser posterior a la final.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (hasta - desde).days >= DIAS_CARGA_MAXIMOS:
+            return Response(
+                {'error': f'El rango no puede superar {DIAS_CARGA_MAXIMOS} días.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serie = training_load_series(request.user, desde, hasta)
+        
+        return Response({
+            'filtros': {'desde': desde, 'hasta': hasta},
+            'datos': [
+                {
+                    'fecha': dia['date'],
+                    'carga': round(dia['load'], 1),
+                    'forma_fisica': round(dia['ctl'], 1),
+                    'fatiga': round(dia['atl'], 1),
+                    'estado_forma': round(dia['tsb'], 1),
+                }
+                for dia in serie
+            ]
+        })
+    
+    @staticmethod
+    def _parse_fecha(valor):
+        """Convierte un parámetro YYYY-MM-DD en date (None si no se indica)"""
+        if not valor:
+            return None
+        return datetime.datetime.strptime(valor, '%Y-%m-%d').date()
+    
     @action(detail=False, methods=['get'])
     def exportar_pdf(self, request):
         """
@@ -210,10 +301,8 @@ class StatsViewSet(viewsets.ReadOnlyModelViewSet):
         Genera un informe completo con todas las métricas del usuario.
         """
         usuario = request.user
-        estadisticas, _ = UserStats.objects.get_or_create(user=usuario)
-        
-        # Actualizar estadísticas antes de exportar
-        estadisticas.update_stats()
+        # Estadísticas guardadas (si están desactualizadas se recalculan en segundo plano)
+        estadisticas, _ = get_user_stats(usuario)
         
         # Crear buffer para el PDF
         buffer = BytesIO()
@@ -375,7 +464,8 @@ class ActivitySummaryViewSet(viewsets.ReadOnlyModelViewSet):
         Generar o actualizar resúmenes de actividad para el usuario.
         
         Permite crear resúmenes para diferentes períodos de tiempo
-        a partir de los entrenamientos existentes.
+        a partir de los entrenamientos existentes. Los resúmenes ya se
+        mantienen al guardar cada entrenamiento; esto los rehace por completo.
         """
         usuario = request.user
         tipos_periodo = request.data.get('tipos_periodo', ['weekly', 'monthly', 'yearly'])
@@ -389,224 +479,17 @@ class ActivitySummaryViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        # Obtener todos los entrenamientos del usuario
-        entrenamientos = Training.objects.filter(user=usuario).order_by('date')
+        # Una consulta agrupada por tipo de período y un upsert masivo (ver stats.rollups)
+        resultado = rebuild_summaries([usuario.pk], tipos_periodo)
+        resumenes_creados = resultado['creados']
+        resumenes_actualizados = resultado['actualizados']
         
-        if not entrenamientos.exists():
+        if not resumenes_creados and not resumenes_actualizados:
             return Response({'mensaje': 'No hay entrenamientos para generar resúmenes de actividad.'})
         
-        # Variables para contar resultados
-        resumenes_creados = 0
-        resumenes_actualizados = 0
-        
-        # Generar resúmenes para cada tipo de período solicitado
-        for tipo_periodo in tipos_periodo:
-            if tipo_periodo == 'daily':
-                # Agrupar por día
-                fechas_unicas = entrenamientos.dates('date', 'day')
-                
-                for fecha in fechas_unicas:
-                    # Obtener entrenamientos de ese día
-                    entrenamientos_dia = entrenamientos.filter(date=fecha)
-                    
-                    # Calcular estadísticas
-                    cantidad = entrenamientos_dia.count()
-                    distancia_total = entrenamientos_dia.aggregate(total=Sum('distance'))['total'] or 0
-                    calorias_total = entrenamientos_dia.aggregate(total=Sum('calories'))['total'] or 0
-                    
-                    # Calcular duración total
-                    segundos_totales = sum(
-                        t.duration.total_seconds() for t in entrenamientos_dia if t.duration
-                    )
-                    
-                    # Crear o actualizar resumen
-                    resumen, creado = ActivitySummary.objects.update_or_create(
-                        user=usuario,
-                        period_type='daily',
-                        year=fecha.year,
-                        month=fecha.month,
-                        day=fecha.day,
-                        defaults={
-                            'start_date': fecha,
-                            'end_date': fecha,
-                            'training_count': cantidad,
-                            'total_distance': distancia_total,
-                            'total_duration': datetime.timedelta(seconds=segundos_totales),
-                            'total_calories': calorias_total,
-                        }
-                    )
-                    
-                    if creado:
-                        resumenes_creados += 1
-                    else:
-                        resumenes_actualizados += 1
-            
-            elif tipo_periodo == 'weekly':
-                # Obtener todas las semanas únicas por año-semana
-                # Usamos dates() y un procesamiento manual para evitar dependencias
-                fechas_unicas = entrenamientos.dates('date', 'week')
-                semanas_procesadas = set()
-                
-                for fecha in fechas_unicas:
-                    # Obtener el número de semana
-                    año = fecha.year
-                    semana = fecha.isocalendar()[1]
-                    
-                    # Evitar duplicados
-                    clave_semana = f"{año}-{semana}"
-                    if clave_semana in semanas_procesadas:
-                        continue
-                    semanas_procesadas.add(clave_semana)
-                    
-                    # Calcular fechas de inicio y fin de la semana
-                    # Aproximación simple: inicio = fecha - (día de la semana - 1)
-                    dia_semana = fecha.isocalendar()[2]  # 1=lunes, 7=domingo
-                    primer_dia = fecha - datetime.timedelta(days=dia_semana-1)
-                    ultimo_dia = primer_dia + datetime.timedelta(days=6)
-                    
-                    # Obtener entrenamientos de la semana
-                    entrenamientos_semana = entrenamientos.filter(
-                        date__gte=primer_dia, 
-                        date__lte=ultimo_dia
-                    )
-                    
-                    if entrenamientos_semana.exists():
-                        # Calcular estadísticas
-                        cantidad = entrenamientos_semana.count()
-                        distancia_total = entrenamientos_semana.aggregate(total=Sum('distance'))['total'] or 0
-                        calorias_total = entrenamientos_semana.aggregate(total=Sum('calories'))['total'] or 0
-                        
-                       # Calcular duración total
-                        segundos_totales = sum(
-                            t.duration.total_seconds() for t in entrenamientos_semana if t.duration
-                        )
-                        
-                        # Crear o actualizar resumen
-                        resumen, creado = ActivitySummary.objects.update_or_create(
-                            user=usuario,
-                            period_type='weekly',
-                            year=año,
-                            week=semana,
-                            defaults={
-                                'start_date': primer_dia,
-                                'end_date': ultimo_dia,
-                                'training_count': cantidad,
-                                'total_distance': distancia_total,
-                                'total_duration': datetime.timedelta(seconds=segundos_totales),
-                                'total_calories': calorias_total,
-                            }
-                        )
-                        
-                        if creado:
-                            resumenes_creados += 1
-                        else:
-                            resumenes_actualizados += 1
-            
-            elif tipo_periodo == 'monthly':
-                # Obtener todos los meses únicos
-                fechas_unicas = entrenamientos.dates('date', 'month')
-                
-                for fecha in fechas_unicas:
-                    año = fecha.year
-                    mes = fecha.month
-                    
-                    # Calcular fechas de inicio y fin del mes
-                    primer_dia = datetime.date(año, mes, 1)
-                    
-                    # Último día del mes (usando el primer día del siguiente mes - 1 día)
-                    if mes == 12:
-                        ultimo_dia = datetime.date(año, mes, 31)
-                    else:
-                        ultimo_dia = datetime.date(año, mes + 1, 1) - datetime.timedelta(days=1)
-                    
-                    # Obtener entrenamientos del mes
-                    entrenamientos_mes = entrenamientos.filter(
-                        date__gte=primer_dia, 
-                        date__lte=ultimo_dia
-                    )
-                    
-                    if entrenamientos_mes.exists():
-                        # Calcular estadísticas
-                        cantidad = entrenamientos_mes.count()
-                        distancia_total = entrenamientos_mes.aggregate(total=Sum('distance'))['total'] or 0
-                        calorias_total = entrenamientos_mes.aggregate(total=Sum('calories'))['total'] or 0
-                        
-                        # Calcular duración total
-                        segundos_totales = sum(
-                            t.duration.total_seconds() for t in entrenamientos_mes if t.duration
-                        )
-                        
-                        # Crear o actualizar resumen
-                        resumen, creado = ActivitySummary.objects.update_or_create(
-                            user=usuario,
-                            period_type='monthly',
-                            year=año,
-                            month=mes,
-                            defaults={
-                                'start_date': primer_dia,
-                                'end_date': ultimo_dia,
-                                'training_count': cantidad,
-                                'total_distance': distancia_total,
-                                'total_duration': datetime.timedelta(seconds=segundos_totales),
-                                'total_calories': calorias_total,
-                            }
-                        )
-                        
-                        if creado:
-                            resumenes_creados += 1
-                        else:
-                            resumenes_actualizados += 1
-            
-            elif tipo_periodo == 'yearly':
-                # Obtener todos los años únicos
-                fechas_unicas = entrenamientos.dates('date', 'year')
-                
-                for fecha in fechas_unicas:
-                    año = fecha.year
-                    
-                    # Calcular fechas de inicio y fin del año
-                    primer_dia = datetime.date(año, 1, 1)
-                    ultimo_dia = datetime.date(año, 12, 31)
-                    
-                    # Obtener entrenamientos del año
-                    entrenamientos_año = entrenamientos.filter(
-                        date__gte=primer_dia, 
-                        date__lte=ultimo_dia
-                    )
-                    
-                    if entrenamientos_año.exists():
-                        # Calcular estadísticas
-                        cantidad = entrenamientos_año.count()
-                        distancia_total = entrenamientos_año.aggregate(total=Sum('distance'))['total'] or 0
-                        calorias_total = entrenamientos_año.aggregate(total=Sum('calories'))['total'] or 0
-                        
-                        # Calcular duración total
-                        segundos_totales = sum(
-                            t.duration.total_seconds() for t in entrenamientos_año if t.duration
-                        )
-                        
-                        # Crear o actualizar resumen
-                        resumen, creado = ActivitySummary.objects.update_or_create(
-                            user=usuario,
-                            period_type='yearly',
-                            year=año,
-                            defaults={
-                                'start_date': primer_dia,
-                                'end_date': ultimo_dia,
-                                'training_count': cantidad,
-                                'total_distance': distancia_total,
-                                'total_duration': datetime.timedelta(seconds=segundos_totales),
-                                'total_calories': calorias_total,
-                            }
-                        )
-                        
-                        if creado:
-                            resumenes_creados += 1
-                        else:
-                            resumenes_actualizados += 1
-        
         return Response({
             'mensaje': f'Resúmenes generados: {resumenes_creados}, actualizados: {resumenes_actualizados}',
             'creados': resumenes_creados,
-            'actualizados': resumenes_actualizados
+            'actualizados': resumenes_actualizados,
+            'eliminados': resultado['eliminados'],
         })
\ No newline at end of file
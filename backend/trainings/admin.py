@@ -4,7 +4,10 @@ Configuración del Admin de Django para la app de entrenamientos.
 Proporciona una interfaz administrativa completa para:
 - Gestionar entrenamientos (con y sin archivos)
 - Ver puntos de ruta 
+- Ver los mejores esfuerzos (récords) de cada entrenamiento
 - Gestionar objetivos
+- Revisar la cola de trabajos de procesamiento
+- Revisar las subidas por fragmentos
 - Procesamiento fácil de archivos
 
 Autor: Juan Manuel Ordás Periscal
@@ -18,7 +21,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.http import HttpResponseRedirect
 from django.contrib import messages
-from .models import Training, TrackPoint, Goal
+from .models import HR_ZONE_FIELDS, Training, TrackPoint, BestEffort, Goal, ProcessingJob, UploadSession
 from django.forms import ModelForm, FileInput
 
 class TrainingAdminForm(forms.ModelForm):
@@ -41,7 +44,7 @@ class TrainingAdminForm(forms.ModelForm):
                 'cols': 40
             }),
             'gpx_file': FileInput(attrs={
-                'accept': '.gpx,.tcx,.fit',
+                'accept': '.gpx,.tcx,.fit,.gz,.zst',
                 'class': 'vFileUploadField'
             }),
         }
@@ -51,7 +54,7 @@ class TrainingAdminForm(forms.ModelForm):
         
         # Configurar el campo de archivo
         self.fields['gpx_file'].widget.attrs.update({
-            'accept': '.gpx,.tcx,.fit',
+            'accept': '.gpx,.tcx,.fit,.gz,.zst',
             'style': 'width: 100%;'
         })
         
@@ -93,8 +96,8 @@ class TrainingAdmin(admin.ModelAdmin):
     
     readonly_fields = (
         'created_at', 'updated_at', 'file_processed', 'processing_error',
-        'track_points_count', 'file_info'
-    )
+        'track_points_count', 'file_info', 'hr_zones_max_hr', 'load_score'
+    ) + HR_ZONE_FIELDS
     
     # Configuración del formulario
     fieldsets = (
@@ -129,6 +132,12 @@ class TrainingAdmin(admin.ModelAdmin):
             'classes': ('wide',)
         }),
         
+        ('❤️ Zonas de Frecuencia Cardíaca y Carga', {
+            'fields': HR_ZONE_FIELDS + ('hr_zones_max_hr', 'load_score'),
+            'classes': ('collapse', 'wide'),
+            'description': 'Tiempo en cada zona, calculado al procesar el archivo, y carga (TRIMP)'
+        }),
+        
         ('📊 Datos Avanzados (GPX/FIT)', {
             'fields': ('avg_cadence', 'max_cadence', 'avg_temperature', 'min_temperature', 'max_temperature'),
             'classes': ('collapse', 'wide'),
@@ -379,6 +388,15 @@ class TrackPointAdmin(admin.ModelAdmin):
         """Permitir eliminar solo a superusuarios"""
         return request.user.is_superuser
 
+@admin.register(BestEffort)
+class BestEffortAdmin(admin.ModelAdmin):
+    """Administración de los mejores esfuerzos de cada entrenamiento"""
+    
+    list_display = ('training', 'user', 'effort', 'elapsed_time', 'distance', 'elevation_gain')
+    list_filter = ('effort', 'training__activity_type')
+    search_fields = ('training__title', 'user__username')
+    readonly_fields = ('training', 'user', 'ranking')
+
 class GoalAdminForm(forms.ModelForm):
     """Formulario para objetivos"""
     
@@ -469,6 +487,37 @@ class GoalAdmin(admin.ModelAdmin):
             f"✅ Objetivo '{obj.title}' guardado correctamente."
         )
 
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    """Administración de la cola de trabajos de procesamiento"""
+    
+    list_display = ('id', 'kind', 'user', 'training', 'status', 'attempts', 'worker', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('user__username', 'training__title', 'error')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'lease_expires_at', 'worker')
+    actions = ['requeue_jobs']
+    
+    def requeue_jobs(self, request, queryset):
+        """Vuelve a poner en cola los trabajos seleccionados"""
+        updated = queryset.exclude(status=ProcessingJob.STATUS_RUNNING).update(
+            status=ProcessingJob.STATUS_PENDING,
+            attempts=0,
+            error=None,
+            run_after=timezone.now(),
+            finished_at=None,
+        )
+        messages.success(request, f"✅ {updated} trabajos puestos de nuevo en cola")
+    requeue_jobs.short_description = "🔄 Volver a poner en cola"
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    """Administración de las subidas por fragmentos"""
+    
+    list_display = ('id', 'file_name', 'user', 'status', 'received', 'total_size', 'training', 'expires_at')
+    list_filter = ('status',)
+    search_fields = ('user__username', 'file_name')
+    readonly_fields = ('created_at', 'updated_at', 'received', 'checksum')
+
 # Personalización del admin principal
 admin.site.site_header = "AthCyl - Administración"
 admin.site.site_title = "AthCyl Admin"
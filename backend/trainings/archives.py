@@ -0,0 +1,240 @@
+"""
+Importación masiva de entrenamientos desde un archivo zip.
+
+Pensado para las exportaciones completas de las plataformas de los
+relojes (cientos o miles de actividades):
+- Los archivos del zip se leen en streaming con zipfile, sin extraerlos a disco
+- Cada GPX/TCX/FIT (también .gz/.zst) se convierte en un Training por el
+  mismo camino que una subida normal (TrainingSerializer)
+- Los archivos se reparten en lotes entre varios procesos; cada proceso
+  abre el zip una sola vez
+- Las estadísticas y los resúmenes se recalculan una sola vez al final,
+  no tras cada entrenamiento (suspend_stats_updates)
+- Los archivos que el usuario ya tenía (mismo SHA-256) se omiten, así
+  que repetir una importación no duplica entrenamientos
+"""
+
+import hashlib
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, connections
+
+from stats.updates import refresh_user_stats, suspend_stats_updates
+from users.models import User
+
+from .dedup import find_duplicate
+from .models import Training
+from .parsers.compression import split_compression
+from .serializers import TrainingSerializer
+from .uploads import HASH_CHUNK_SIZE, SUPPORTED_UPLOAD_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Valores por defecto si no se configuran en settings
+DEFAULT_ARCHIVE_MAX_MEMBERS = 10000
+DEFAULT_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+
+
+def _init_worker():
+    """Inicializa Django en los procesos hijo que no lo heredan (arranque spawn)"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _is_activity_file(info):
+    """Indica si una entrada del zip es un archivo de actividad importable"""
+    if info.is_dir():
+        return False
+    name = info.filename
+    base_name = os.path.basename(name)
+    # Metadatos de macOS y archivos ocultos
+    if name.startswith('__MACOSX/') or base_name.startswith('.'):
+        return False
+    return split_compression(base_name.lower())[0].endswith(SUPPORTED_UPLOAD_EXTENSIONS)
+
+
+def list_archive_members(archive_path):
+    """
+    Devuelve los nombres de los archivos de actividad del zip.
+
+    Raises:
+        ValueError: si no es un zip válido, no contiene actividades o
+        supera los límites de número de archivos o tamaño
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [info for info in archive.infolist() if _is_activity_file(info)]
+    except zipfile.BadZipFile:
+        raise ValueError("El archivo no es un zip válido")
+
+    if not members:
+        raise ValueError("El zip no contiene archivos GPX, TCX o FIT")
+
+    max_members = getattr(settings, 'TRAINING_ARCHIVE_MAX_MEMBERS', DEFAULT_ARCHIVE_MAX_MEMBERS)
+    if len(members) > max_members:
+        raise ValueError(f"El zip contiene {len(members)} actividades (máximo {max_members})")
+
+    # Tamaño descomprimido declarado (zipfile no entrega más bytes que estos)
+    max_size = getattr(settings, 'TRAINING_UPLOAD_MAX_SIZE', DEFAULT_UPLOAD_MAX_SIZE)
+    for info in members:
+        if info.file_size > max_size:
+            raise ValueError(f"{info.filename} supera el tamaño máximo de {max_size} bytes")
+
+    return [info.filename for info in members]
+
+
+def _hash_member(archive, info):
+    sha256 = hashlib.sha256()
+    with archive.open(info) as stream:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def import_member(user, archive, member_name, activity_type=None):
+    """
+    Crea un entrenamiento a partir de un archivo del zip.
+
+    Returns:
+        dict con el resultado ('ok', 'error' u 'omitido' si el usuario ya
+        tenía ese archivo)
+    """
+    info = archive.getinfo(member_name)
+    base_name = os.path.basename(member_name)
+    resultado = {'archivo': member_name, 'pid': os.getpid(), 'estado': 'ok', 'id': None, 'fecha': None, 'puntos': 0}
+
+    file_hash = _hash_member(archive, info)
+    duplicate = find_duplicate(user, file_hash, processed=False)
+    if duplicate is not None:
+        resultado.update(estado='omitido', id=duplicate.id, mensaje=f"Ya importado (entrenamiento {duplicate.id})")
+        return resultado
+
+    title = split_compression(base_name)[0].rsplit('.', 1)[0][:100]
+    data = {'title': title}
+    if activity_type:
+        data['activity_type'] = activity_type
+
+    with archive.open(info) as stream:
+        upload = File(stream, name=base_name)
+        # Sin esto, Django calcularía el tamaño recorriendo todo el archivo
+        upload.size = info.file_size
+        upload.content_hash = file_hash
+        data['gpx_file'] = upload
+
+        serializer = TrainingSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        training = serializer.save(user=user)
+
+    resultado['id'] = training.id
+    resultado['fecha'] = training.date.isoformat() if training.date else None
+    if training.processing_error:
+        resultado.update(estado='error', mensaje=training.processing_error)
+    else:
+        resultado['puntos'] = training.track_points.count()
+    return resultado
+
+
+def import_batch(user_id, archive_path, member_names, activity_type=None):
+    """
+    Importa un lote de archivos del zip (se ejecuta en un proceso hijo).
+
+    Un error en un archivo no impide importar el resto del lote.
+    """
+    user = User.objects.get(pk=user_id)
+    resultados = []
+    with zipfile.ZipFile(archive_path) as archive, suspend_stats_updates():
+        for member_name in member_names:
+            try:
+                resultados.append(import_member(user, archive, member_name, activity_type))
+            except Exception as e:
+                logger.warning(f"Error importando {member_name}: {e}")
+                resultados.append({
+                    'archivo': member_name, 'pid': os.getpid(), 'estado': 'error',
+                    'id': None, 'fecha': None, 'puntos': 0, 'mensaje': str(e),
+                })
+    return resultados
+
+
+def import_archive(user, archive_path, workers=1, batch_size=10, activity_type=None, on_result=None):
+    """
+    Importa todos los archivos de actividad de un zip.
+
+    Args:
+        workers: procesos en paralelo (con SQLite siempre 1)
+        batch_size: archivos por lote enviado a cada proceso
+        on_result: función (resultado, hechos, total) llamada tras cada archivo
+
+    Returns:
+        dict con total, importados, omitidos, errores y el resultado de cada archivo
+
+    Raises:
+        ValueError: si el zip no es válido (ver list_archive_members)
+    """
+    members = list_archive_members(archive_path)
+    total = len(members)
+    batch_size = max(1, batch_size)
+    lotes = [members[i:i + batch_size] for i in range(0, total, batch_size)]
+
+    if workers > 1 and connection.vendor == 'sqlite':
+        logger.warning("SQLite no admite escrituras concurrentes: se usará un solo proceso")
+        workers = 1
+
+    logger.info(f"Importando {total} archivos de {archive_path} ({workers} procesos)")
+    resultados = []
+
+    def registrar(resultados_lote):
+        for resultado in resultados_lote:
+            resultados.append(resultado)
+            if on_result:
+                on_result(resultado, len(resultados), total)
+
+    try:
+        if workers > 1:
+            # Cada hijo debe abrir su propia conexión: no heredar la del padre
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futuros = {
+                    pool.submit(import_batch, user.pk, archive_path, lote, activity_type): lote
+                    for lote in lotes
+                }
+                for futuro in as_completed(futuros):
+                    try:
+                        registrar(futuro.result())
+                    except BrokenProcessPool:
+                        registrar([
+                            {'archivo': name, 'pid': None, 'estado': 'error', 'id': None, 'fecha': None,
+                             'puntos': 0, 'mensaje': "El proceso que lo importaba terminó inesperadamente"}
+                            for name in futuros[futuro]
+                        ])
+        else:
+            for lote in lotes:
+                registrar(import_batch(user.pk, archive_path, lote, activity_type))
+    finally:
+        fechas = {
+            fecha for fecha in Training.objects.filter(
+                pk__in=[r['id'] for r in resultados if r['id'] and r['estado'] != 'omitido']
+            ).values_list('date', flat=True)
+            if fecha is not None
+        }
+        refresh_user_stats(user, fechas)
+
+    resumen = {
+        'total': total,
+        'importados': sum(1 for r in resultados if r['estado'] == 'ok'),
+        'omitidos': sum(1 for r in resultados if r['estado'] == 'omitido'),
+        'errores': sum(1 for r in resultados if r['estado'] == 'error'),
+        'archivos': resultados,
+    }
+    logger.info(
+        f"Importación terminada: {resumen['importados']} importados, "
+        f"{resumen['omitidos']} omitidos, {resumen['errores']} con errores"
+    )
+    return resumen
@@ -0,0 +1,81 @@
+"""
+Deduplicación de archivos de actividad por hash de contenido.
+
+Los clientes móviles suelen volver a subir el mismo GPX/TCX/FIT. Cada
+entrenamiento guarda el SHA-256 de su archivo (Training.file_hash); si el
+mismo usuario ya tiene un entrenamiento procesado con ese hash, se copian
+sus métricas (también el tiempo en zonas), sus puntos de ruta y sus
+mejores esfuerzos en lugar de volver a analizar el archivo y,
+opcionalmente (TRAINING_DEDUP_REUSE_FILE), se reutiliza el archivo ya
+guardado en lugar de almacenar otra copia.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .efforts import copy_best_efforts
+from .ingestion import copy_track_points
+from .models import HR_ZONE_FIELDS, Training, TrackPoint
+
+logger = logging.getLogger(__name__)
+
+# Campos de Training que se obtienen del archivo al procesarlo
+PARSED_FIELDS = (
+    'date', 'start_time', 'duration', 'distance',
+    'avg_speed', 'max_speed', 'avg_heart_rate', 'max_heart_rate',
+    'elevation_gain', 'calories',
+    'avg_cadence', 'max_cadence',
+    'avg_temperature', 'min_temperature', 'max_temperature',
+    'hr_zones_max_hr',
+) + HR_ZONE_FIELDS
+
+
+def reuse_stored_files():
+    """Indica si los duplicados comparten el archivo ya guardado"""
+    return getattr(settings, 'TRAINING_DEDUP_REUSE_FILE', True)
+
+
+def find_duplicate(user, file_hash, exclude=None, processed=True):
+    """
+    Busca el entrenamiento más reciente del usuario con el mismo archivo.
+
+    Args:
+        processed: si es True, solo entrenamientos procesados sin errores
+    """
+    if not file_hash:
+        return None
+
+    queryset = Training.objects.filter(user=user, file_hash=file_hash)
+    if processed:
+        queryset = queryset.filter(file_processed=True, processing_error__isnull=True)
+    if exclude is not None:
+        queryset = queryset.exclude(pk=exclude.pk)
+    return queryset.order_by('-id').first()
+
+
+def reuse_processed_result(training, source):
+    """
+    Copia al entrenamiento las métricas, los puntos de ruta y los mejores
+    esfuerzos de otro ya procesado con el mismo archivo, en una sola transacción.
+
+    Returns:
+        int: número de puntos copiados
+    """
+    with transaction.atomic():
+        TrackPoint.objects.filter(training=training).delete()
+        count = copy_track_points(source, training)
+        copy_best_efforts(source, training)
+
+        for field in PARSED_FIELDS:
+            setattr(training, field, getattr(source, field))
+        training.file_processed = True
+        training.processing_error = None
+        training.save()
+
+    logger.info(
+        f"Entrenamiento {training.id}: reutilizado el resultado del {source.id} "
+        f"(mismo archivo, {count} puntos)"
+    )
+    return count
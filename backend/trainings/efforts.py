@@ -0,0 +1,257 @@
+"""
+Mejores esfuerzos de cada entrenamiento (récords personales).
+
+Los únicos récords de UserStats son máximos del entrenamiento completo
+(distancia más larga, velocidad más alta). Para los récords reales hace
+falta el mejor tramo de cada actividad, que se busca al procesar el
+archivo sobre el perfil de la ruta (distancia acumulada y tiempo de cada
+punto, TrackMetrics.profile):
+- El menor tiempo en cubrir cada distancia estándar (1 km ... maratón)
+- La mayor distancia recorrida en cada duración estándar (5, 20, 60 min)
+- La subida más larga (mayor desnivel positivo sin bajar más de
+  CLIMB_TOLERANCE_M desde la cima)
+
+Cada búsqueda es una ventana deslizante con dos punteros sobre arrays
+ordenados: O(n) por distancia o duración. Los resultados se guardan en
+BestEffort, así que los récords de todo el historial de un usuario salen
+de una sola consulta sobre el índice (user, effort, ranking).
+"""
+
+import datetime
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .metrics import TrackMetrics, columns_from_records
+from .models import BestEffort, TrackPoint
+
+logger = logging.getLogger(__name__)
+
+# Distancias estándar en metros
+EFFORT_DISTANCES = {
+    '1k': 1000,
+    '5k': 5000,
+    '10k': 10000,
+    'half_marathon': 21097.5,
+    'marathon': 42195,
+}
+
+# Duraciones estándar en segundos
+EFFORT_DURATIONS = {
+    '5min': 5 * 60,
+    '20min': 20 * 60,
+    '60min': 60 * 60,
+}
+
+CLIMB_EFFORT = 'longest_climb'
+
+# Bajada (metros) desde la cima que da por terminada una subida
+CLIMB_TOLERANCE_M = 10.0
+
+
+def best_window(axis, values, target, maximize):
+    """
+    Mejor ventana de longitud target sobre axis (dos punteros).
+
+    Para cada punto final j el inicio i avanza mientras la ventana siga
+    cubriendo target, así que cada puntero recorre los puntos una sola
+    vez. El inicio exacto se interpola entre i e i + 1 para que la ventana
+    mida exactamente target.
+
+    Args:
+        axis: array no decreciente sobre el que se mide la ventana
+            (distancia para las distancias, tiempo para las duraciones)
+        values: array no decreciente que se mide dentro de la ventana
+        maximize: buscar el mayor incremento de values (si no, el menor)
+
+    Returns:
+        (incremento de values, valor de values al inicio, índice final) o
+        None si la ruta no llega a target
+    """
+    n = len(axis)
+    if n < 2 or axis[-1] - axis[0] < target:
+        return None
+
+    axis = axis.tolist()
+    values = values.tolist()
+    mejor = None
+    i = 0
+    for j in range(1, n):
+        # Adelantar el inicio mientras la ventana siga cubriendo target
+        while axis[j] - axis[i + 1] >= target:
+            i += 1
+        cubierto = axis[j] - axis[i]
+        if cubierto < target:
+            continue
+
+        tramo = axis[i + 1] - axis[i]
+        fraccion = (cubierto - target) / tramo if tramo > 0 else 0.0
+        inicio = values[i] + (values[i + 1] - values[i]) * fraccion
+        incremento = values[j] - inicio
+        if mejor is None or (incremento > mejor[0] if maximize else incremento < mejor[0]):
+            mejor = (incremento, inicio, j)
+    return mejor
+
+
+def longest_climb(distance, time, ele, tolerance=CLIMB_TOLERANCE_M):
+    """
+    Subida con mayor desnivel: desde un mínimo hasta la cima más alta antes
+    de bajar más de tolerance metros (las bajadas menores son ruido del GPS
+    o descansillos). Un solo recorrido de los puntos.
+
+    Returns:
+        (desnivel, índice inicial, índice de la cima) sobre los puntos con
+        elevación, o None si no hay subida
+    """
+    con_elevacion = np.isfinite(ele)
+    indices = np.flatnonzero(con_elevacion).tolist()
+    ele = ele[con_elevacion].tolist()
+    if len(ele) < 2:
+        return None
+
+    mejor = None
+    base = cima = 0
+    for k in range(1, len(ele)):
+        if ele[k] > ele[cima]:
+            cima = k
+        elif ele[k] < ele[base] or ele[k] < ele[cima] - tolerance:
+            # Fin de la subida (o todavía bajando): se empieza otra desde aquí
+            if cima > base and (mejor is None or ele[cima] - ele[base] > mejor[0]):
+                mejor = (ele[cima] - ele[base], indices[base], indices[cima])
+            base = cima = k
+    if cima > base and (mejor is None or ele[cima] - ele[base] > mejor[0]):
+        mejor = (ele[cima] - ele[base], indices[base], indices[cima])
+    return mejor
+
+
+def compute_best_efforts(profile):
+    """
+    Busca los mejores esfuerzos de una ruta.
+
+    Args:
+        profile: dict con arrays distance (metros acumulados), time
+            (segundos) y ele, como el de TrackMetrics.profile()
+
+    Returns:
+        lista de dict con effort, elapsed_time (s), distance (m),
+        elevation_gain (m, solo subidas), start_offset (s) y ranking
+    """
+    distance, time, ele = profile['distance'], profile['time'], profile['ele']
+    if len(time) < 2:
+        return []
+
+    # Los punteros necesitan ejes no decrecientes (tiempos desordenados en el archivo)
+    time = np.maximum.accumulate(time)
+    inicio = time[0]
+    esfuerzos = []
+
+    for effort, metros in EFFORT_DISTANCES.items():
+        ventana = best_window(distance, time, metros, maximize=False)
+        if ventana is not None:
+            segundos, comienzo, _ = ventana
+            esfuerzos.append({
+                'effort': effort, 'elapsed_time': segundos, 'distance': metros,
+                'start_offset': comienzo - inicio, 'ranking': segundos,
+            })
+
+    for effort, segundos in EFFORT_DURATIONS.items():
+        ventana = best_window(time, distance, segundos, maximize=True)
+        if ventana is not None and ventana[0] > 0:
+            metros, _, fin = ventana
+            esfuerzos.append({
+                'effort': effort, 'elapsed_time': segundos, 'distance': metros,
+                'start_offset': time[fin] - segundos - inicio, 'ranking': -metros,
+            })
+
+    subida = longest_climb(distance, time, ele)
+    if subida is not None:
+        desnivel, desde, hasta = subida
+        esfuerzos.append({
+            'effort': CLIMB_EFFORT, 'elapsed_time': time[hasta] - time[desde],
+            'distance': distance[hasta] - distance[desde], 'elevation_gain': desnivel,
+            'start_offset': time[desde] - inicio, 'ranking': -desnivel,
+        })
+
+    return esfuerzos
+
+
+def save_best_efforts(training, profile):
+    """
+    Calcula y guarda los mejores esfuerzos de un entrenamiento, sustituyendo
+    los que tuviera.
+
+    Returns:
+        int: número de esfuerzos guardados
+    """
+    esfuerzos = [
+        BestEffort(
+            training=training,
+            user_id=training.user_id,
+            effort=esfuerzo['effort'],
+            elapsed_time=datetime.timedelta(seconds=float(esfuerzo['elapsed_time'])),
+            distance=float(esfuerzo['distance']) / 1000,  # Convertir a km
+            elevation_gain=esfuerzo.get('elevation_gain'),
+            start_offset=datetime.timedelta(seconds=float(esfuerzo['start_offset'])),
+            ranking=float(esfuerzo['ranking']),
+        )
+        for esfuerzo in compute_best_efforts(profile)
+    ]
+    with transaction.atomic():
+        BestEffort.objects.filter(training=training).delete()
+        BestEffort.objects.bulk_create(esfuerzos)
+
+    logger.debug(f"Entrenamiento {training.id}: {len(esfuerzos)} mejores esfuerzos")
+    return len(esfuerzos)
+
+
+def recompute_best_efforts(training, batch_size=5000):
+    """
+    Vuelve a calcular los esfuerzos de un entrenamiento desde sus puntos
+    guardados, por bloques (entrenamientos procesados antes de existir
+    BestEffort).
+    """
+    metrics = TrackMetrics(keep_profile=True)
+    puntos = TrackPoint.objects.filter(training=training).order_by('time').values(
+        'time', 'latitude', 'longitude', 'elevation',
+    )
+    bloque = []
+    for punto in puntos.iterator(chunk_size=batch_size):
+        bloque.append(punto)
+        if len(bloque) >= batch_size:
+            metrics.add(**columns_from_records(bloque))
+            bloque = []
+    if bloque:
+        metrics.add(**columns_from_records(bloque))
+    return save_best_efforts(training, metrics.profile())
+
+
+def copy_best_efforts(source, target):
+    """Copia los esfuerzos de otro entrenamiento con el mismo archivo (deduplicación)"""
+    esfuerzos = list(BestEffort.objects.filter(training=source))
+    for esfuerzo in esfuerzos:
+        esfuerzo.pk = None
+        esfuerzo.training = target
+        esfuerzo.user_id = target.user_id
+    with transaction.atomic():
+        BestEffort.objects.filter(training=target).delete()
+        BestEffort.objects.bulk_create(esfuerzos)
+    return len(esfuerzos)
+
+
+def personal_records(user, activity_type=None):
+    """
+    Récord del usuario en cada esfuerzo: el primero de cada tipo según
+    ranking, en una sola consulta sobre el índice (user, effort, ranking).
+
+    Args:
+        activity_type: solo los entrenamientos de ese tipo de actividad
+    """
+    esfuerzos = BestEffort.objects.filter(user=user)
+    if activity_type:
+        esfuerzos = esfuerzos.filter(training__activity_type=activity_type)
+    return esfuerzos.annotate(
+        posicion=Window(RowNumber(), partition_by=[F('effort')], order_by=[F('ranking').asc(), F('id').asc()]),
+    ).filter(posicion=1).select_related('training')
@@ -12,10 +12,16 @@ Fecha: Mayo 2025
 
 import requests
 import logging
+import numpy as np
 from django.conf import settings
 import json
 from typing import Dict, Optional, List, Tuple
 
+from .metrics import haversine, to_column, to_timestamps
+from .parsers.compression import open_decompressed, spool_decompressed
+from .parsers.registry import detect_format
+from .uploads import upload_max_size
+
 logger = logging.getLogger('trainings')
 
 class StravaAPI:
@@ -159,9 +165,9 @@ class FileValidator:
         return len(errors) == 0, errors
     
     @staticmethod
-    def validate_fit_file(file_path: str) -> Tuple[bool, List[str]]:
+    def validate_fit_file(file_path) -> Tuple[bool, List[str]]:
         """
-        Valida un archivo FIT usando fitparse.
+        Valida un archivo FIT usando fitparse (ruta u objeto archivo binario).
         """
         try:
             import fitparse
@@ -217,17 +223,15 @@ class DataEnricher:
         if len(track_points) < 2:
             return 0
         
-        total_gain = 0
-        prev_elevation = None
+        elevations = to_column([point.get('elevation') for point in track_points])
+        prev_elevation, elevation = elevations[:-1], elevations[1:]
         
-        for point in track_points:
-            elevation = point.get('elevation')
-            if elevation and prev_elevation:
-                if elevation > prev_elevation:
-                    total_gain += elevation - prev_elevation
-            prev_elevation = elevation
+        # Solo cuentan las subidas entre dos puntos consecutivos con elevación
+        with np.errstate(invalid='ignore'):
+            valid = (prev_elevation > 0) | (prev_elevation < 0)
+            valid &= ((elevation > 0) | (elevation < 0)) & (elevation > prev_elevation)
         
-        return total_gain
+        return float((elevation[valid] - prev_elevation[valid]).sum())
     
     @staticmethod
     def calculate_speeds(track_points: List[Dict]) -> Tuple[float, float]:
@@ -237,38 +241,21 @@ class DataEnricher:
         if len(track_points) < 2:
             return 0, 0
         
-        speeds = []
+        lat = to_column([point.get('latitude', 0) for point in track_points])
+        lon = to_column([point.get('longitude', 0) for point in track_points])
+        times = to_timestamps([point.get('time') for point in track_points])
         
-        for i in range(1, len(track_points)):
-            prev_point = track_points[i-1]
-            curr_point = track_points[i]
-            
-            # Calcular distancia usando fórmula de Haversine
-            distance = DataEnricher._haversine_distance(
-                prev_point.get('latitude', 0),
-                prev_point.get('longitude', 0),
-                curr_point.get('latitude', 0),
-                curr_point.get('longitude', 0)
-            )
-            
-            # Calcular tiempo transcurrido
-            prev_time = prev_point.get('time')
-            curr_time = curr_point.get('time')
-            
-            if prev_time and curr_time and distance > 0:
-                time_diff = (curr_time - prev_time).total_seconds()
-                if time_diff > 0:
-                    speed_ms = distance / time_diff
-                    speed_kmh = speed_ms * 3.6
-                    speeds.append(speed_kmh)
+        # Distancia (fórmula de Haversine) y tiempo entre puntos consecutivos
+        distance = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        with np.errstate(invalid='ignore'):
+            time_diff = times[1:] - times[:-1]
+            valid = (distance > 0) & (time_diff > 0)
         
-        if not speeds:
+        if not valid.any():
             return 0, 0
         
-        avg_speed = sum(speeds) / len(speeds)
-        max_speed = max(speeds)
-        
-        return avg_speed, max_speed
+        speeds = distance[valid] / time_diff[valid] * 3.6  # km/h
+        return float(speeds.mean()), float(speeds.max())
     
     @staticmethod
     def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -276,28 +263,7 @@ class DataEnricher:
         Calcula la distancia entre dos puntos GPS usando la fórmula de Haversine.
         Devuelve distancia en metros.
         """
-        import math
-        
-        # Radio de la Tierra en metros
-        R = 6371000
-        
-        # Convertir grados a radianes
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # Diferencias
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        # Fórmula de Haversine
-        a = (math.sin(dlat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
+        return float(haversine(lat1, lon1, lat2, lon2))
 
 # Funciones de utilidad para usar en el serializador
 
@@ -357,32 +323,34 @@ def validate_uploaded_file(file_obj, filename: str) -> Tuple[bool, List[str]]:
         Tuple[bool, List[str]]: (es_válido, lista_errores)
     """
     try:
-        file_obj.seek(0)
-        content = file_obj.read()
+        try:
+            handler, codec = detect_format(file_obj, filename)
+        except ValueError:
+            return False, [f"Tipo de archivo no soportado: {filename}"]
         
-        if filename.lower().endswith('.gpx'):
+        if handler.name == 'fit':
+            # fitparse lee de un objeto archivo: el FIT comprimido se descomprime a un temporal en disco
+            if codec:
+                with spool_decompressed(file_obj, codec, max_size=upload_max_size()) as spooled:
+                    return FileValidator.validate_fit_file(spooled)
+            file_obj.seek(0)
+            return FileValidator.validate_fit_file(file_obj)
+        
+        if codec:
+            with open_decompressed(file_obj, codec, max_size=upload_max_size()) as stream:
+                content = stream.read()
+        else:
+            file_obj.seek(0)
+            content = file_obj.read()
+        
+        if handler.name == 'gpx':
             content_str = content.decode('utf-8')
             return FileValidator.validate_gpx_structure(content_str)
         
-        elif filename.lower().endswith('.tcx'):
+        elif handler.name == 'tcx':
             content_str = content.decode('utf-8')
             return FileValidator.validate_tcx_structure(content_str)
         
-        elif filename.lower().endswith('.fit'):
-            # Para FIT necesitamos escribir a archivo temporal
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.fit', delete=False) as tmp_file:
-                tmp_file.write(content)
-                tmp_file.flush()
-                
-                result = FileValidator.validate_fit_file(tmp_file.name)
-                
-                # Limpiar archivo temporal
-                import os
-                os.unlink(tmp_file.name)
-                
-                return result
-        
         else:
             return False, [f"Tipo de archivo no soportado: {filename}"]
     
@@ -0,0 +1,247 @@
+"""
+Escritura por lotes de puntos de ruta durante la ingesta de archivos.
+
+Este módulo centraliza cómo se guardan los TrackPoint extraídos de
+archivos GPX/TCX/FIT:
+- TrackPointRecord: registro compacto (tupla) con los datos de un punto
+- TrackPointWriter: acumula puntos y los inserta con bulk_create por lotes
+- CopyTrackPointWriter: carga los puntos con COPY ... FROM STDIN en PostgreSQL
+- save_track_points: atajo para guardar un iterable de puntos de una vez
+- copy_track_points: duplica los puntos de otro entrenamiento (INSERT ... SELECT)
+
+Todos los lotes de un mismo archivo se escriben dentro de una única
+transacción, de modo que un fallo a mitad no deja rutas a medias.
+"""
+
+import datetime
+import io
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TrackPoint
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de lote por defecto si no se configura TRACKPOINT_BATCH_SIZE
+DEFAULT_BATCH_SIZE = 2000
+
+# Campos de un punto en el mismo orden que las columnas de TrackPoint
+TRACKPOINT_FIELDS = (
+    'time', 'latitude', 'longitude', 'elevation',
+    'heart_rate', 'speed', 'cadence', 'temperature',
+)
+
+TrackPointRecord = namedtuple(
+    'TrackPointRecord', TRACKPOINT_FIELDS, defaults=(None,) * len(TRACKPOINT_FIELDS)
+)
+TrackPointRecord.__doc__ = "Datos de un punto de ruta sin instanciar el modelo"
+
+
+def get_batch_size():
+    """Devuelve el tamaño de lote configurado para insertar puntos"""
+    return max(1, int(getattr(settings, 'TRACKPOINT_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+
+
+class TrackPointWriter:
+    """
+    Acumula puntos de ruta y los inserta en la base de datos por lotes.
+
+    Se usa como gestor de contexto: abre una transacción al entrar,
+    vuelca el último lote al salir y deshace todo si hay una excepción.
+
+        with TrackPointWriter(training) as writer:
+            for record in records:
+                writer.add(record)
+    """
+
+    def __init__(self, training, batch_size=None):
+        self.training = training
+        self.batch_size = batch_size or get_batch_size()
+        self.count = 0
+        self._pending = []
+        self._atomic = None
+
+    def __enter__(self):
+        self._atomic = transaction.atomic()
+        self._atomic.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            atomic, self._atomic = self._atomic, None
+            # Propaga la excepción (si la hay) a atomic para que haga rollback
+            atomic.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def add(self, record):
+        """Añade un punto (TrackPointRecord) y vuelca el lote si está lleno"""
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, records):
+        """Añade varios puntos de una vez"""
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        """Inserta en la base de datos los puntos pendientes"""
+        if not self._pending:
+            return
+
+        training = self.training
+        points = []
+        for record in self._pending:
+            point = TrackPoint(training=training, **record._asdict())
+            point.time = utc_time(point.time)
+            points.append(point)
+        TrackPoint.objects.bulk_create(points, batch_size=self.batch_size)
+        self.count += len(self._pending)
+        self._pending = []
+
+
+def utc_time(value):
+    """
+    Fecha de un punto lista para guardar: las que no traen zona horaria se
+    interpretan como UTC, igual que al calcular las métricas
+    (metrics.to_timestamps) y en el decodificador FIT.
+    """
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def _copy_time(value):
+    """Formatea una fecha para COPY (naive -> UTC, ver utc_time)"""
+    return utc_time(value).isoformat()
+
+
+def _copy_int(value):
+    return str(int(value))
+
+
+# Un formateador por campo de TrackPointRecord (mismo orden que TRACKPOINT_FIELDS)
+_COPY_FORMATTERS = (_copy_time, str, str, str, _copy_int, str, str, str)
+_COPY_NULL = '\\N'
+
+
+class CopyTrackPointWriter(TrackPointWriter):
+    """
+    Escritor de puntos que usa COPY ... FROM STDIN (psycopg2 copy_expert).
+
+    Las filas se escriben directamente como texto en un buffer a partir de
+    las tuplas TrackPointRecord, sin crear instancias del modelo ni
+    diccionarios intermedios. Cada lote lleno se envía con un único COPY.
+    """
+
+    def __init__(self, training, batch_size=None):
+        super().__init__(training, batch_size=batch_size)
+        self._buffer = io.StringIO()
+        self._rows = 0
+        self._row_prefix = f"{training.pk}\t"
+        self._sql = self._copy_sql()
+
+    @staticmethod
+    def _copy_sql():
+        opts = TrackPoint._meta
+        quote = connection.ops.quote_name
+        columns = [opts.get_field('training').column]
+        columns += [opts.get_field(name).column for name in TRACKPOINT_FIELDS]
+        return "COPY {} ({}) FROM STDIN".format(
+            quote(opts.db_table), ', '.join(quote(column) for column in columns)
+        )
+
+    def add(self, record):
+        """Serializa el punto en el buffer y vuelca el lote si está lleno"""
+        write = self._buffer.write
+        write(self._row_prefix)
+        write('\t'.join(
+            _COPY_NULL if value is None else formatter(value)
+            for formatter, value in zip(_COPY_FORMATTERS, record)
+        ))
+        write('\n')
+        self._rows += 1
+        if self._rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Envía el buffer pendiente a PostgreSQL con un único COPY"""
+        if not self._rows:
+            return
+
+        self._buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(self._sql, self._buffer)
+
+        self.count += self._rows
+        self._rows = 0
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+
+def copy_available():
+    """Indica si la conexión actual permite cargar puntos con COPY (PostgreSQL + psycopg2)"""
+    if not getattr(settings, 'TRACKPOINT_USE_COPY', True):
+        return False
+    if connection.vendor != 'postgresql':
+        return False
+
+    connection.ensure_connection()
+    return type(connection.connection).__module__.startswith('psycopg2')
+
+
+def get_track_point_writer(training, batch_size=None):
+    """
+    Devuelve el escritor de puntos adecuado para este entrenamiento.
+
+    En PostgreSQL con psycopg2 se usa COPY; en el resto de bases de datos
+    (o si se desactiva TRACKPOINT_USE_COPY) se usa bulk_create por lotes.
+    """
+    if copy_available():
+        return CopyTrackPointWriter(training, batch_size=batch_size)
+    return TrackPointWriter(training, batch_size=batch_size)
+
+
+def save_track_points(training, records, batch_size=None):
+    """
+    Guarda un iterable de TrackPointRecord en una sola transacción.
+
+    Returns:
+        int: número de puntos insertados
+    """
+    with get_track_point_writer(training, batch_size=batch_size) as writer:
+        writer.extend(records)
+
+    logger.debug(f"Guardados {writer.count} puntos para el entrenamiento {training.id}")
+    return writer.count
+
+
+def copy_track_points(source, target):
+    """
+    Copia los puntos de ruta de un entrenamiento a otro con un único
+    INSERT ... SELECT, sin traer los puntos a Python.
+
+    Returns:
+        int: número de puntos copiados
+    """
+    opts = TrackPoint._meta
+    quote = connection.ops.quote_name
+    training_column = quote(opts.get_field('training').column)
+    columns = ', '.join(quote(opts.get_field(name).column) for name in TRACKPOINT_FIELDS)
+
+    sql = "INSERT INTO {table} ({training}, {columns}) SELECT %s, {columns} FROM {table} WHERE {training} = %s".format(
+        table=quote(opts.db_table), training=training_column, columns=columns,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [target.pk, source.pk])
+        count = cursor.rowcount
+
+    logger.debug(f"Copiados {count} puntos del entrenamiento {source.id} al {target.id}")
+    return count
@@ -0,0 +1,74 @@
+"""
+Carga de cada entrenamiento (TRIMP).
+
+La carga se guarda en Training.load_score al guardar el entrenamiento y
+alimenta las curvas de forma física, fatiga y estado de forma
+(stats.load):
+- Con muestras de ritmo cardíaco se usa el TRIMP de Edwards: los minutos
+  en cada zona (trainings.zones) por el número de la zona
+- Sin ellas, la duración por una intensidad: la zona del ritmo cardíaco
+  medio si se conoce, o una intensidad por defecto según el tipo de
+  actividad
+"""
+
+import numpy as np
+
+from .models import HR_ZONE_FIELDS
+from .zones import HR_ZONE_LIMITS, max_heart_rate
+
+# Peso de cada zona en el TRIMP de Edwards (zona 1 ... zona 5)
+ZONE_WEIGHTS = (1, 2, 3, 4, 5)
+
+# Carga por minuto cuando no hay datos de ritmo cardíaco
+ACTIVITY_INTENSITY = {
+    'running': 3.0,
+    'cycling': 2.5,
+    'swimming': 3.0,
+    'walking': 1.5,
+    'hiking': 2.0,
+    'other': 2.0,
+}
+DEFAULT_INTENSITY = 2.0
+
+# Carga por minuto con el ritmo cardíaco medio por debajo de la zona 1
+BELOW_ZONES_INTENSITY = 0.5
+
+# Campos de Training de los que depende la carga
+LOAD_SOURCE_FIELDS = ('duration', 'activity_type', 'avg_heart_rate', 'hr_zones_max_hr') + HR_ZONE_FIELDS
+
+
+def zone_intensity(heart_rate, max_hr):
+    """Carga por minuto de un ritmo cardíaco: el peso de su zona"""
+    zona = int(np.searchsorted(np.array(HR_ZONE_LIMITS) * max_hr, heart_rate, side='right'))
+    return float(ZONE_WEIGHTS[zona - 1]) if zona else BELOW_ZONES_INTENSITY
+
+
+def training_load(training, max_hr=None):
+    """
+    Carga (TRIMP) de un entrenamiento.
+
+    Args:
+        max_hr: FC máxima a usar con el ritmo cardíaco medio (por defecto,
+            la de las zonas o la del usuario en la fecha del entrenamiento)
+
+    Returns:
+        float: carga del entrenamiento (0 si no tiene duración ni zonas)
+    """
+    segundos = [getattr(training, campo) or 0 for campo in HR_ZONE_FIELDS]
+    if any(segundos):
+        return round(sum(peso * valor / 60 for peso, valor in zip(ZONE_WEIGHTS, segundos)), 1)
+
+    if not training.duration:
+        return 0.0
+    minutos = training.duration.total_seconds() / 60
+
+    if training.avg_heart_rate:
+        if max_hr is None:
+            max_hr = training.hr_zones_max_hr
+        if max_hr is None and training.user_id is not None:
+            max_hr = max_heart_rate(training.user, training.date)
+        if max_hr:
+            return round(minutos * zone_intensity(training.avg_heart_rate, max_hr), 1)
+
+    intensidad = ACTIVITY_INTENSITY.get(training.activity_type, DEFAULT_INTENSITY)
+    return round(minutos * intensidad, 1)
@@ -0,0 +1,543 @@
+"""
+Comando para medir el rendimiento de la ingesta de puntos de ruta.
+
+Objetivos disponibles (--target):
+- writer: inserción punto a punto (TrackPoint.objects.create) frente al
+  escritor por lotes (bulk_create) y, en PostgreSQL, la carga con COPY
+- tcx: tcxparser.TCXParser frente al lector de una pasada TCXReader sobre
+  archivos TCX sintéticos con varias vueltas
+- fit: recorrido de todos los mensajes con fitparse (procesador anterior)
+  frente a FITReader (solo record/session/lap, lectura con mmap) sobre un
+  archivo FIT sintético a 1 Hz con mensajes de dispositivo, HRV y eventos
+- metrics: cálculo de métricas de la ruta punto a punto en Python (como el
+  procesador GPX anterior) frente a TrackMetrics (NumPy), comprobando que
+  ambos resultados coinciden
+
+Uso:
+python manage.py benchmark_ingestion
+python manage.py benchmark_ingestion --points 1000 10000 100000
+python manage.py benchmark_ingestion --points 100000 --skip-baseline
+python manage.py benchmark_ingestion --batch-size 5000
+python manage.py benchmark_ingestion --target tcx --points 10000 100000 --laps 20
+python manage.py benchmark_ingestion --target fit --points 14400
+python manage.py benchmark_ingestion --target metrics --points 100000
+"""
+
+import datetime
+import math
+import os
+import struct
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trainings.ingestion import (
+    CopyTrackPointWriter, TrackPointRecord, TrackPointWriter, copy_available, get_batch_size,
+)
+from trainings.metrics import TrackMetrics, columns_from_records
+from trainings.models import Training, TrackPoint
+from trainings.parsers.fit import FITReader, open_fit_source
+from trainings.parsers.tcx import TCXReader
+from users.models import User
+
+
+def synthetic_records(count, start=None):
+    """Genera una ruta sintética de `count` puntos separados un segundo"""
+    start = start or timezone.now().replace(microsecond=0)
+    for i in range(count):
+        yield TrackPointRecord(
+            time=start + datetime.timedelta(seconds=i),
+            latitude=40.4168 + i * 1e-5,
+            longitude=-3.7038 + i * 1e-5,
+            elevation=650.0 + (i % 200) * 0.5,
+            heart_rate=120 + i % 60,
+            speed=10.0 + (i % 30) * 0.1,
+            cadence=80.0 + i % 10,
+            temperature=18.0,
+        )
+
+
+def write_synthetic_tcx(path, count, laps):
+    """Escribe un TCX sintético de `count` puntos repartidos en `laps` vueltas"""
+    puntos_por_vuelta = max(1, count // laps)
+    start = datetime.datetime(2025, 5, 1, 8, 0, 0, tzinfo=datetime.timezone.utc)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" '
+            'xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">\n'
+            '<Activities><Activity Sport="Running">\n'
+            f'<Id>{start.isoformat()}</Id>\n'
+        )
+        i = 0
+        for vuelta in range(laps):
+            n = puntos_por_vuelta if vuelta < laps - 1 else count - i
+            lap_start = start + datetime.timedelta(seconds=i)
+            f.write(
+                f'<Lap StartTime="{lap_start.isoformat()}">'
+                f'<TotalTimeSeconds>{n}</TotalTimeSeconds>'
+                f'<DistanceMeters>{n * 2.8:.1f}</DistanceMeters>'
+                f'<MaximumSpeed>4.2</MaximumSpeed><Calories>{n // 10}</Calories>'
+                '<Intensity>Active</Intensity><TriggerMethod>Manual</TriggerMethod><Track>\n'
+            )
+            for _ in range(n):
+                t = start + datetime.timedelta(seconds=i)
+                f.write(
+                    f'<Trackpoint><Time>{t.isoformat()}</Time>'
+                    f'<Position><LatitudeDegrees>{40.4168 + i * 1e-5:.7f}</LatitudeDegrees>'
+                    f'<LongitudeDegrees>{-3.7038 + i * 1e-5:.7f}</LongitudeDegrees></Position>'
+                    f'<AltitudeMeters>{650 + (i % 200) * 0.5:.1f}</AltitudeMeters>'
+                    f'<DistanceMeters>{i * 2.8:.1f}</DistanceMeters>'
+                    f'<HeartRateBpm><Value>{120 + i % 60}</Value></HeartRateBpm>'
+                    f'<Extensions><ns3:TPX><ns3:Speed>{2.8 + (i % 30) * 0.01:.2f}</ns3:Speed>'
+                    f'<ns3:RunCadence>{80 + i % 10}</ns3:RunCadence></ns3:TPX></Extensions>'
+                    '</Trackpoint>\n'
+                )
+                i += 1
+            f.write('</Track></Lap>\n')
+        f.write('</Activity></Activities></TrainingCenterDatabase>\n')
+
+
+# Tabla de CRC del protocolo FIT
+_FIT_CRC_TABLE = (
+    0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+    0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400,
+)
+# Segundos entre la época Unix y la época FIT (31/12/1989 00:00 UTC)
+_FIT_EPOCH_OFFSET = 631065600
+
+
+def _fit_crc(data, crc=0):
+    for byte in data:
+        tmp = _FIT_CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _FIT_CRC_TABLE[byte & 0xF]
+        tmp = _FIT_CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _FIT_CRC_TABLE[(byte >> 4) & 0xF]
+    return crc
+
+
+def _fit_definition(local, global_num, fields):
+    """Mensaje de definición: fields = [(número, tamaño, tipo base), ...]"""
+    data = struct.pack('<BBBHB', 0x40 | local, 0, 0, global_num, len(fields))
+    for field in fields:
+        data += struct.pack('<BBB', *field)
+    return data
+
+
+def write_synthetic_fit(path, count):
+    """
+    Escribe un FIT de actividad sintético con `count` registros a 1 Hz.
+
+    Incluye además mensajes que el procesador descarta (device_info, hrv y
+    event) para reproducir el contenido real de un archivo de reloj.
+    """
+    inicio = int(datetime.datetime(2025, 5, 1, 8, 0, tzinfo=datetime.timezone.utc).timestamp())
+    inicio -= _FIT_EPOCH_OFFSET
+    grados = 2 ** 31 / 180.0
+
+    partes = [
+        # file_id (0): type, manufacturer, time_created
+        _fit_definition(0, 0, [(0, 1, 0x00), (1, 2, 0x84), (4, 4, 0x86)]),
+        struct.pack('<BBHI', 0, 4, 1, inicio),
+        # record (20): timestamp, lat, long, altitude, hr, cadence, distance, speed, temperature
+        _fit_definition(1, 20, [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (2, 2, 0x84),
+                                (3, 1, 0x02), (4, 1, 0x02), (5, 4, 0x86), (6, 2, 0x84), (13, 1, 0x01)]),
+        # hrv (78): cinco intervalos RR por mensaje
+        _fit_definition(2, 78, [(0, 10, 0x84)]),
+        # device_info (23): timestamp, device_index, manufacturer, battery_voltage
+        _fit_definition(3, 23, [(253, 4, 0x86), (0, 1, 0x02), (2, 2, 0x84), (10, 2, 0x84)]),
+        # event (21): timestamp, event, event_type
+        _fit_definition(4, 21, [(253, 4, 0x86), (0, 1, 0x00), (1, 1, 0x00)]),
+    ]
+
+    for i in range(count):
+        ts = inicio + i
+        partes.append(struct.pack(
+            '<BIiiHBBIHb', 1, ts,
+            int((40.4168 + i * 1e-5) * grados), int((-3.7038 + i * 1e-5) * grados),
+            int((650 + (i % 200) * 0.5 + 500) * 5), 120 + i % 60, 80 + i % 10,
+            int(i * 2.8 * 100), int((2.8 + (i % 30) * 0.01) * 1000), 18,
+        ))
+        partes.append(struct.pack('<B5H', 2, 500, 505, 498, 510, 502))
+        if i % 60 == 0:
+            partes.append(struct.pack('<BIBHH', 3, ts, 0, 1, 3900))
+            partes.append(struct.pack('<BIBB', 4, ts, 0, 0))
+
+    duracion = count * 1000
+    distancia = int(count * 2.8 * 100)
+    partes += [
+        # lap (19): timestamp, start_time, total_elapsed_time, total_distance
+        _fit_definition(5, 19, [(253, 4, 0x86), (2, 4, 0x86), (7, 4, 0x86), (9, 4, 0x86)]),
+        struct.pack('<BIIII', 5, inicio + count, inicio, duracion, distancia),
+        # session (18): timestamp, start_time, elapsed, distance, calories, avg/max speed, avg/max hr, ascent
+        _fit_definition(6, 18, [(253, 4, 0x86), (2, 4, 0x86), (7, 4, 0x86), (9, 4, 0x86),
+                                (11, 2, 0x84), (14, 2, 0x84), (15, 2, 0x84), (16, 1, 0x02),
+                                (17, 1, 0x02), (22, 2, 0x84)]),
+        struct.pack('<BIIIIHHHBBH', 6, inicio + count, inicio, duracion, distancia,
+                    count // 10, 2950, 3090, 150, 179, 200),
+    ]
+
+    datos = b''.join(partes)
+    cabecera = struct.pack('<BBHI4s', 14, 0x10, 2132, len(datos), b'.FIT')
+    cabecera += struct.pack('<H', _fit_crc(cabecera))
+    contenido = cabecera + datos
+
+    with open(path, 'wb') as f:
+        f.write(contenido)
+        f.write(struct.pack('<H', _fit_crc(contenido)))
+
+
+class Command(BaseCommand):
+    help = 'Mide la velocidad de inserción de puntos de ruta (puntos/segundo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            choices=['writer', 'tcx', 'fit', 'metrics'],
+            default='writer',
+            help='Qué parte de la ingesta medir (por defecto: writer)',
+        )
+        parser.add_argument(
+            '--points',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Tamaños de ruta a medir (número de puntos)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Tamaño de lote para el escritor (por defecto TRACKPOINT_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--skip-baseline',
+            action='store_true',
+            help='No medir la referencia original (muy lenta con rutas grandes)',
+        )
+        parser.add_argument(
+            '--laps',
+            type=int,
+            default=20,
+            help='Número de vueltas de los archivos TCX sintéticos (--target tcx)',
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, f"_benchmark_{options['target']}")(options)
+
+    def _benchmark_writer(self, options):
+        batch_size = options['batch_size'] or get_batch_size()
+
+        self.stdout.write(self.style.SUCCESS('🚀 Benchmark de ingesta de puntos de ruta'))
+        usar_copy = copy_available()
+
+        self.stdout.write(f"   Tamaño de lote: {batch_size}")
+        if not usar_copy:
+            self.stdout.write("   COPY no disponible (se requiere PostgreSQL con psycopg2)")
+
+        # Usuario temporal: al borrarlo se eliminan en cascada sus entrenamientos y puntos
+        nombre = f"benchmark_{uuid.uuid4().hex[:8]}"
+        usuario = User.objects.create(username=nombre, email=f"{nombre}@benchmark.local")
+
+        try:
+            for puntos in options['points']:
+                self.stdout.write(f"\n📊 {puntos} puntos")
+
+                if not options['skip_baseline']:
+                    segundos = self._run_baseline(usuario, puntos)
+                    self._report('Punto a punto (create)', puntos, segundos)
+
+                segundos = self._run_writer(TrackPointWriter, usuario, puntos, batch_size)
+                self._report('Por lotes (bulk_create)', puntos, segundos)
+
+                if usar_copy:
+                    segundos = self._run_writer(CopyTrackPointWriter, usuario, puntos, batch_size)
+                    self._report('COPY FROM STDIN', puntos, segundos)
+        finally:
+            # Primero los entrenamientos (sus señales necesitan al usuario) y luego el usuario
+            Training.objects.filter(user=usuario).delete()
+            usuario.delete()
+
+    def _new_training(self, usuario, puntos):
+        return Training.objects.create(
+            user=usuario,
+            title=f"Benchmark {puntos} puntos",
+            activity_type='running',
+        )
+
+    def _run_baseline(self, usuario, puntos):
+        """Inserción original: un INSERT (y un commit) por punto"""
+        training = self._new_training(usuario, puntos)
+        inicio = time.perf_counter()
+        for record in synthetic_records(puntos):
+            TrackPoint.objects.create(training=training, **record._asdict())
+        return time.perf_counter() - inicio
+
+    def _run_writer(self, writer_class, usuario, puntos, batch_size):
+        """Inserción por lotes dentro de una única transacción"""
+        training = self._new_training(usuario, puntos)
+        inicio = time.perf_counter()
+        with writer_class(training, batch_size=batch_size) as writer:
+            writer.extend(synthetic_records(puntos))
+        return time.perf_counter() - inicio
+
+    def _report(self, etiqueta, puntos, segundos):
+        por_segundo = puntos / segundos if segundos > 0 else float('inf')
+        self.stdout.write(
+            f"   {etiqueta:<28} {segundos:8.2f} s  {por_segundo:12,.0f} puntos/s"
+        )
+
+    def _benchmark_tcx(self, options):
+        """Compara el análisis completo de un TCX con TCXParser y con TCXReader"""
+        try:
+            from tcxparser import TCXParser
+        except ImportError:
+            TCXParser = None
+
+        self.stdout.write(self.style.SUCCESS('🚀 Benchmark de lectura de archivos TCX'))
+        self.stdout.write(f"   Vueltas por archivo: {options['laps']}")
+
+        for puntos in options['points']:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'benchmark.tcx')
+                write_synthetic_tcx(path, puntos, options['laps'])
+                self.stdout.write(
+                    f"\n📊 {puntos} puntos ({os.path.getsize(path) / (1024 * 1024):.1f} MB)"
+                )
+
+                if TCXParser is not None and not options['skip_baseline']:
+                    inicio = time.perf_counter()
+                    self._read_with_tcxparser(TCXParser, path)
+                    self._report('tcxparser.TCXParser', puntos, time.perf_counter() - inicio)
+                elif TCXParser is None:
+                    self.stdout.write("   tcxparser no instalado: se omite la referencia")
+
+                inicio = time.perf_counter()
+                with open(path, 'rb') as f:
+                    reader = TCXReader(f)
+                    for _ in reader:
+                        pass
+                    reader.distance, reader.calories  # ya calculados
+                self._report('TCXReader (una pasada)', puntos, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _read_with_tcxparser(TCXParser, path):
+        """Reproduce el acceso que hacía el procesador anterior sobre TCXParser"""
+        tcx = TCXParser(path)
+
+        for propiedad in ('started_at', 'duration', 'distance', 'avg_speed', 'max_speed',
+                          'avg_hr', 'max_hr', 'ascent', 'calories'):
+            try:
+                getattr(tcx, propiedad)
+            except Exception:
+                pass
+
+        # Serie de puntos: tiempo, posición, altitud y pulso
+        for metodo in ('time_values', 'position_values', 'altitude_points', 'hr_values'):
+            try:
+                list(getattr(tcx, metodo)())
+            except Exception:
+                pass
+
+    def _benchmark_fit(self, options):
+        """Compara el recorrido completo de mensajes FIT con FITReader"""
+        try:
+            import fitparse
+        except ImportError:
+            fitparse = None
+
+        self.stdout.write(self.style.SUCCESS('🚀 Benchmark de lectura de archivos FIT'))
+
+        for puntos in options['points']:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'benchmark.fit')
+                write_synthetic_fit(path, puntos)
+                self.stdout.write(
+                    f"\n📊 {puntos} registros a 1 Hz ({os.path.getsize(path) / (1024 * 1024):.1f} MB)"
+                )
+
+                referencia = None
+                if fitparse is None:
+                    self.stdout.write("   fitparse no instalado: se omite la referencia")
+                elif not options['skip_baseline']:
+                    inicio = time.perf_counter()
+                    with open(path, 'rb') as f:
+                        self._read_all_fit_messages(fitparse, f)
+                    referencia = time.perf_counter() - inicio
+                    self._report('Todos los mensajes', puntos, referencia)
+
+                inicio = time.perf_counter()
+                with open(path, 'rb') as f, open_fit_source(f) as source:
+                    reader = FITReader(source)
+                    for _ in reader:
+                        pass
+                segundos = time.perf_counter() - inicio
+                self._report('FITReader (record/session/lap)', puntos, segundos)
+
+                if referencia and segundos > 0:
+                    self.stdout.write(f"   Aceleración: {referencia / segundos:.1f}x")
+
+    @staticmethod
+    def _read_all_fit_messages(fitparse, f):
+        """Reproduce el recorrido del procesador FIT anterior"""
+        session_data = {}
+        track_points = []
+        for record in fitparse.FitFile(f).get_messages():
+            if record.name == 'session':
+                for record_data in record:
+                    if record_data.name == 'start_time':
+                        session_data['start_time'] = record_data.value
+                    elif record_data.name == 'total_elapsed_time':
+                        session_data['duration'] = record_data.value
+                    elif record_data.name == 'total_distance':
+                        session_data['distance'] = record_data.value / 1000
+            elif record.name == 'record':
+                point_data = {}
+                for record_data in record:
+                    if record_data.name == 'timestamp':
+                        point_data['time'] = record_data.value
+                    elif record_data.name == 'position_lat':
+                        point_data['latitude'] = record_data.value * (180.0 / 2**31)
+                    elif record_data.name == 'position_long':
+                        point_data['longitude'] = record_data.value * (180.0 / 2**31)
+                    elif record_data.name == 'altitude':
+                        point_data['elevation'] = record_data.value
+                    elif record_data.name == 'heart_rate':
+                        point_data['heart_rate'] = record_data.value
+                    elif record_data.name == 'speed':
+                        point_data['speed'] = record_data.value * 3.6
+                    elif record_data.name == 'cadence':
+                        point_data['cadence'] = record_data.value
+                    elif record_data.name == 'temperature':
+                        point_data['temperature'] = record_data.value
+                if 'time' in point_data:
+                    track_points.append(point_data)
+        return session_data, track_points
+
+    def _benchmark_metrics(self, options):
+        """Compara el cálculo de métricas en bucle de Python con TrackMetrics"""
+        batch_size = options['batch_size'] or get_batch_size()
+
+        self.stdout.write(self.style.SUCCESS('🚀 Benchmark de cálculo de métricas de ruta'))
+        self.stdout.write(f"   Tamaño de bloque: {batch_size}")
+
+        for puntos in options['points']:
+            records = list(synthetic_records(puntos))
+            self.stdout.write(f"\n📊 {puntos} puntos")
+
+            referencia = None
+            if not options['skip_baseline']:
+                inicio = time.perf_counter()
+                esperado = self._python_track_metrics(records)
+                referencia = time.perf_counter() - inicio
+                self._report('Bucle de Python', puntos, referencia)
+
+            # Incluye la conversión de los registros a columnas, como en los procesadores
+            inicio = time.perf_counter()
+            metrics = TrackMetrics()
+            for i in range(0, puntos, batch_size):
+                metrics.add_records(records[i:i + batch_size])
+            resultado = metrics.result()
+            segundos = time.perf_counter() - inicio
+            self._report('TrackMetrics (por bloques)', puntos, segundos)
+
+            # Solo el cálculo vectorizado, con las columnas ya preparadas
+            columnas = columns_from_records(records)
+            inicio = time.perf_counter()
+            TrackMetrics().add(**columnas)
+            calculo = time.perf_counter() - inicio
+            self._report('TrackMetrics (solo cálculo)', puntos, calculo)
+
+            if referencia:
+                self.stdout.write(
+                    f"   Aceleración: {referencia / segundos:.1f}x "
+                    f"({referencia / calculo:.1f}x solo cálculo)"
+                )
+                self._compare_metrics(esperado, resultado)
+
+    def _compare_metrics(self, esperado, resultado):
+        """Muestra la mayor diferencia relativa entre ambos cálculos"""
+        diferencia = 0.0
+        for campo, valor in esperado.items():
+            obtenido = resultado.get(campo)
+            if obtenido is None:
+                self.stdout.write(self.style.ERROR(f"   Falta el campo {campo}"))
+                return
+            if isinstance(valor, datetime.timedelta):
+                valor, obtenido = valor.total_seconds(), obtenido.total_seconds()
+            diferencia = max(diferencia, abs(obtenido - valor) / max(abs(valor), 1e-9))
+        self.stdout.write(f"   Diferencia relativa máxima: {diferencia:.2e}")
+
+    @staticmethod
+    def _python_track_metrics(records):
+        """Reproduce el cálculo punto a punto del procesador GPX anterior"""
+        def haversine_distance(lat1, lon1, lat2, lon2):
+            lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+            dlat = lat2_rad - lat1_rad
+            dlon = math.radians(lon2 - lon1)
+            a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+            return 2 * 6371000 * math.asin(min(1.0, math.sqrt(a)))
+
+        total_distance = 0
+        first_time = last_time = None
+        speed_sum, speed_count, max_speed = 0, 0, None
+        elevation_gain, previous_elevation = 0, None
+        hr_sum, hr_count, max_hr = 0, 0, None
+        cad_sum, cad_count, max_cad = 0, 0, None
+        temp_sum, temp_count, min_temp, max_temp = 0, 0, None, None
+        previous = None
+
+        for record in records:
+            if previous is not None and record.time and previous.time:
+                time_diff = (record.time - previous.time).total_seconds()
+                if time_diff > 0:
+                    distance = haversine_distance(
+                        previous.latitude, previous.longitude, record.latitude, record.longitude
+                    )
+                    speed_kmh = distance / time_diff * 3.6
+                    speed_sum += speed_kmh
+                    speed_count += 1
+                    max_speed = speed_kmh if max_speed is None else max(max_speed, speed_kmh)
+                    total_distance += distance / 1000
+            previous = record
+
+            if record.time:
+                if first_time is None:
+                    first_time = record.time
+                last_time = record.time
+            if record.elevation:
+                if previous_elevation is not None and record.elevation > previous_elevation:
+                    elevation_gain += record.elevation - previous_elevation
+                previous_elevation = record.elevation
+            if record.heart_rate:
+                hr_sum += record.heart_rate
+                hr_count += 1
+                max_hr = record.heart_rate if max_hr is None else max(max_hr, record.heart_rate)
+            if record.cadence:
+                cad_sum += record.cadence
+                cad_count += 1
+                max_cad = record.cadence if max_cad is None else max(max_cad, record.cadence)
+            if record.temperature:
+                temp_sum += record.temperature
+                temp_count += 1
+                min_temp = record.temperature if min_temp is None else min(min_temp, record.temperature)
+                max_temp = record.temperature if max_temp is None else max(max_temp, record.temperature)
+
+        return {
+            'duration': last_time - first_time,
+            'distance': total_distance,
+            'avg_speed': speed_sum / speed_count,
+            'max_speed': max_speed,
+            'elevation_gain': elevation_gain,
+            'avg_heart_rate': hr_sum / hr_count,
+            'max_heart_rate': max_hr,
+            'avg_cadence': cad_sum / cad_count,
+            'max_cadence': max_cad,
+            'avg_temperature': temp_sum / temp_count,
+            'min_temperature': min_temp,
+            'max_temperature': max_temp,
+        }
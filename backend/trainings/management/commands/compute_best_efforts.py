@@ -0,0 +1,38 @@
+"""
+Comando que calcula los mejores esfuerzos desde los puntos ya guardados.
+
+Los entrenamientos procesados antes de existir BestEffort no tienen
+esfuerzos; este comando los calcula leyendo sus puntos de ruta por
+bloques (trainings.efforts.recompute_best_efforts). Por defecto solo los
+entrenamientos sin esfuerzos.
+
+Uso:
+python manage.py compute_best_efforts
+python manage.py compute_best_efforts --user 42 --all
+"""
+
+from django.core.management.base import BaseCommand
+
+from trainings.efforts import recompute_best_efforts
+from trainings.models import Training
+
+
+class Command(BaseCommand):
+    help = 'Calcula los mejores esfuerzos de los entrenamientos desde sus puntos de ruta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID del usuario (por defecto, todos)')
+        parser.add_argument('--all', action='store_true', help='Recalcular también los que ya tienen esfuerzos')
+
+    def handle(self, *args, **options):
+        entrenamientos = Training.objects.filter(track_points__isnull=False).distinct()
+        if options['user']:
+            entrenamientos = entrenamientos.filter(user=options['user'])
+        if not options['all']:
+            entrenamientos = entrenamientos.filter(best_efforts__isnull=True)
+
+        total = esfuerzos = 0
+        for training in entrenamientos.only('id', 'user_id').iterator():
+            esfuerzos += recompute_best_efforts(training)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'🏅 Mejores esfuerzos calculados: {esfuerzos} en {total} entrenamientos'))
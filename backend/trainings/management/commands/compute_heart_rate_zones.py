@@ -0,0 +1,37 @@
+"""
+Comando que calcula el tiempo en zonas de FC desde los puntos ya guardados.
+
+Los entrenamientos procesados antes de existir las zonas (o los de
+usuarios que acaban de indicar su FC máxima) no tienen el tiempo en cada
+zona; este comando lo calcula por lotes
+(trainings.zones.rebucket_heart_rate_zones) y rehace los resúmenes de
+actividad de cada usuario. Solo se tocan los entrenamientos cuya FC
+máxima ha cambiado desde el último cálculo.
+
+Uso:
+python manage.py compute_heart_rate_zones
+python manage.py compute_heart_rate_zones --user 42
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from trainings.zones import rebucket_heart_rate_zones
+
+
+class Command(BaseCommand):
+    help = 'Calcula el tiempo en zonas de frecuencia cardíaca de los entrenamientos desde sus puntos de ruta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID del usuario (por defecto, todos)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Entrenamientos recalculados en cada lote')
+
+    def handle(self, *args, **options):
+        usuarios = get_user_model().objects.filter(trainings__isnull=False).distinct()
+        if options['user']:
+            usuarios = usuarios.filter(pk=options['user'])
+
+        total = 0
+        for user in usuarios.iterator():
+            total += rebucket_heart_rate_zones(user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'❤️ Zonas de FC calculadas en {total} entrenamientos'))
@@ -0,0 +1,102 @@
+"""
+Comando para importar todos los entrenamientos de un archivo zip.
+
+Los archivos GPX/TCX/FIT del zip se leen sin extraerlos a disco y se
+reparten en lotes entre varios procesos (--workers). Las estadísticas
+del usuario se recalculan una sola vez al terminar. Los archivos que el
+usuario ya tenía importados se omiten.
+
+Uso:
+python manage.py import_training_archive export.zip --user juanma
+python manage.py import_training_archive export.zip --user 4 --workers 8 --activity-type cycling
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trainings.archives import import_archive
+from trainings.models import Training
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Importa los entrenamientos de un archivo zip (GPX, TCX y FIT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Ruta del archivo zip')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Usuario propietario (nombre de usuario o ID)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de procesos en paralelo (por defecto: 1)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Archivos por lote enviado a cada proceso (por defecto: 10)',
+        )
+        parser.add_argument(
+            '--activity-type',
+            choices=[choice for choice, _ in Training.ACTIVITY_CHOICES],
+            default=None,
+            help='Tipo de actividad para todos los entrenamientos',
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        self._inicio = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS(f"🚀 Importando {options['archive']} para {user.username}..."))
+
+        try:
+            resumen = import_archive(
+                user,
+                options['archive'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                activity_type=options['activity_type'],
+                on_result=self._show_result,
+            )
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        transcurrido = time.monotonic() - self._inicio
+        self.stdout.write(f"\n📊 Resumen de la importación ({resumen['total']} archivos):")
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Importados: {resumen['importados']}"))
+        if resumen['omitidos']:
+            self.stdout.write(self.style.WARNING(f"   ⏭️ Omitidos (ya importados): {resumen['omitidos']}"))
+        self.stdout.write(self.style.ERROR(f"   ❌ Con errores: {resumen['errores']}"))
+        self.stdout.write(f"   📍 Puntos de ruta creados: {sum(r['puntos'] for r in resumen['archivos'])}")
+        self.stdout.write(f"   ⏱️ Tiempo total: {transcurrido:.1f} s")
+
+    def _get_user(self, value):
+        try:
+            if value.isdigit():
+                return User.objects.get(pk=int(value))
+            return User.objects.get(username=value)
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario {value} no existe")
+
+    def _show_result(self, resultado, hechos, total):
+        """Muestra el resultado de un archivo y el avance"""
+        prefijo = f"[{hechos}/{total}] {resultado['archivo']}"
+        if resultado['estado'] == 'ok':
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {prefijo}: entrenamiento {resultado['id']}, {resultado['puntos']} puntos"
+            ))
+        elif resultado['estado'] == 'omitido':
+            self.stdout.write(self.style.WARNING(f"⏭️ {prefijo}: {resultado['mensaje']}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ {prefijo}: {resultado['mensaje']}"))
+
+        if hechos == total or hechos % 50 == 0:
+            transcurrido = time.monotonic() - self._inicio
+            ritmo = hechos / transcurrido if transcurrido > 0 else 0
+            self.stdout.write(f"⏱️ {hechos}/{total} ({hechos * 100 / total:.0f}%) · {ritmo:.1f} archivos/s")
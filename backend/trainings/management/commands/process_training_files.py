@@ -1,22 +1,143 @@
 """
 Comando para procesar archivos de entrenamientos que no se procesaron automáticamente.
 
+Con --workers N los entrenamientos se reparten en lotes (--batch-size)
+entre N procesos, cada uno con su propia conexión a la base de datos.
+Cada entrenamiento se procesa en su propia transacción y con su fila
+bloqueada (SELECT ... FOR UPDATE SKIP LOCKED): si un worker muere, lo
+que estaba procesando se deshace y queda pendiente para otra ejecución,
+y dos procesos nunca procesan a la vez el mismo entrenamiento. Con la
+fila bloqueada se comprueba además si ya está procesado, para que los
+reintentos tras la caída de un worker no repitan lo ya confirmado.
+
 Uso:
 python manage.py process_training_files
 python manage.py process_training_files --training-id 4
 python manage.py process_training_files --all
 python manage.py process_training_files --all --force
+python manage.py process_training_files --all --force --workers 8 --batch-size 20
 """
 
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
 from trainings.models import Training, TrackPoint
-from trainings.serializers import TrainingSerializer
-import logging
+from trainings.processing import process_training_file
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('trainings')
 
+
+def _init_worker():
+    """Inicializa Django en los procesos hijo que no lo heredan (arranque spawn)"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def procesar_entrenamiento(training_id, verbose=False, force=False, desde=None):
+    """
+    Procesa el archivo de un entrenamiento y devuelve el resultado como
+    diccionario (se puede enviar de vuelta desde un proceso hijo).
+
+    Estados posibles: 'ok', 'error' y 'omitido' (sin archivo, ya procesado
+    o bloqueado por otro proceso).
+
+    Args:
+        force: procesar aunque ya esté marcado como procesado
+        desde: con force, omitir igualmente los procesados a partir de
+            este momento (reintentos de esta misma ejecución)
+    """
+    resultado = {'id': training_id, 'pid': os.getpid(), 'estado': 'omitido', 'puntos': 0}
+
+    with transaction.atomic():
+        # Si otro proceso lo tiene bloqueado, se salta en lugar de esperar
+        training = (
+            Training.objects.select_for_update(skip_locked=True)
+            .select_related('user')
+            .filter(pk=training_id)
+            .first()
+        )
+        if training is None:
+            resultado['mensaje'] = "Bloqueado por otro proceso o eliminado"
+            return resultado
+
+        resultado['titulo'] = training.title
+
+        # Ya procesado (por otro proceso o antes de que cayera el worker que lo tenía)
+        if training.file_processed and (not force or (desde is not None and training.updated_at >= desde)):
+            resultado['mensaje'] = "Ya procesado"
+            return resultado
+
+        # Verificar que el archivo existe
+        if not training.gpx_file:
+            resultado['mensaje'] = "No hay archivo asociado"
+            return resultado
+
+        # Verificar que el archivo es accesible
+        try:
+            resultado['archivo'] = training.gpx_file.name
+            resultado['tamaño'] = training.gpx_file.size
+        except Exception as e:
+            training.processing_error = f"Archivo no accesible: {e}"
+            training.file_processed = True
+            training.save()
+            resultado.update(estado='error', mensaje=f"No se puede acceder al archivo: {e}")
+            return resultado
+
+        try:
+            process_training_file(training)
+        except Exception as e:
+            # Marcar como procesado (con error); los puntos anteriores se conservan
+            Training.objects.filter(pk=training.pk).update(file_processed=True, updated_at=timezone.now())
+            resultado.update(estado='error', mensaje=str(e))
+            if verbose:
+                resultado['traceback'] = traceback.format_exc()
+            return resultado
+
+        # Contar puntos creados y datos extraídos
+        resultado['estado'] = 'ok'
+        resultado['puntos'] = TrackPoint.objects.filter(training=training).count()
+
+        data_info = []
+        if training.distance:
+            data_info.append(f"Distancia: {training.distance:.2f} km")
+        if training.duration:
+            data_info.append(f"Duración: {training.duration}")
+        if training.avg_heart_rate:
+            data_info.append(f"FC promedio: {training.avg_heart_rate:.0f} bpm")
+        resultado['datos'] = data_info
+
+    return resultado
+
+
+def procesar_lote(training_ids, verbose=False, force=False, desde=None):
+    """
+    Procesa un lote de entrenamientos en un proceso hijo.
+
+    Un error inesperado (p. ej. de base de datos) en un entrenamiento no
+    impide procesar el resto del lote.
+    """
+    resultados = []
+    for training_id in training_ids:
+        try:
+            resultados.append(procesar_entrenamiento(training_id, verbose, force, desde))
+        except Exception as e:
+            resultados.append({
+                'id': training_id, 'pid': os.getpid(), 'estado': 'error', 'puntos': 0, 'mensaje': str(e),
+            })
+    return resultados
+
+
 class Command(BaseCommand):
     help = 'Procesa archivos de entrenamientos que no se procesaron automáticamente'
 
@@ -41,10 +162,25 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostrar información detallada del procesamiento',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de procesos en paralelo (por defecto: 1)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Entrenamientos por lote enviado a cada proceso (por defecto: 10)',
+        )
 
     def handle(self, *args, **options):
         self.verbose = options['verbose']
-        
+        # Un entrenamiento concreto se procesa siempre, como con --force
+        self.force = options['force'] or bool(options['training_id'])
+        self.desde = timezone.now()
+
         self.stdout.write(
             self.style.SUCCESS('🚀 Iniciando procesamiento de archivos de entrenamientos...')
         )
@@ -54,11 +190,11 @@ class Command(BaseCommand):
             # Procesar un entrenamiento específico
             try:
                 training = Training.objects.get(id=options['training_id'])
-                entrenamientos = [training]
+                entrenamientos = Training.objects.filter(id=training.id)
                 self.stdout.write(f"📋 Procesando entrenamiento específico ID: {training.id}")
             except Training.DoesNotExist:
                 raise CommandError(f'El entrenamiento con ID {options["training_id"]} no existe')
-                
+
         elif options['all']:
             # Procesar todos los entrenamientos con archivos
             if options['force']:
@@ -78,120 +214,191 @@ class Command(BaseCommand):
             ).order_by('id')
             self.stdout.write("📋 Procesando entrenamientos con archivos sin procesar (por defecto)")
 
-        if not entrenamientos:
+        training_ids = list(entrenamientos.values_list('id', flat=True))
+
+        if not training_ids:
             self.stdout.write(
                 self.style.WARNING('⚠️ No se encontraron entrenamientos para procesar')
             )
             self._show_status()
             return
 
-        self.stdout.write(f"📊 Total de entrenamientos a procesar: {len(entrenamientos)}")
-        
+        self.stdout.write(f"📊 Total de entrenamientos a procesar: {len(training_ids)}")
+
         # Mostrar lista de entrenamientos a procesar
         if self.verbose:
             self.stdout.write("\n📄 Lista de entrenamientos:")
             for t in entrenamientos:
                 self.stdout.write(f"   • ID {t.id}: {t.title} ({t.gpx_file.name if t.gpx_file else 'Sin archivo'})")
-        
-        # Procesar cada entrenamiento
-        exitosos = 0
-        con_errores = 0
-        
-        for training in entrenamientos:
-            self.stdout.write(f"\n🔄 Procesando: ID {training.id} - {training.title}")
-            
-            try:
-                # Verificar que el archivo existe
-                if not training.gpx_file:
-                    self.stdout.write(
-                        self.style.WARNING(f"   ⚠️ No hay archivo asociado")
-                    )
-                    continue
 
-                # Verificar que el archivo es accesible
+        # Procesar los entrenamientos
+        self._total = len(training_ids)
+        self._hechos = 0
+        self._inicio = time.monotonic()
+        batch_size = max(1, options['batch_size'])
+        lotes = [training_ids[i:i + batch_size] for i in range(0, len(training_ids), batch_size)]
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(
+                self.style.WARNING("⚠️ SQLite no admite escrituras concurrentes: se usará un solo proceso")
+            )
+            workers = 1
+
+        if workers > 1:
+            resultados, pendientes = self._run_parallel(lotes, workers)
+        else:
+            resultados, pendientes = self._run_serial(lotes), []
+
+        self._show_summary(resultados, pendientes)
+
+    def _run_serial(self, lotes):
+        """Procesa los lotes uno tras otro en este proceso"""
+        resultados = []
+        for lote in lotes:
+            resultados_lote = procesar_lote(lote, self.verbose, self.force)
+            for resultado in resultados_lote:
+                self._show_result(resultado)
+            resultados.extend(resultados_lote)
+            self._show_progress(len(lote))
+        return resultados
+
+    def _run_parallel(self, lotes, workers):
+        """
+        Reparte los lotes entre varios procesos.
+
+        Si un proceso muere, el pool queda inutilizable: los entrenamientos
+        de los lotes sin resultado se vuelven a procesar uno a uno en un
+        proceso aparte, de modo que solo queda pendiente el que provoca la
+        caída. Los que ya se confirmaron antes de la caída se omiten
+        (procesar_entrenamiento con desde).
+
+        Returns:
+            (resultados, ids de los entrenamientos que no llegaron a terminar)
+        """
+        self.stdout.write(f"⚙️ {workers} procesos, {len(lotes)} lotes")
+
+        resultados = []
+        sin_terminar = self._run_pool(lotes, workers, resultados)
+        if not sin_terminar:
+            return resultados, []
+
+        ids = sorted(training_id for lote in sin_terminar for training_id in lote)
+        self.stdout.write(
+            self.style.WARNING(
+                f"⚠️ Un proceso terminó inesperadamente: se reintentan {len(ids)} entrenamientos uno a uno"
+            )
+        )
+
+        return resultados, self._retry_one_by_one(ids, resultados)
+
+    def _retry_one_by_one(self, ids, resultados):
+        """
+        Procesa los entrenamientos de uno en uno en un pool de un solo
+        proceso, que solo se vuelve a crear si se rompe.
+
+        Returns:
+            ids de los entrenamientos que hacen caer el proceso
+        """
+        connections.close_all()
+
+        pendientes = []
+        pool = None
+        try:
+            for training_id in ids:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+                futuro = pool.submit(procesar_lote, [training_id], self.verbose, self.force, self.desde)
                 try:
-                    training.gpx_file.size
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"   ❌ No se puede acceder al archivo: {e}")
-                    )
-                    training.processing_error = f"Archivo no accesible: {e}"
-                    training.file_processed = True
-                    training.save()
-                    con_errores += 1
+                    resultados_lote = futuro.result()
+                except BrokenProcessPool:
+                    pendientes.append(training_id)
+                    pool.shutdown(wait=True)
+                    pool = None
                     continue
-                
-                # Determinar el tipo de archivo
-                filename = training.gpx_file.name.lower()
-                file_size = training.gpx_file.size
-                
-                self.stdout.write(f"   📁 Archivo: {training.gpx_file.name} ({file_size} bytes)")
-                
-                if filename.endswith('.gpx'):
-                    self.stdout.write(f"   📄 Procesando archivo GPX")
-                    self._process_gpx(training)
-                elif filename.endswith('.tcx'):
-                    self.stdout.write(f"   📄 Procesando archivo TCX")
-                    self._process_tcx(training)
-                elif filename.endswith('.fit'):
-                    self.stdout.write(f"   📄 Procesando archivo FIT")
-                    self._process_fit(training)
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f"   ⚠️ Formato no soportado: {filename}")
-                    )
-                    training.processing_error = f"Formato no soportado: {filename}"
-                    training.file_processed = True
-                    training.save()
-                    con_errores += 1
+
+                for resultado in resultados_lote:
+                    self._show_result(resultado)
+                resultados.extend(resultados_lote)
+                self._show_progress(1)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return pendientes
+
+    def _run_pool(self, lotes, workers, resultados):
+        """
+        Ejecuta los lotes en un pool de procesos.
+
+        Returns:
+            lotes sin terminar
+        """
+        # Cada hijo debe abrir su propia conexión: no heredar la del padre
+        connections.close_all()
+
+        sin_terminar = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futuros = {pool.submit(procesar_lote, lote, self.verbose, self.force): lote for lote in lotes}
+
+            for futuro in as_completed(futuros):
+                lote = futuros[futuro]
+                try:
+                    resultados_lote = futuro.result()
+                except BrokenProcessPool:
+                    # Un proceso murió: su transacción se deshizo y el lote queda pendiente
+                    sin_terminar.append(lote)
                     continue
-                
-                # Marcar como procesado exitosamente
-                training.file_processed = True
-                training.processing_error = None  # Limpiar errores previos
-                training.save()
-                
-                # Contar puntos creados
-                puntos_count = TrackPoint.objects.filter(training=training).count()
-                
-                # Mostrar datos extraídos
-                data_info = []
-                if training.distance:
-                    data_info.append(f"Distancia: {training.distance:.2f} km")
-                if training.duration:
-                    data_info.append(f"Duración: {training.duration}")
-                if training.avg_heart_rate:
-                    data_info.append(f"FC promedio: {training.avg_heart_rate:.0f} bpm")
-                
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"   ✅ Procesado exitosamente. Puntos de ruta: {puntos_count}"
-                    )
-                )
-                
-                if data_info and self.verbose:
-                    self.stdout.write(f"      📊 Datos extraídos: {', '.join(data_info)}")
-                
-                exitosos += 1
-                
-            except Exception as e:
-                # Manejar errores
-                error_msg = str(e)
-                training.processing_error = error_msg
-                training.file_processed = True  # Marcar como procesado (con error)
-                training.save()
-                
-                self.stdout.write(
-                    self.style.ERROR(f"   ❌ Error: {error_msg}")
+
+                for resultado in resultados_lote:
+                    self._show_result(resultado)
+                resultados.extend(resultados_lote)
+                self._show_progress(len(lote))
+
+        return sin_terminar
+
+    def _show_result(self, resultado):
+        """Muestra el resultado de un entrenamiento"""
+        estado = resultado['estado']
+        self.stdout.write(f"\n🔄 Procesando: ID {resultado['id']} - {resultado.get('titulo', '')}")
+
+        if resultado.get('archivo'):
+            self.stdout.write(f"   📁 Archivo: {resultado['archivo']} ({resultado.get('tamaño', 0)} bytes)")
+
+        if estado == 'ok':
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"   ✅ Procesado exitosamente. Puntos de ruta: {resultado['puntos']}"
                 )
-                
-                if self.verbose:
-                    import traceback
-                    self.stdout.write(f"      🔍 Traceback: {traceback.format_exc()}")
-                
-                con_errores += 1
-
-        # Resumen final
+            )
+            if resultado.get('datos') and self.verbose:
+                self.stdout.write(f"      📊 Datos extraídos: {', '.join(resultado['datos'])}")
+        elif estado == 'error':
+            self.stdout.write(self.style.ERROR(f"   ❌ Error: {resultado['mensaje']}"))
+            if resultado.get('traceback'):
+                self.stdout.write(f"      🔍 Traceback: {resultado['traceback']}")
+        else:
+            self.stdout.write(self.style.WARNING(f"   ⚠️ {resultado['mensaje']}"))
+
+    def _show_progress(self, cantidad):
+        """Muestra el avance, el ritmo y el tiempo restante estimado"""
+        self._hechos += cantidad
+        transcurrido = time.monotonic() - self._inicio
+        ritmo = self._hechos / transcurrido if transcurrido > 0 else 0
+        restante = (self._total - self._hechos) / ritmo if ritmo > 0 else 0
+
+        self.stdout.write(
+            f"⏱️ {self._hechos}/{self._total} ({self._hechos * 100 / self._total:.0f}%) · "
+            f"{ritmo:.1f} entrenamientos/s · ETA {int(restante // 60)}:{int(restante % 60):02d}"
+        )
+
+    def _show_summary(self, resultados, pendientes):
+        """Resumen final combinando los resultados de todos los procesos"""
+        exitosos = sum(1 for r in resultados if r['estado'] == 'ok')
+        con_errores = sum(1 for r in resultados if r['estado'] == 'error')
+        omitidos = sum(1 for r in resultados if r['estado'] == 'omitido')
+        puntos = sum(r['puntos'] for r in resultados)
+        transcurrido = time.monotonic() - self._inicio
+
         self.stdout.write(f"\n📊 Resumen del procesamiento:")
         self.stdout.write(
             self.style.SUCCESS(f"   ✅ Exitosos: {exitosos}")
@@ -199,22 +406,48 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.ERROR(f"   ❌ Con errores: {con_errores}")
         )
-        
+        if omitidos:
+            self.stdout.write(self.style.WARNING(f"   ⏭️ Omitidos: {omitidos}"))
+        self.stdout.write(f"   📍 Puntos de ruta creados: {puntos}")
+        self.stdout.write(f"   ⏱️ Tiempo total: {transcurrido:.1f} s")
+
+        # Desglose por proceso
+        por_proceso = {}
+        for r in resultados:
+            datos = por_proceso.setdefault(r['pid'], {'ok': 0, 'error': 0, 'omitido': 0})
+            datos[r['estado']] += 1
+        if len(por_proceso) > 1:
+            self.stdout.write(f"\n⚙️ Por proceso:")
+            for pid, datos in sorted(por_proceso.items()):
+                self.stdout.write(
+                    f"   PID {pid}: {datos['ok']} exitosos, {datos['error']} con errores, "
+                    f"{datos['omitido']} omitidos"
+                )
+
+        if pendientes:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"\n⚠️ {len(pendientes)} entrenamientos no se procesaron porque un proceso "
+                    f"terminó de forma inesperada (sus cambios se deshicieron): "
+                    f"{', '.join(str(i) for i in pendientes)}"
+                )
+            )
+
         # Mostrar estadísticas finales
         total_puntos = TrackPoint.objects.count()
         total_procesados = Training.objects.filter(file_processed=True).count()
-        
+
         self.stdout.write(f"\n📈 Estadísticas globales:")
         self.stdout.write(f"   📍 Total puntos de ruta en BD: {total_puntos}")
         self.stdout.write(f"   ✅ Total entrenamientos procesados: {total_procesados}")
-        
+
         if exitosos > 0:
             self.stdout.write(
                 self.style.SUCCESS(
                     f"\n🎉 ¡Procesamiento completado! {exitosos} archivos procesados correctamente"
                 )
             )
-        
+
         if con_errores > 0:
             self.stdout.write(
                 self.style.WARNING(
@@ -230,31 +463,10 @@ class Command(BaseCommand):
         procesados = Training.objects.filter(file_processed=True).count()
         sin_procesar = Training.objects.filter(gpx_file__isnull=False, file_processed=False).count()
         con_errores = Training.objects.filter(processing_error__isnull=False).count()
-        
+
         self.stdout.write(f"\n📊 Estado actual:")
         self.stdout.write(f"   📁 Total entrenamientos: {total}")
         self.stdout.write(f"   📎 Con archivos: {con_archivos}")
         self.stdout.write(f"   ✅ Procesados: {procesados}")
         self.stdout.write(f"   ⏳ Sin procesar: {sin_procesar}")
         self.stdout.write(f"   ❌ Con errores: {con_errores}")
-
-    def _process_gpx(self, training):
-        """Procesa un archivo GPX"""
-        serializer = TrainingSerializer()
-        
-        with training.gpx_file.open('rb') as file:
-            serializer.process_gpx_file_improved(training, file)
-
-    def _process_tcx(self, training):
-        """Procesa un archivo TCX"""
-        serializer = TrainingSerializer()
-        
-        with training.gpx_file.open('rb') as file:
-            serializer.process_tcx_file_improved(training, file)
-
-    def _process_fit(self, training):
-        """Procesa un archivo FIT"""
-        serializer = TrainingSerializer()
-        
-        with training.gpx_file.open('rb') as file:
-            serializer.process_fit_file_improved(training, file)
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Comando que elimina las subidas por fragmentos caducadas.
+
+Borra las sesiones abiertas cuya fecha de caducidad
+(TRAINING_UPLOAD_SESSION_TTL) ya ha pasado junto con su archivo de
+staging, y las previsualizaciones de archivos sin confirmar que han
+caducado (TRAINING_PREVIEW_TIMEOUT). Pensado para ejecutarse
+periódicamente (cron).
+
+Uso:
+python manage.py purge_upload_sessions
+"""
+
+from django.core.management.base import BaseCommand
+
+from trainings.previews import purge_expired_previews
+from trainings.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Elimina las subidas por fragmentos y las previsualizaciones caducadas y sus archivos temporales'
+
+    def handle(self, *args, **options):
+        eliminadas = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f'🧹 Subidas caducadas eliminadas: {eliminadas}'))
+        previsualizaciones = purge_expired_previews()
+        self.stdout.write(self.style.SUCCESS(f'🧹 Previsualizaciones caducadas eliminadas: {previsualizaciones}'))
@@ -0,0 +1,92 @@
+"""
+Comando que ejecuta los trabajos de procesamiento en segundo plano.
+
+Cada proceso reclama trabajos pendientes de la tabla ProcessingJob con
+SELECT ... FOR UPDATE SKIP LOCKED, así que pueden arrancarse varios a la
+vez (en la misma máquina o en varias) sin que dos procesen el mismo
+trabajo. Los trabajos de un worker que muere se recuperan al expirar su
+reserva (PROCESSING_JOB_LEASE_SECONDS).
+
+Uso:
+python manage.py run_processing_worker
+python manage.py run_processing_worker --once
+python manage.py run_processing_worker --sleep 5 --max-jobs 100
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from trainings.processing import claim_job, default_worker_name, requeue_expired_jobs, run_job
+
+logger = logging.getLogger('trainings')
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los trabajos de procesamiento de archivos en cola'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar los trabajos disponibles y terminar',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay trabajos (por defecto: 2)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Terminar tras procesar este número de trabajos',
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='Nombre del worker (por defecto: máquina:pid)',
+        )
+
+    def handle(self, *args, **options):
+        worker = options['worker_id'] or default_worker_name()
+        self._stop = False
+
+        # Terminar el trabajo en curso antes de salir con SIGTERM/SIGINT
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._request_stop)
+
+        self.stdout.write(self.style.SUCCESS(f'🚀 Worker {worker} esperando trabajos...'))
+
+        procesados = exitosos = 0
+        while not self._stop:
+            close_old_connections()
+            requeue_expired_jobs()
+
+            job = claim_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"🔄 Trabajo {job.id} ({job.get_kind_display()}), intento {job.attempts}")
+            if run_job(job):
+                exitosos += 1
+                self.stdout.write(self.style.SUCCESS(f"   ✅ Trabajo {job.id} completado"))
+            else:
+                self.stdout.write(self.style.ERROR(f"   ❌ Trabajo {job.id}: {job.error}"))
+
+            procesados += 1
+            if options['max_jobs'] and procesados >= options['max_jobs']:
+                break
+
+        self.stdout.write(f"\n📊 Trabajos procesados: {procesados} ({exitosos} correctos)")
+
+    def _request_stop(self, signum, frame):
+        logger.info(f"Señal {signum} recibida: el worker terminará tras el trabajo actual")
+        self._stop = True
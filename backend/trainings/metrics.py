@@ -0,0 +1,297 @@
+"""
+Cálculo vectorizado de métricas de ruta con NumPy.
+
+Centraliza el cálculo de distancia, velocidad, desnivel positivo y
+mínimos/medias/máximos de ritmo cardíaco, cadencia y temperatura que
+antes se hacía punto a punto en bucles de Python (procesadores de
+archivos y DataEnricher).
+
+Las métricas se calculan sobre columnas (arrays de lat, lon, ele, time,
+hr, cad, temp). TrackMetrics permite alimentarlas por bloques, de modo
+que una ruta leída en streaming no necesita estar entera en memoria:
+cada bloque se procesa con operaciones vectorizadas y el resultado se
+combina con el estado del bloque anterior. Con keep_profile se guarda
+además el perfil de la ruta (distancia acumulada, tiempo, elevación y
+ritmo cardíaco de cada punto) para buscar los mejores esfuerzos
+(trainings.efforts) y el tiempo en cada zona (trainings.zones).
+"""
+
+import datetime
+from operator import itemgetter
+
+import numpy as np
+
+# Radio medio de la Tierra en metros
+EARTH_RADIUS_M = 6371000.0
+
+NAN = float('nan')
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distancia en metros entre pares de puntos (arrays o escalares)"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def to_column(values):
+    """Convierte una secuencia con None en un array float64 con NaN"""
+    # NumPy convierte None en NaN al crear un array de tipo float
+    return np.array(values, dtype=np.float64)
+
+
+def _utc_timestamp(value):
+    # Las fechas sin zona horaria se interpretan como UTC
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def to_timestamps(values):
+    """Convierte una secuencia de datetime (o None) en segundos epoch con NaN"""
+    values = list(values)
+    first = next((value for value in values if value is not None), None)
+    if first is None:
+        return np.full(len(values), NAN)
+
+    to_seconds = datetime.datetime.timestamp if first.tzinfo is not None else _utc_timestamp
+    if None in values:
+        return np.array([NAN if value is None else to_seconds(value) for value in values], dtype=np.float64)
+    return np.fromiter(map(to_seconds, values), dtype=np.float64, count=len(values))
+
+
+# Posición de cada columna en TrackPointRecord
+_RECORD_COLUMNS = (
+    ('time', 0), ('lat', 1), ('lon', 2), ('ele', 3),
+    ('hr', 4), ('cad', 6), ('temp', 7),
+)
+_DICT_COLUMNS = (
+    ('time', 'time'), ('lat', 'latitude'), ('lon', 'longitude'), ('ele', 'elevation'),
+    ('hr', 'heart_rate'), ('cad', 'cadence'), ('temp', 'temperature'),
+)
+
+
+def columns_from_records(records):
+    """
+    Convierte una lista de TrackPointRecord (o diccionarios con las mismas
+    claves) en columnas NumPy.
+
+    Returns:
+        dict con arrays lat, lon, ele, time (segundos epoch), hr, cad, temp
+    """
+    if not records:
+        return {name: np.empty(0) for name, _ in _RECORD_COLUMNS}
+
+    if isinstance(records[0], dict):
+        values = {name: [record.get(key) for record in records] for name, key in _DICT_COLUMNS}
+    else:
+        values = {name: list(map(itemgetter(index), records)) for name, index in _RECORD_COLUMNS}
+
+    columns = {name: to_column(column) for name, column in values.items() if name != 'time'}
+    columns['time'] = to_timestamps(values['time'])
+    return columns
+
+
+def _truthy(values):
+    """Valores presentes y distintos de cero (mismo criterio que los procesadores)"""
+    return values[np.isfinite(values) & (values != 0)]
+
+
+class _Series:
+    """Acumulador de suma, número, mínimo y máximo de una serie"""
+
+    __slots__ = ('total', 'count', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, values):
+        values = _truthy(values)
+        if not values.size:
+            return
+        self.total += float(values.sum())
+        self.count += int(values.size)
+        low, high = float(values.min()), float(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class TrackMetrics:
+    """
+    Acumula las métricas de una ruta a partir de bloques de columnas.
+
+        metrics = TrackMetrics()
+        for bloque in bloques:
+            speeds = metrics.add(**columns_from_records(bloque))
+        campos = metrics.result()
+
+    La velocidad de cada punto se calcula respecto al punto anterior
+    (aunque esté en el bloque previo) cuando ambos tienen tiempo y el
+    intervalo es positivo.
+
+    Args:
+        keep_profile: guardar el perfil de la ruta (ver profile())
+    """
+
+    def __init__(self, keep_profile=False):
+        self.points = 0
+        self.distance_m = 0.0
+        self.first_time = None
+        self.last_time = None
+        self.elevation_gain = 0.0
+        self.has_elevation = False
+        self.speed = _Series()
+        self.heart_rate = _Series()
+        self.cadence = _Series()
+        self.temperature = _Series()
+
+        # Último punto del bloque anterior (lat, lon, time) y última elevación válida
+        self._previous = None
+        self._previous_elevation = None
+        # Bloques del perfil (distancia acumulada, tiempo, elevación, ritmo cardíaco)
+        self._profile = [] if keep_profile else None
+
+    def add(self, lat, lon, time, ele=None, hr=None, cad=None, temp=None):
+        """
+        Añade un bloque de puntos consecutivos.
+
+        Returns:
+            ndarray con la velocidad (km/h) de cada punto del bloque, NaN
+            cuando no se puede calcular
+        """
+        n = len(lat)
+        if not n:
+            return np.empty(0)
+        self.points += n
+
+        # Punto anterior de cada punto (el primero usa el último del bloque previo)
+        if self._previous is not None:
+            prev_lat = np.concatenate(([self._previous[0]], lat[:-1]))
+            prev_lon = np.concatenate(([self._previous[1]], lon[:-1]))
+            prev_time = np.concatenate(([self._previous[2]], time[:-1]))
+        else:
+            prev_lat = np.concatenate(([NAN], lat[:-1]))
+            prev_lon = np.concatenate(([NAN], lon[:-1]))
+            prev_time = np.concatenate(([NAN], time[:-1]))
+        self._previous = (lat[-1], lon[-1], time[-1])
+
+        # Distancia y velocidad por segmento
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dt = time - prev_time
+            distance = haversine(prev_lat, prev_lon, lat, lon)
+            valid = (dt > 0) & np.isfinite(distance)
+            speeds = np.where(valid, distance / dt * 3.6, NAN)
+
+        if self._profile is not None:
+            self._add_profile(np.where(valid, distance, 0.0), time, ele, hr)
+
+        self.distance_m += float(distance[valid].sum())
+        self.speed.add(speeds[valid])
+
+        # Primer y último tiempo válidos
+        times = time[np.isfinite(time)]
+        if times.size:
+            if self.first_time is None:
+                self.first_time = float(times[0])
+            self.last_time = float(times[-1])
+
+        # Desnivel positivo sobre las elevaciones válidas consecutivas
+        if ele is not None:
+            elevations = _truthy(ele)
+            if elevations.size:
+                if self._previous_elevation is not None:
+                    elevations = np.concatenate(([self._previous_elevation], elevations))
+                diffs = np.diff(elevations)
+                self.elevation_gain += float(diffs[diffs > 0].sum())
+                self._previous_elevation = float(elevations[-1])
+                self.has_elevation = True
+
+        if hr is not None:
+            self.heart_rate.add(hr)
+        if cad is not None:
+            self.cadence.add(cad)
+        if temp is not None:
+            self.temperature.add(temp)
+
+        return speeds
+
+    def _add_profile(self, distance, time, ele, hr):
+        """Guarda el perfil de los puntos del bloque que tienen tiempo"""
+        acumulada = self.distance_m + np.cumsum(distance)
+        con_tiempo = np.isfinite(time)
+        if ele is None:
+            ele = np.full(len(time), NAN)
+        if hr is None:
+            hr = np.full(len(time), NAN)
+        self._profile.append((acumulada[con_tiempo], time[con_tiempo], ele[con_tiempo], hr[con_tiempo]))
+
+    def profile(self):
+        """
+        Perfil de la ruta (solo con keep_profile).
+
+        Returns:
+            dict con arrays distance (metros acumulados), time (segundos
+            epoch), ele y hr (NaN si no hay) de los puntos con tiempo
+        """
+        if not self._profile:
+            return {name: np.empty(0) for name in ('distance', 'time', 'ele', 'hr')}
+        distance, time, ele, hr = (np.concatenate(column) for column in zip(*self._profile))
+        return {'distance': distance, 'time': time, 'ele': ele, 'hr': hr}
+
+    def add_records(self, records):
+        """Atajo: añade un bloque de TrackPointRecord y devuelve sus velocidades"""
+        return self.add(**columns_from_records(records))
+
+    def result(self):
+        """
+        Devuelve las métricas con los nombres y unidades de los campos de Training.
+
+        Solo se incluyen los campos que se han podido calcular.
+        """
+        campos = {}
+
+        if self.first_time is not None:
+            inicio = datetime.datetime.fromtimestamp(self.first_time, tz=datetime.timezone.utc)
+            campos['start'] = inicio
+            campos['duration'] = datetime.timedelta(seconds=self.last_time - self.first_time)
+
+        if self.distance_m > 0:
+            campos['distance'] = self.distance_m / 1000  # Convertir a km
+
+        if self.speed.count:
+            campos['avg_speed'] = self.speed.mean
+            campos['max_speed'] = self.speed.maximum
+
+        if self.has_elevation:
+            campos['elevation_gain'] = self.elevation_gain
+
+        if self.heart_rate.count:
+            campos['avg_heart_rate'] = self.heart_rate.mean
+            campos['max_heart_rate'] = self.heart_rate.maximum
+
+        if self.cadence.count:
+            campos['avg_cadence'] = self.cadence.mean
+            campos['max_cadence'] = self.cadence.maximum
+
+        if self.temperature.count:
+            campos['avg_temperature'] = self.temperature.mean
+            campos['min_temperature'] = self.temperature.minimum
+            campos['max_temperature'] = self.temperature.maximum
+
+        return campos
+
+
+def compute_track_metrics(lat, lon, time, ele=None, hr=None, cad=None, temp=None):
+    """Calcula de una vez todas las métricas de una ruta ya en columnas"""
+    metrics = TrackMetrics()
+    metrics.add(lat, lon, time, ele=ele, hr=hr, cad=cad, temp=temp)
+    return metrics.result()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0003_processingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='training',
+            name='file_hash',
+            field=models.CharField(blank=True, db_column='hash_archivo', db_index=True, max_length=64, null=True, verbose_name='Hash del archivo'),
+        ),
+    ]
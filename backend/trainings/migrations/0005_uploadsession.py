@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trainings', '0004_training_file_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=255, verbose_name='Nombre del archivo')),
+                ('total_size', models.BigIntegerField(verbose_name='Tamaño total (bytes)')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Bytes recibidos')),
+                ('checksum', models.CharField(blank=True, max_length=64, null=True, verbose_name='SHA-256 esperado')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='Datos del entrenamiento')),
+                ('status', models.CharField(choices=[('open', 'Abierta'), ('complete', 'Completada'), ('cancelled', 'Cancelada')], default='open', max_length=20, verbose_name='Estado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('expires_at', models.DateTimeField(verbose_name='Caduca')),
+                ('training', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='trainings.training', verbose_name='Entrenamiento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Subida por fragmentos',
+                'verbose_name_plural': 'Subidas por fragmentos',
+                'db_table': 'sesiones_subida',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
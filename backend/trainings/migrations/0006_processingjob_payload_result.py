@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Datos del trabajo'),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='result',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Resultado'),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('process_file', 'Procesar archivo de entrenamiento'), ('import_archive', 'Importar archivo zip de entrenamientos')], default='process_file', max_length=30, verbose_name='Tipo de trabajo'),
+        ),
+    ]
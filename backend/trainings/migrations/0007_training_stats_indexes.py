@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0006_processingjob_payload_result'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['user', 'date'], name='entrenamientos_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['user', 'distance'], name='entrenamientos_user_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['user', 'duration'], name='entrenamientos_user_dur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['user', 'max_speed'], name='entrenamientos_user_speed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['user', 'elevation_gain'], name='entrenamientos_user_elev_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0007_training_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('process_file', 'Procesar archivo de entrenamiento'), ('import_archive', 'Importar archivo zip de entrenamientos'), ('refresh_stats', 'Recalcular estadísticas del usuario')], default='process_file', max_length=30, verbose_name='Tipo de trabajo'),
+        ),
+    ]
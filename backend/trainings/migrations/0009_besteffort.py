@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trainings', '0008_alter_processingjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestEffort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effort', models.CharField(choices=[('1k', '1 km'), ('5k', '5 km'), ('10k', '10 km'), ('half_marathon', 'Media maratón'), ('marathon', 'Maratón'), ('5min', '5 minutos'), ('20min', '20 minutos'), ('60min', '60 minutos'), ('longest_climb', 'Subida más larga')], max_length=20, verbose_name='Esfuerzo')),
+                ('elapsed_time', models.DurationField(verbose_name='Tiempo')),
+                ('distance', models.FloatField(help_text='Distancia en kilómetros', verbose_name='Distancia')),
+                ('elevation_gain', models.FloatField(blank=True, help_text='Desnivel positivo en metros (subidas)', null=True, verbose_name='Desnivel')),
+                ('start_offset', models.DurationField(help_text='Tiempo desde el inicio del entrenamiento', verbose_name='Inicio')),
+                ('ranking', models.FloatField(verbose_name='Valor de ordenación')),
+                ('training', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_efforts', to='trainings.training', verbose_name='Entrenamiento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_efforts', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Mejor esfuerzo',
+                'verbose_name_plural': 'Mejores esfuerzos',
+                'db_table': 'mejores_esfuerzos',
+                'ordering': ['effort', 'ranking'],
+                'indexes': [models.Index(fields=['user', 'effort', 'ranking'], name='esfuerzos_user_ranking_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='besteffort',
+            constraint=models.UniqueConstraint(fields=('training', 'effort'), name='esfuerzo_unico_por_entrenamiento'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0009_besteffort'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='training',
+            name='hr_zone1_seconds',
+            field=models.FloatField(db_column='segundos_zona_1', default=0, help_text='Segundos en zona 1 (50-60% FC máx.)', verbose_name='Tiempo en zona 1'),
+        ),
+        migrations.AddField(
+            model_name='training',
+            name='hr_zone2_seconds',
+            field=models.FloatField(db_column='segundos_zona_2', default=0, help_text='Segundos en zona 2 (60-70% FC máx.)', verbose_name='Tiempo en zona 2'),
+        ),
+        migrations.AddField(
+            model_name='training',
+            name='hr_zone3_seconds',
+            field=models.FloatField(db_column='segundos_zona_3', default=0, help_text='Segundos en zona 3 (70-80% FC máx.)', verbose_name='Tiempo en zona 3'),
+        ),
+        migrations.AddField(
+            model_name='training',
+            name='hr_zone4_seconds',
+            field=models.FloatField(db_column='segundos_zona_4', default=0, help_text='Segundos en zona 4 (80-90% FC máx.)', verbose_name='Tiempo en zona 4'),
+        ),
+        migrations.AddField(
+            model_name='training',
+            name='hr_zone5_seconds',
+            field=models.FloatField(db_column='segundos_zona_5', default=0, help_text='Segundos en zona 5 (más del 90% FC máx.)', verbose_name='Tiempo en zona 5'),
+        ),
+        migrations.AddField(
+            model_name='training',
+            name='hr_zones_max_hr',
+            field=models.FloatField(blank=True, db_column='fc_máxima_zonas', help_text='FC máxima con la que se calcularon las zonas', null=True, verbose_name='FC máxima de las zonas'),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('process_file', 'Procesar archivo de entrenamiento'), ('import_archive', 'Importar archivo zip de entrenamientos'), ('refresh_stats', 'Recalcular estadísticas del usuario'), ('heart_rate_zones', 'Recalcular zonas de frecuencia cardíaca')], default='process_file', max_length=30, verbose_name='Tipo de trabajo'),
+        ),
+    ]
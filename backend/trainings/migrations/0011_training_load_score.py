@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0010_training_heart_rate_zones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='training',
+            name='load_score',
+            field=models.FloatField(db_column='carga', default=0, help_text='Carga del entrenamiento (TRIMP)', verbose_name='Carga'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0011_training_load_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Abierta'), ('finalizing', 'Finalizando'), ('complete', 'Completada'), ('cancelled', 'Cancelada')], default='open', max_length=20, verbose_name='Estado'),
+        ),
+    ]
@@ -4,24 +4,39 @@ Módulo para gestionar los modelos de entrenamientos.
 Este módulo contiene las clases de modelos para:
 - Training: Almacena los datos principales de un entrenamiento
 - TrackPoint: Guarda los puntos GPS de la ruta seguida
+- BestEffort: Mejores esfuerzos (récords) de cada entrenamiento
 - Goal: Maneja los objetivos de entrenamiento del usuario
+- ProcessingJob: Cola de trabajos de procesamiento de archivos en segundo plano
+- UploadSession: Subidas de archivos por fragmentos (reanudables)
 
 Autor: Juan Manuel Ordás Periscal
 Fecha: Mayo 2025
 Proyecto: AthCyl - Gestión de entrenamientos deportivos
 """
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from users.models import User
+from .parsers.compression import COMPRESSION_SUFFIXES
 import uuid
 import os
 
 def gpx_file_path(instance, filename):
-    """Genera una ruta única para los archivos GPX/TCX"""
-    ext = filename.split('.')[-1].lower()
+    """
+    Genera una ruta única para los archivos GPX/TCX/FIT.
+    
+    Los archivos comprimidos conservan la doble extensión (p. ej. .gpx.gz)
+    para saber cómo procesarlos de nuevo.
+    """
+    parts = filename.lower().split('.')
+    ext = '.'.join(parts[-2:]) if len(parts) > 2 and f".{parts[-1]}" in COMPRESSION_SUFFIXES else parts[-1]
     filename = f"{uuid.uuid4()}.{ext}"
     return os.path.join('entrenamientos/archivos', filename)
 
+# Segundos en cada zona de frecuencia cardíaca (de la 1 a la 5)
+HR_ZONE_FIELDS = tuple(f'hr_zone{zona}_seconds' for zona in range(1, 6))
+
 class Training(models.Model):
     """
     Modelo para almacenar entrenamientos de los usuarios.
@@ -51,6 +66,8 @@ class Training(models.Model):
     
     # Archivo GPX/TCX subido por el usuario
     gpx_file = models.FileField(upload_to=gpx_file_path, blank=True, null=True, verbose_name="Archivo GPX/TCX", db_column="archivo_gpx_tc")
+    # Hash SHA-256 del contenido del archivo (detecta subidas repetidas)
+    file_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True, verbose_name="Hash del archivo", db_column="hash_archivo")
     
     # Información temporal del entrenamiento
     date = models.DateField(blank=True, null=True, verbose_name="Fecha", db_column="fecha")
@@ -68,6 +85,17 @@ class Training(models.Model):
     elevation_gain = models.FloatField(blank=True, null=True, help_text="Ganancia de elevación en metros", verbose_name="Ganancia de elevación")
     calories = models.IntegerField(blank=True, null=True, help_text="Calorías quemadas", verbose_name="Calorías quemadas")
     
+    # Tiempo en cada zona de frecuencia cardíaca (ver trainings.zones)
+    hr_zone1_seconds = models.FloatField(default=0, help_text="Segundos en zona 1 (50-60% FC máx.)", verbose_name="Tiempo en zona 1", db_column="segundos_zona_1")
+    hr_zone2_seconds = models.FloatField(default=0, help_text="Segundos en zona 2 (60-70% FC máx.)", verbose_name="Tiempo en zona 2", db_column="segundos_zona_2")
+    hr_zone3_seconds = models.FloatField(default=0, help_text="Segundos en zona 3 (70-80% FC máx.)", verbose_name="Tiempo en zona 3", db_column="segundos_zona_3")
+    hr_zone4_seconds = models.FloatField(default=0, help_text="Segundos en zona 4 (80-90% FC máx.)", verbose_name="Tiempo en zona 4", db_column="segundos_zona_4")
+    hr_zone5_seconds = models.FloatField(default=0, help_text="Segundos en zona 5 (más del 90% FC máx.)", verbose_name="Tiempo en zona 5", db_column="segundos_zona_5")
+    hr_zones_max_hr = models.FloatField(blank=True, null=True, help_text="FC máxima con la que se calcularon las zonas", verbose_name="FC máxima de las zonas", db_column="fc_máxima_zonas")
+    
+    # Carga del entrenamiento (ver trainings.load)
+    load_score = models.FloatField(default=0, help_text="Carga del entrenamiento (TRIMP)", verbose_name="Carga", db_column="carga")
+    
     # Nuevos campos para datos adicionales de GPX/TCX
     avg_cadence = models.FloatField(blank=True, null=True, help_text="Cadencia promedio (pasos/min)", verbose_name="Cadencia promedio", db_column="cadencia_promedio")
     max_cadence = models.FloatField(blank=True, null=True, help_text="Cadencia máxima (pasos/min)", verbose_name="Cadencia máxima", db_column="cadencia_máxima")
@@ -89,6 +117,9 @@ class Training(models.Model):
     
     def save(self, *args, **kwargs):
         """Sobrescribe el método save para validar datos antes de guardar"""
+        # Importar aquí para evitar importación circular (trainings.load importa este módulo)
+        from .load import LOAD_SOURCE_FIELDS, training_load
+        
         # Si no hay título, generar uno automático
         if not self.title:
             tipo_actividad = self.get_activity_type_display()
@@ -97,6 +128,13 @@ class Training(models.Model):
             else:
                 self.title = f"{tipo_actividad}"
         
+        # Recalcular la carga si cambia alguno de los campos de los que depende
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(LOAD_SOURCE_FIELDS):
+            self.load_score = training_load(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'load_score'}
+        
         super().save(*args, **kwargs)
     
     class Meta:
@@ -105,6 +143,14 @@ class Training(models.Model):
         verbose_name_plural = "Entrenamientos"
         db_table = "entrenamientos"  # Nombre de tabla en español
         ordering = ['-date', '-start_time']  # Ordenar por fecha descendente y luego por hora
+        indexes = [
+            # Consultas top-1 de los récords y fechas de UserStats
+            models.Index(fields=['user', 'date'], name='entrenamientos_user_date_idx'),
+            models.Index(fields=['user', 'distance'], name='entrenamientos_user_dist_idx'),
+            models.Index(fields=['user', 'duration'], name='entrenamientos_user_dur_idx'),
+            models.Index(fields=['user', 'max_speed'], name='entrenamientos_user_speed_idx'),
+            models.Index(fields=['user', 'elevation_gain'], name='entrenamientos_user_elev_idx'),
+        ]
 
 class TrackPoint(models.Model):
     """
@@ -133,6 +179,57 @@ class TrackPoint(models.Model):
         db_table = "puntos_ruta"  # Nombre de tabla en español
         ordering = ['time']  # Ordenamos por tiempo para mantener la secuencia correcta
 
+class BestEffort(models.Model):
+    """
+    Mejor esfuerzo de un entrenamiento: el menor tiempo en una distancia
+    estándar, la mayor distancia en una duración estándar o la subida más
+    larga. Se calcula al procesar el archivo (ver trainings.efforts).
+    
+    ranking ordena los esfuerzos del mismo tipo de mejor a peor (menor es
+    mejor), de modo que el récord del usuario es el primero del índice
+    (user, effort, ranking).
+    """
+    
+    EFFORT_CHOICES = [
+        ('1k', '1 km'),
+        ('5k', '5 km'),
+        ('10k', '10 km'),
+        ('half_marathon', 'Media maratón'),
+        ('marathon', 'Maratón'),
+        ('5min', '5 minutos'),
+        ('20min', '20 minutos'),
+        ('60min', '60 minutos'),
+        ('longest_climb', 'Subida más larga'),
+    ]
+    
+    training = models.ForeignKey(Training, on_delete=models.CASCADE, related_name='best_efforts', verbose_name="Entrenamiento")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='best_efforts', verbose_name="Usuario")
+    effort = models.CharField(max_length=20, choices=EFFORT_CHOICES, verbose_name="Esfuerzo")
+    
+    elapsed_time = models.DurationField(verbose_name="Tiempo")
+    distance = models.FloatField(help_text="Distancia en kilómetros", verbose_name="Distancia")
+    elevation_gain = models.FloatField(blank=True, null=True, help_text="Desnivel positivo en metros (subidas)", verbose_name="Desnivel")
+    start_offset = models.DurationField(help_text="Tiempo desde el inicio del entrenamiento", verbose_name="Inicio")
+    
+    # Segundos (distancias) o valor negativo de la distancia o el desnivel (duraciones y subidas)
+    ranking = models.FloatField(verbose_name="Valor de ordenación")
+    
+    def __str__(self):
+        return f"{self.get_effort_display()} en {self.training.title}"
+    
+    class Meta:
+        verbose_name = "Mejor esfuerzo"
+        verbose_name_plural = "Mejores esfuerzos"
+        db_table = "mejores_esfuerzos"  # Nombre de tabla en español
+        ordering = ['effort', 'ranking']
+        constraints = [
+            models.UniqueConstraint(fields=['training', 'effort'], name='esfuerzo_unico_por_entrenamiento'),
+        ]
+        indexes = [
+            # Récords del usuario: primer esfuerzo de cada tipo por ranking
+            models.Index(fields=['user', 'effort', 'ranking'], name='esfuerzos_user_ranking_idx'),
+        ]
+
 class Goal(models.Model):
     """
     Modelo para almacenar objetivos de entrenamiento del usuario.
@@ -182,4 +279,131 @@ class Goal(models.Model):
         ordering = ['-created_at']
         verbose_name = "Objetivo"
         verbose_name_plural = "Objetivos"
-        db_table = "objetivos"  # Nombre de tabla en español
\ No newline at end of file
+        db_table = "objetivos"  # Nombre de tabla en español
+
+
+class ProcessingJob(models.Model):
+    """
+    Trabajo de procesamiento en segundo plano (cola en base de datos).
+
+    Los trabajos los reclaman los procesos de run_processing_worker con
+    SELECT ... FOR UPDATE SKIP LOCKED, de modo que varios workers pueden
+    trabajar a la vez sin repartirse el mismo trabajo ni necesitar un
+    broker externo.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+
+    KIND_PROCESS_FILE = 'process_file'
+    KIND_IMPORT_ARCHIVE = 'import_archive'
+    KIND_REFRESH_STATS = 'refresh_stats'
+    KIND_HEART_RATE_ZONES = 'heart_rate_zones'
+
+    KIND_CHOICES = [
+        (KIND_PROCESS_FILE, 'Procesar archivo de entrenamiento'),
+        (KIND_IMPORT_ARCHIVE, 'Importar archivo zip de entrenamientos'),
+        (KIND_REFRESH_STATS, 'Recalcular estadísticas del usuario'),
+        (KIND_HEART_RATE_ZONES, 'Recalcular zonas de frecuencia cardíaca'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='processing_jobs', verbose_name="Usuario")
+    training = models.ForeignKey(Training, on_delete=models.CASCADE, blank=True, null=True, related_name='processing_jobs', verbose_name="Entrenamiento")
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, default=KIND_PROCESS_FILE, verbose_name="Tipo de trabajo")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Estado")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    error = models.TextField(blank=True, null=True, verbose_name="Error")
+    # Datos de entrada del trabajo (p. ej. el archivo zip a importar) y resultado o progreso
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Datos del trabajo")
+    result = models.JSONField(default=dict, blank=True, verbose_name="Resultado")
+
+    # Reparto entre workers: quién lo tiene y hasta cuándo (si el worker muere, se reintenta)
+    worker = models.CharField(max_length=100, blank=True, null=True, verbose_name="Worker")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Ejecutar a partir de")
+    lease_expires_at = models.DateTimeField(blank=True, null=True, verbose_name="Reserva hasta")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Fin")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Trabajo de procesamiento"
+        verbose_name_plural = "Trabajos de procesamiento"
+        db_table = "trabajos_procesamiento"  # Nombre de tabla en español
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='trabajo_estado_idx'),
+        ]
+
+
+class UploadSession(models.Model):
+    """
+    Subida reanudable de un archivo de entrenamiento por fragmentos.
+
+    Los fragmentos se escriben directamente en un archivo de staging
+    (TRAINING_UPLOAD_STAGING_DIR) en la posición indicada; received guarda
+    cuántos bytes consecutivos se han recibido, que es el punto desde el que
+    el cliente reanuda si se corta la conexión. Al finalizar se comprueba el
+    tamaño y el SHA-256 y el archivo pasa al flujo normal de creación
+    (mientras tanto la subida está 'finalizing').
+    """
+
+    STATUS_OPEN = 'open'
+    STATUS_FINALIZING = 'finalizing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CANCELLED = 'cancelled'
+
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Abierta'),
+        (STATUS_FINALIZING, 'Finalizando'),
+        (STATUS_COMPLETE, 'Completada'),
+        (STATUS_CANCELLED, 'Cancelada'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name="Usuario")
+
+    file_name = models.CharField(max_length=255, verbose_name="Nombre del archivo")
+    total_size = models.BigIntegerField(verbose_name="Tamaño total (bytes)")
+    received = models.BigIntegerField(default=0, verbose_name="Bytes recibidos")
+    checksum = models.CharField(max_length=64, blank=True, null=True, verbose_name="SHA-256 esperado")
+    # Campos del entrenamiento enviados al iniciar la subida (título, tipo de actividad...)
+    metadata = models.JSONField(default=dict, blank=True, verbose_name="Datos del entrenamiento")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN, verbose_name="Estado")
+    training = models.ForeignKey(Training, on_delete=models.SET_NULL, blank=True, null=True, related_name='upload_sessions', verbose_name="Entrenamiento")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+    expires_at = models.DateTimeField(verbose_name="Caduca")
+
+    @property
+    def staging_path(self):
+        """Ruta del archivo donde se van escribiendo los fragmentos"""
+        return os.path.join(settings.TRAINING_UPLOAD_STAGING_DIR, f"{self.id}.part")
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received}/{self.total_size} bytes, {self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Subida por fragmentos"
+        verbose_name_plural = "Subidas por fragmentos"
+        db_table = "sesiones_subida"  # Nombre de tabla en español
@@ -0,0 +1,141 @@
+"""
+Descompresión en streaming de archivos de actividad comprimidos.
+
+Los GPX y TCX son XML muy repetitivo que se comprime entre 8 y 15 veces,
+así que se aceptan subidas con doble extensión (.gpx.gz, .tcx.zst...).
+El archivo se guarda tal cual, comprimido, y al procesarlo se descomprime
+sobre la marcha: los lectores reciben un objeto archivo que va
+descomprimiendo a medida que leen, sin copia temporal descomprimida.
+
+El tamaño descomprimido se puede acotar (max_size): un archivo que se
+expande por encima del límite (bomba de descompresión) se rechaza al
+llegar a él, sin haberlo descomprimido entero. Los lectores que necesitan
+el contenido completo (FIT) lo reciben en un archivo temporal en disco
+(spool_decompressed) que se proyecta en memoria con mmap.
+
+gzip usa la librería estándar; zstd necesita el paquete opcional
+zstandard (ZSTD_AVAILABLE). Al procesar, la compresión se reconoce por
+los bytes mágicos del archivo; la extensión solo se usa para filtrar y
+guardar los nombres.
+"""
+
+import contextlib
+import gzip
+import shutil
+import tempfile
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Extensión de compresión -> códec
+COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+# Tamaño de bloque al copiar el contenido descomprimido a un archivo temporal
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Bytes mágicos del principio del archivo -> códec
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def sniff_compression(head):
+    """Códec de compresión según los primeros bytes del archivo, o None"""
+    for magic, codec in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def split_compression(filename):
+    """
+    Separa la extensión de compresión del nombre de un archivo.
+
+    Returns:
+        (nombre sin la extensión de compresión, códec o None)
+
+    Ejemplo: 'salida.gpx.gz' -> ('salida.gpx', 'gzip')
+    """
+    lower = filename.lower()
+    for suffix, codec in COMPRESSION_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return filename[:-len(suffix)], codec
+    return filename, None
+
+
+class LimitedReader:
+    """
+    Envuelve un stream descomprimido y lanza ValueError en cuanto se leen
+    más de max_size bytes.
+    """
+
+    def __init__(self, stream, max_size):
+        self.stream = stream
+        self.max_size = max_size
+        self.total = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        # Nunca se pide más de lo que falta para pasar el límite (más un byte para detectarlo)
+        restante = self.max_size - self.total + 1
+        data = self.stream.read(restante if size is None or size < 0 else min(size, restante))
+        self.total += len(data)
+        if self.total > self.max_size:
+            raise ValueError(f"El archivo descomprimido supera el tamaño máximo de {self.max_size} bytes")
+        return data
+
+
+@contextlib.contextmanager
+def open_decompressed(file, codec, max_size=None):
+    """
+    Devuelve un objeto archivo que descomprime el contenido de file al leer.
+
+    Args:
+        file: archivo comprimido abierto en modo binario
+        codec: 'gzip' o 'zstd' (ver split_compression)
+        max_size: bytes descomprimidos como máximo (None: sin límite)
+
+    Raises:
+        ValueError: si el códec no está soportado o falta su librería, o
+            (al leer) si el contenido supera max_size
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    if codec == 'gzip':
+        opened = gzip.GzipFile(fileobj=file, mode='rb')
+    elif codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Compresión zstd no disponible. Ejecuta: pip install zstandard")
+        opened = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+    else:
+        raise ValueError(f"Compresión no soportada: {codec}")
+
+    with opened as stream:
+        yield stream if max_size is None else LimitedReader(stream, max_size)
+
+
+@contextlib.contextmanager
+def spool_decompressed(file, codec, max_size=None):
+    """
+    Descomprime file por bloques en un archivo temporal en disco (se
+    elimina al salir) para los lectores que necesitan el contenido
+    completo, sin copia descomprimida en memoria.
+
+    Raises:
+        ValueError: como open_decompressed
+    """
+    with tempfile.TemporaryFile() as spooled:
+        with open_decompressed(file, codec, max_size=max_size) as stream:
+            shutil.copyfileobj(stream, spooled, SPOOL_BLOCK_SIZE)
+        spooled.seek(0)
+        yield spooled
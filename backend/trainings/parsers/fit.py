@@ -0,0 +1,367 @@
+"""
+Lectura rápida de archivos FIT (Garmin, Wahoo, etc.).
+
+El procesador anterior recorría con fitparse todos los mensajes del
+archivo (device_info, hrv, event...), construyendo un FieldData por campo
+y comparando nombres en cadenas if/elif. Aunque se le pidan solo algunos
+mensajes, fitparse decodifica igualmente todos los demás.
+
+FITReader decodifica directamente el protocolo FIT y solo materializa los
+mensajes 'record', 'session' y 'lap':
+- Los mensajes que no interesan se saltan por tamaño, sin decodificarlos
+- Cada definición se compila una vez en un struct.Struct y en una lista
+  de (posición, destino, conversión) a partir de tablas por nombre
+- Con open_fit_source el archivo se lee mediante mmap si está en disco,
+  en lugar de hacer una copia en memoria de la subida
+"""
+
+import contextlib
+import datetime
+import mmap
+import os
+import struct
+
+from ..ingestion import TRACKPOINT_FIELDS, TrackPointRecord
+
+# El lector es nativo: no depende de fitparse
+FIT_AVAILABLE = True
+
+# Segundos entre la época Unix y la época FIT (31/12/1989 00:00 UTC)
+FIT_EPOCH_OFFSET = 631065600
+
+SEMICIRCLES_TO_DEGREES = 180.0 / 2 ** 31
+
+# Número de mensaje global de los mensajes FIT que se materializan
+MESG_SESSION = 18
+MESG_LAP = 19
+MESG_RECORD = 20
+FIT_MESSAGES = {'session': MESG_SESSION, 'lap': MESG_LAP, 'record': MESG_RECORD}
+
+TIMESTAMP_FIELD = 253
+
+# Tipo base FIT (5 bits bajos) -> (formato struct, tamaño, valor inválido)
+_BASE_TYPES = {
+    0x00: ('B', 1, 0xFF),                 # enum
+    0x01: ('b', 1, 0x7F),                 # sint8
+    0x02: ('B', 1, 0xFF),                 # uint8
+    0x03: ('h', 2, 0x7FFF),               # sint16
+    0x04: ('H', 2, 0xFFFF),               # uint16
+    0x05: ('i', 4, 0x7FFFFFFF),           # sint32
+    0x06: ('I', 4, 0xFFFFFFFF),           # uint32
+    0x0A: ('B', 1, 0x00),                 # uint8z
+    0x0B: ('H', 2, 0x0000),               # uint16z
+    0x0C: ('I', 4, 0x00000000),           # uint32z
+    0x0D: ('B', 1, 0xFF),                 # byte
+    0x0E: ('q', 8, 0x7FFFFFFFFFFFFFFF),   # sint64
+    0x0F: ('Q', 8, 0xFFFFFFFFFFFFFFFF),   # uint64
+    0x10: ('Q', 8, 0x0000000000000000),   # uint64z
+}
+
+
+def fit_timestamp(value):
+    """Convierte una marca de tiempo FIT en datetime UTC"""
+    return datetime.datetime.fromtimestamp(value + FIT_EPOCH_OFFSET, tz=datetime.timezone.utc)
+
+
+def _scaled(scale, offset=0):
+    return lambda value: value / scale - offset
+
+
+def _semicircles(value):
+    return value * SEMICIRCLES_TO_DEGREES
+
+
+def _speed_kmh(value):
+    return value / 1000 * 3.6  # mm/s -> km/h
+
+
+def _slot(field):
+    return TRACKPOINT_FIELDS.index(field)
+
+
+# Campos de 'record' por nombre: (número de campo FIT, destino, conversión).
+# El destino es la posición del dato en TrackPointRecord.
+RECORD_FIELDS = {
+    'timestamp': (TIMESTAMP_FIELD, _slot('time'), fit_timestamp),
+    'position_lat': (0, _slot('latitude'), _semicircles),
+    'position_long': (1, _slot('longitude'), _semicircles),
+    'altitude': (2, _slot('elevation'), _scaled(5, 500)),
+    'enhanced_altitude': (78, _slot('elevation'), _scaled(5, 500)),
+    'heart_rate': (3, _slot('heart_rate'), None),
+    'cadence': (4, _slot('cadence'), None),
+    'speed': (6, _slot('speed'), _speed_kmh),
+    'enhanced_speed': (73, _slot('speed'), _speed_kmh),
+    'temperature': (13, _slot('temperature'), None),
+}
+
+# Campos de 'session' y 'lap' por nombre: (número de campo FIT, campo de Training, conversión)
+SESSION_FIELDS = {
+    'start_time': (2, 'start_time', fit_timestamp),
+    'total_elapsed_time': (7, 'duration', _scaled(1000)),
+    'total_distance': (9, 'distance', _scaled(100 * 1000)),  # cm -> km
+    'total_calories': (11, 'calories', None),
+    'avg_speed': (14, 'avg_speed', _speed_kmh),
+    'max_speed': (15, 'max_speed', _speed_kmh),
+    'avg_heart_rate': (16, 'avg_heart_rate', None),
+    'max_heart_rate': (17, 'max_heart_rate', None),
+    'avg_cadence': (18, 'avg_cadence', None),
+    'max_cadence': (19, 'max_cadence', None),
+    'total_ascent': (22, 'elevation_gain', None),
+    'avg_temperature': (57, 'avg_temperature', None),
+    'max_temperature': (58, 'max_temperature', None),
+    'enhanced_avg_speed': (124, 'avg_speed', _speed_kmh),
+    'enhanced_max_speed': (125, 'max_speed', _speed_kmh),
+}
+
+LAP_FIELDS = {
+    'start_time': (2, 'start_time', fit_timestamp),
+    'total_elapsed_time': (7, 'duration', _scaled(1000)),
+    'total_distance': (9, 'distance', _scaled(100 * 1000)),
+    'total_calories': (11, 'calories', None),
+    'total_ascent': (21, 'elevation_gain', None),
+}
+
+# Tablas número de campo -> (destino, conversión) por mensaje global
+_FIELD_TABLES = {
+    MESG_RECORD: {num: (target, convert) for num, target, convert in RECORD_FIELDS.values()},
+    MESG_SESSION: {num: (target, convert) for num, target, convert in SESSION_FIELDS.values()},
+    MESG_LAP: {num: (target, convert) for num, target, convert in LAP_FIELDS.values()},
+}
+
+# Campos de las vueltas que se suman cuando el archivo no trae 'session'
+LAP_SUMMABLE = ('duration', 'distance', 'calories', 'elevation_gain')
+
+_EMPTY_RECORD = (None,) * len(TRACKPOINT_FIELDS)
+
+
+class FITDecodeError(Exception):
+    """Error de formato en un archivo FIT"""
+
+
+class _Definition:
+    """Definición de mensaje compilada: tamaño, struct y campos que interesan"""
+
+    __slots__ = ('global_num', 'size', 'struct', 'fields', 'timestamp_index')
+
+    def __init__(self, global_num, big_endian, field_defs, dev_size):
+        self.global_num = global_num
+        table = _FIELD_TABLES.get(global_num)
+
+        fmt = ['>' if big_endian else '<']
+        fields = []
+        self.timestamp_index = None
+        index = 0
+        for number, size, base_type in field_defs:
+            spec = _BASE_TYPES.get(base_type & 0x1F)
+            if spec is not None and spec[1] == size:
+                fmt.append(spec[0])
+                if number == TIMESTAMP_FIELD:
+                    self.timestamp_index = index
+                if table is not None and number in table:
+                    target, convert = table[number]
+                    fields.append((index, target, convert, spec[2]))
+                index += 1
+            else:
+                # Cadenas, arrays o tipos no usados: se saltan como bytes
+                fmt.append(f'{size}x')
+
+        if dev_size:
+            fmt.append(f'{dev_size}x')
+
+        self.struct = struct.Struct(''.join(fmt))
+        self.size = self.struct.size
+        self.fields = fields
+
+
+def iter_fit_messages(data, wanted=(MESG_RECORD, MESG_SESSION, MESG_LAP)):
+    """
+    Recorre los mensajes de un archivo FIT ya cargado o proyectado en memoria.
+
+    Args:
+        data: bytes, bytearray o mmap con el contenido del archivo
+        wanted: números globales de los mensajes que se quieren decodificar
+
+    Yields:
+        (número global, lista de (destino, valor convertido))
+    """
+    wanted = frozenset(wanted)
+    total = len(data)
+    pos = 0
+
+    # Un archivo puede contener varios FIT encadenados
+    while pos + 12 <= total:
+        header_size = data[pos]
+        if header_size < 12 or bytes(data[pos + 8:pos + 12]) != b'.FIT':
+            raise FITDecodeError("Cabecera FIT no válida")
+        data_size = struct.unpack_from('<I', data, pos + 4)[0]
+        pos += header_size
+        end = pos + data_size
+        if end > total:
+            raise FITDecodeError("Archivo FIT truncado")
+
+        definitions = {}
+        last_timestamp = None
+
+        while pos < end:
+            header = data[pos]
+            pos += 1
+
+            if header & 0x80:
+                # Cabecera con marca de tiempo comprimida
+                local = (header >> 5) & 0x03
+                offset = header & 0x1F
+                if last_timestamp is not None:
+                    timestamp = (last_timestamp & ~0x1F) + offset
+                    if offset < (last_timestamp & 0x1F):
+                        timestamp += 0x20
+                    last_timestamp = timestamp
+                compressed = True
+            elif header & 0x40:
+                # Mensaje de definición
+                local = header & 0x0F
+                big_endian = data[pos + 1] == 1
+                global_num = struct.unpack_from('>H' if big_endian else '<H', data, pos + 2)[0]
+                num_fields = data[pos + 4]
+                pos += 5
+                field_defs = [
+                    (data[pos + i * 3], data[pos + i * 3 + 1], data[pos + i * 3 + 2])
+                    for i in range(num_fields)
+                ]
+                pos += num_fields * 3
+
+                dev_size = 0
+                if header & 0x20:
+                    num_dev = data[pos]
+                    pos += 1
+                    dev_size = sum(data[pos + i * 3 + 1] for i in range(num_dev))
+                    pos += num_dev * 3
+
+                definitions[local] = _Definition(global_num, big_endian, field_defs, dev_size)
+                continue
+            else:
+                local = header & 0x0F
+                compressed = False
+
+            definition = definitions.get(local)
+            if definition is None:
+                raise FITDecodeError(f"Mensaje sin definición (tipo local {local})")
+
+            if definition.global_num not in wanted and definition.timestamp_index is None:
+                # Mensaje que no interesa y no actualiza la marca de tiempo: se salta
+                pos += definition.size
+                continue
+
+            values = definition.struct.unpack_from(data, pos)
+            pos += definition.size
+
+            if definition.timestamp_index is not None:
+                last_timestamp = values[definition.timestamp_index]
+
+            if definition.global_num not in wanted:
+                continue
+
+            decoded = []
+            for index, target, convert, invalid in definition.fields:
+                value = values[index]
+                if value != invalid:
+                    decoded.append((target, convert(value) if convert else value))
+            if compressed and last_timestamp is not None and MESG_RECORD == definition.global_num:
+                decoded.append((_slot('time'), fit_timestamp(last_timestamp)))
+            yield definition.global_num, decoded
+
+        pos = end + 2  # CRC del archivo
+
+
+@contextlib.contextmanager
+def open_fit_source(fit_file):
+    """
+    Devuelve el contenido del archivo FIT listo para decodificar.
+
+    Si el archivo está en disco (subida temporal o archivo ya guardado) se
+    proyecta en memoria con mmap; si no, se lee del propio objeto archivo.
+    Los FIT comprimidos llegan ya descomprimidos en un archivo temporal
+    (compression.spool_decompressed). También acepta el contenido ya leído
+    (bytes).
+    """
+    if isinstance(fit_file, (bytes, bytearray, memoryview)):
+        yield fit_file
+        return
+
+    path = None
+    if hasattr(fit_file, 'temporary_file_path'):
+        path = fit_file.temporary_file_path()
+        # El almacenamiento ya lo ha movido a su destino: se usa el archivo abierto
+        if not os.path.exists(path):
+            path = None
+    elif isinstance(fit_file, (str, os.PathLike)):
+        path = fit_file
+
+    if path is not None:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        return
+
+    # Archivos ya abiertos en disco (p. ej. training.gpx_file.open('rb'))
+    raw = getattr(fit_file, 'file', fit_file)
+    try:
+        fileno = raw.fileno()
+        size = os.fstat(fileno).st_size
+    except (AttributeError, OSError, ValueError):
+        fileno, size = None, 0
+
+    if fileno is not None and size > 0:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+        return
+
+    if hasattr(fit_file, 'seek'):
+        fit_file.seek(0)
+    yield fit_file.read()
+
+
+class FITReader:
+    """
+    Lector FIT que solo materializa los mensajes record, session y lap.
+
+    Al iterar produce un TrackPointRecord por cada mensaje 'record' con
+    marca de tiempo. Al terminar, `summary` contiene los datos de la
+    sesión con los nombres y unidades de los campos de Training (o la
+    suma de las vueltas si el archivo no incluye mensaje 'session').
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.points = 0
+        self.summary = {}
+
+    def __iter__(self):
+        session = {}
+        laps = {}
+        has_session = False
+        time_slot = _slot('time')
+
+        for global_num, values in iter_fit_messages(self.source):
+            if global_num == MESG_RECORD:
+                slots = list(_EMPTY_RECORD)
+                for index, value in values:
+                    slots[index] = value
+                if slots[time_slot] is not None:
+                    self.points += 1
+                    yield TrackPointRecord._make(slots)
+
+            elif global_num == MESG_SESSION:
+                has_session = True
+                session.update(values)
+
+            else:  # lap
+                lap = dict(values)
+                laps.setdefault('start_time', lap.get('start_time'))
+                for key in LAP_SUMMABLE:
+                    if lap.get(key):
+                        laps[key] = laps.get(key, 0) + lap[key]
+
+        self.summary = session if has_session else {k: v for k, v in laps.items() if v}
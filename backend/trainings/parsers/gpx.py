@@ -0,0 +1,167 @@
+"""
+Lector de archivos GPX en streaming basado en lxml.etree.iterparse.
+
+En lugar de construir el árbol completo de objetos de gpxpy, recorre el
+XML elemento a elemento, produce un TrackPointRecord por cada <trkpt> y
+libera cada elemento después de leerlo, de forma que la memoria usada no
+depende del tamaño del archivo.
+
+Los datos de las extensiones (ritmo cardíaco, cadencia, temperatura) se
+localizan comparando la etiqueta de cada hijo con una tabla de etiquetas
+con espacio de nombres ya calculadas, sin búsquedas XPath por punto.
+"""
+
+import datetime
+import functools
+
+from dateutil import parser as date_parser
+
+from ..ingestion import TrackPointRecord
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Espacios de nombres habituales en archivos GPX y sus extensiones
+GPX_NAMESPACES = (
+    'http://www.topografix.com/GPX/1/1',
+    'http://www.topografix.com/GPX/1/0',
+)
+EXTENSION_NAMESPACES = (
+    'http://www.garmin.com/xmlschemas/TrackPointExtension/v1',
+    'http://www.garmin.com/xmlschemas/TrackPointExtension/v2',
+    'http://www.cluetrust.com/XML/GPXDATA/1/0',
+)
+
+# Nombre local de la etiqueta -> campo de TrackPointRecord
+LOCAL_NAME_FIELDS = {
+    'ele': 'elevation',
+    'time': 'time',
+    'hr': 'heart_rate',
+    'cad': 'cadence',
+    'cadence': 'cadence',
+    'atemp': 'temperature',
+    'temp': 'temperature',
+}
+
+
+def _build_tag_table():
+    """Precalcula la etiqueta completa '{ns}nombre' de cada dato que interesa"""
+    tabla = {}
+    for ns in GPX_NAMESPACES:
+        tabla[f'{{{ns}}}ele'] = 'elevation'
+        tabla[f'{{{ns}}}time'] = 'time'
+    for ns in EXTENSION_NAMESPACES:
+        for local_name in ('hr', 'cad', 'cadence', 'atemp', 'temp'):
+            tabla[f'{{{ns}}}{local_name}'] = LOCAL_NAME_FIELDS[local_name]
+    # GPX sin espacio de nombres
+    tabla.update(LOCAL_NAME_FIELDS)
+    return tabla
+
+
+# Etiqueta completa -> campo de los espacios de nombres conocidos (fija)
+_TAG_FIELDS = _build_tag_table()
+
+# Etiquetas de espacios de nombres desconocidos que se recuerdan ya resueltas.
+# Vienen del archivo subido: la caché está acotada para que un worker de
+# larga duración no acumule las de todos los archivos que procesa.
+UNKNOWN_TAG_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=UNKNOWN_TAG_CACHE_SIZE)
+def _field_for_unknown_tag(tag):
+    local_name = tag.rsplit('}', 1)[-1]
+    field = LOCAL_NAME_FIELDS.get(local_name)
+    # 'ele' y 'time' solo cuentan si son hijos directos del punto GPX;
+    # dentro de extensiones ajenas se ignoran
+    if field in ('elevation', 'time'):
+        field = None
+    return field
+
+
+def _field_for_tag(tag):
+    """Devuelve el campo asociado a una etiqueta (None si no interesa)"""
+    try:
+        return _TAG_FIELDS[tag]
+    except KeyError:
+        return _field_for_unknown_tag(tag)
+
+
+def parse_gpx_time(text):
+    """Convierte una fecha ISO 8601 de GPX en datetime"""
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return date_parser.isoparse(text)
+
+
+_CONVERTERS = {
+    'elevation': float,
+    'time': parse_gpx_time,
+    'heart_rate': lambda text: int(float(text)),
+    'cadence': float,
+    'temperature': float,
+}
+
+
+def _read_point(trkpt):
+    """Extrae los datos de un elemento <trkpt> ya completo"""
+    try:
+        latitude = float(trkpt.get('lat'))
+        longitude = float(trkpt.get('lon'))
+    except (TypeError, ValueError):
+        return None
+
+    values = {}
+    for child in trkpt.iterdescendants():
+        tag = child.tag
+        if not isinstance(tag, str):  # comentarios e instrucciones de proceso
+            continue
+        field = _field_for_tag(tag)
+        if field is None or field in values or child.text is None:
+            continue
+        try:
+            values[field] = _CONVERTERS[field](child.text.strip())
+        except (ValueError, OverflowError):
+            pass
+
+    return TrackPointRecord(latitude=latitude, longitude=longitude, **values)
+
+
+def iter_gpx_points(source):
+    """
+    Recorre un archivo GPX en streaming y produce un TrackPointRecord por punto.
+
+    Args:
+        source: archivo abierto en modo binario (o ruta)
+
+    Yields:
+        TrackPointRecord con speed=None (la velocidad la calcula el llamador)
+    """
+    if not LXML_AVAILABLE:
+        raise Exception("Librería lxml no está instalada. Ejecuta: pip install lxml")
+
+    context = etree.iterparse(
+        source,
+        events=('end',),
+        tag='{*}trkpt',
+        resolve_entities=False,
+        no_network=True,
+        huge_tree=True,
+    )
+
+    for _, element in context:
+        record = _read_point(element)
+
+        # Liberar el elemento y los hermanos anteriores ya procesados
+        element.clear(keep_tail=False)
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+
+        if record is not None:
+            yield record
+
+    del context
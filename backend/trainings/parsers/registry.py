@@ -0,0 +1,237 @@
+"""
+Registro de formatos de archivo de actividad.
+
+Cada formato se describe con un FormatHandler:
+- probe(head): reconoce el formato a partir de los primeros bytes
+  (cabecera FIT, raíz <gpx>, raíz <TrainingCenterDatabase>)
+- open(source): lector en streaming que produce TrackPointRecord y, al
+  terminar, deja en `summary` el resumen que trae el propio archivo con
+  los nombres y unidades de Training
+
+detect_format elige el formato mirando el contenido (y la compresión por
+sus bytes mágicos), de modo que un archivo con la extensión equivocada se
+procesa igual y uno que no es de actividad se rechaza antes de leerlo
+entero. Las extensiones solo sirven para filtrar nombres (subidas por
+fragmentos, entradas de un zip) antes de tener el contenido.
+
+Para añadir un formato basta con definir su FormatHandler y registrarlo
+con register().
+"""
+
+import contextlib
+import re
+
+from .compression import open_decompressed, sniff_compression, split_compression
+from .fit import FIT_AVAILABLE, FITReader, open_fit_source
+from .gpx import LXML_AVAILABLE, iter_gpx_points
+from .tcx import TCXReader
+
+# Bytes que se leen para reconocer el formato
+SNIFF_BYTES = 4096
+
+_XML_SKIP_RE = re.compile(rb'<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>', re.DOTALL)
+_XML_ROOT_RE = re.compile(rb'<(?:[\w.\-]+:)?([\w.\-]+)')
+
+
+def xml_root_name(head):
+    """Nombre local (sin espacio de nombres) del elemento raíz de un XML, o None"""
+    head = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if not head.startswith(b'<'):
+        return None
+    match = _XML_ROOT_RE.search(_XML_SKIP_RE.sub(b'', head))
+    return match.group(1).decode('ascii', 'replace') if match else None
+
+
+class UnsupportedFormatError(ValueError):
+    """El contenido del archivo no corresponde a ningún formato registrado"""
+
+
+def _rewind(source):
+    seekable = getattr(source, 'seekable', None)
+    if seekable is not None and seekable():
+        source.seek(0)
+
+
+class _RecordStream:
+    """Adapta un generador de puntos al interfaz de lector (sin resumen propio)"""
+
+    def __init__(self, records):
+        self.records = records
+        self.summary = {}
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class FormatHandler:
+    """
+    Formato de archivo de actividad.
+
+    Atributos:
+        name: identificador ('gpx', 'tcx', 'fit')
+        label: nombre para mensajes y errores
+        extensions: extensiones asociadas (para filtrar por nombre)
+        has_summary: el archivo trae su propio resumen (vueltas, sesión); si
+            no, todas las métricas se calculan a partir de los puntos
+        compute_speed: la velocidad de cada punto se calcula entre puntos consecutivos
+        require_position: solo se guardan los puntos con latitud y longitud
+        needs_buffer: el lector necesita el contenido completo (no un stream)
+    """
+
+    name = None
+    label = None
+    extensions = ()
+    has_summary = True
+    compute_speed = False
+    require_position = True
+    needs_buffer = False
+    missing_dependency = None
+
+    def available(self):
+        """Indica si están instaladas las librerías que necesita el lector"""
+        return True
+
+    def probe(self, head):
+        """Indica si los primeros bytes del archivo corresponden a este formato"""
+        raise NotImplementedError
+
+    def open(self, source):
+        """
+        Context manager que devuelve el lector del archivo: un iterable de
+        TrackPointRecord con el atributo summary (disponible al terminar).
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<FormatHandler {self.name}>"
+
+
+class GPXHandler(FormatHandler):
+    name = 'gpx'
+    label = 'GPX'
+    extensions = ('.gpx',)
+    has_summary = False
+    compute_speed = True
+    require_position = False
+    missing_dependency = "Librería lxml no está instalada. Ejecuta: pip install lxml"
+
+    def available(self):
+        return LXML_AVAILABLE
+
+    def probe(self, head):
+        return xml_root_name(head) == 'gpx'
+
+    @contextlib.contextmanager
+    def open(self, source):
+        _rewind(source)
+        yield _RecordStream(iter_gpx_points(source))
+
+
+class TCXHandler(FormatHandler):
+    name = 'tcx'
+    label = 'TCX'
+    extensions = ('.tcx',)
+    missing_dependency = "Librería lxml no está instalada. Ejecuta: pip install lxml"
+
+    def available(self):
+        return LXML_AVAILABLE
+
+    def probe(self, head):
+        return xml_root_name(head) == 'TrainingCenterDatabase'
+
+    @contextlib.contextmanager
+    def open(self, source):
+        _rewind(source)
+        yield TCXReader(source)
+
+
+class FITHandler(FormatHandler):
+    name = 'fit'
+    label = 'FIT'
+    extensions = ('.fit',)
+    needs_buffer = True
+
+    def available(self):
+        return FIT_AVAILABLE
+
+    def probe(self, head):
+        # Cabecera de 12 o 14 bytes con la firma '.FIT' en los bytes 8-11
+        return len(head) >= 12 and head[0] in (12, 14) and head[8:12] == b'.FIT'
+
+    @contextlib.contextmanager
+    def open(self, source):
+        with open_fit_source(source) as data:
+            yield FITReader(data)
+
+
+_HANDLERS = []
+
+
+def register(handler):
+    """Registra un formato (se prueba en orden de registro)"""
+    _HANDLERS.append(handler)
+    return handler
+
+
+def handlers():
+    return list(_HANDLERS)
+
+
+def supported_extensions():
+    """Extensiones de todos los formatos registrados"""
+    return tuple(ext for handler in _HANDLERS for ext in handler.extensions)
+
+
+def handler_for_extension(filename):
+    """Formato según la extensión del nombre (sin la de compresión), o None"""
+    base_name = split_compression((filename or '').lower())[0]
+    for handler in _HANDLERS:
+        if base_name.endswith(handler.extensions):
+            return handler
+    return None
+
+
+def sniff(head):
+    """Formato según los primeros bytes del archivo, o None"""
+    for handler in _HANDLERS:
+        if handler.probe(head):
+            return handler
+    return None
+
+
+def _read_head(file):
+    _rewind(file)
+    head = file.read(SNIFF_BYTES)
+    _rewind(file)
+    return head
+
+
+def detect_format(file, filename=None):
+    """
+    Reconoce el formato y la compresión de un archivo leyendo solo su
+    principio (SNIFF_BYTES; si está comprimido, SNIFF_BYTES ya descomprimidos).
+
+    Returns:
+        (FormatHandler, códec de compresión o None)
+
+    Raises:
+        UnsupportedFormatError: si el formato no está soportado
+    """
+    filename = filename or getattr(file, 'name', '') or ''
+    head = _read_head(file)
+
+    codec = sniff_compression(head)
+    if codec:
+        with open_decompressed(file, codec) as stream:
+            head = stream.read(SNIFF_BYTES)
+        _rewind(file)
+
+    handler = sniff(head)
+    if handler is None:
+        raise UnsupportedFormatError(f"Formato no soportado: {filename}")
+    return handler, codec
+
+
+register(GPXHandler())
+register(TCXHandler())
+register(FITHandler())
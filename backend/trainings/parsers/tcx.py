@@ -0,0 +1,207 @@
+"""
+Lector de archivos TCX en una sola pasada basado en lxml.etree.iterparse.
+
+tcxparser vuelve a recorrer el árbol XML completo por cada propiedad
+(distance, avg_hr, trackpoints...). TCXReader recorre el archivo una única
+vez: produce los puntos de ruta en streaming y, mientras tanto, acumula
+los agregados de la sesión que trae el propio archivo (<Lap>).
+
+Los agregados que dependen de cada punto (ritmo cardíaco, cadencia,
+desnivel) se calculan fuera, con trainings.metrics.TrackMetrics.
+
+Uso:
+    reader = TCXReader(archivo)
+    for record in reader:
+        ...
+    reader.distance, reader.calories, ...  # disponibles al terminar
+    reader.summary                          # los mismos, en unidades de Training
+"""
+
+from ..ingestion import TrackPointRecord
+from .gpx import LXML_AVAILABLE, parse_gpx_time
+
+if LXML_AVAILABLE:
+    from lxml import etree
+
+TCX_NS = 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'
+ACTIVITY_EXT_NS = 'http://www.garmin.com/xmlschemas/ActivityExtension/v2'
+
+TRACKPOINT_TAG = f'{{{TCX_NS}}}Trackpoint'
+LAP_TAG = f'{{{TCX_NS}}}Lap'
+ID_TAG = f'{{{TCX_NS}}}Id'
+
+# Etiqueta de un descendiente de <Trackpoint> -> dato del punto
+_TRACKPOINT_FIELDS = {
+    f'{{{TCX_NS}}}Time': 'time',
+    f'{{{TCX_NS}}}LatitudeDegrees': 'latitude',
+    f'{{{TCX_NS}}}LongitudeDegrees': 'longitude',
+    f'{{{TCX_NS}}}AltitudeMeters': 'elevation',
+    f'{{{TCX_NS}}}DistanceMeters': 'distance',
+    f'{{{TCX_NS}}}Value': 'heart_rate',  # Solo aparece dentro de <HeartRateBpm>
+    f'{{{TCX_NS}}}Cadence': 'cadence',
+    f'{{{ACTIVITY_EXT_NS}}}RunCadence': 'cadence',
+    f'{{{ACTIVITY_EXT_NS}}}Speed': 'speed',
+}
+
+# Etiqueta de un hijo directo de <Lap> -> dato de la vuelta
+_LAP_FIELDS = {
+    f'{{{TCX_NS}}}TotalTimeSeconds': 'total_time',
+    f'{{{TCX_NS}}}DistanceMeters': 'distance',
+    f'{{{TCX_NS}}}MaximumSpeed': 'max_speed',
+    f'{{{TCX_NS}}}Calories': 'calories',
+}
+
+_CONVERTERS = {
+    'time': parse_gpx_time,
+    'heart_rate': lambda text: int(float(text)),
+}
+
+
+def _free(element):
+    """Libera un elemento ya leído y los hermanos anteriores"""
+    element.clear(keep_tail=False)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class TCXReader:
+    """
+    Lector TCX de una sola pasada.
+
+    Al iterar produce TrackPointRecord (velocidad en km/h). Una vez
+    consumido expone los agregados de la sesión con los mismos nombres y
+    unidades que tcxparser.TCXParser: started_at, duration (s),
+    distance (m), avg_speed y max_speed (m/s) y calories.
+    """
+
+    def __init__(self, source):
+        if not LXML_AVAILABLE:
+            raise Exception("Librería lxml no está instalada. Ejecuta: pip install lxml")
+
+        self.source = source
+        self.points = 0
+        self.laps = 0
+
+        # Agregados de la sesión
+        self.started_at = None
+        self.duration = None
+        self.distance = None
+        self.avg_speed = None
+        self.max_speed = None
+        self.calories = None
+
+    def __iter__(self):
+        first_time = last_time = None
+        lap_time = lap_distance = 0.0
+        lap_calories = 0
+        max_distance = None
+        max_speed = None
+
+        context = etree.iterparse(
+            self.source,
+            events=('end',),
+            tag=(TRACKPOINT_TAG, LAP_TAG, ID_TAG),
+            resolve_entities=False,
+            no_network=True,
+            huge_tree=True,
+        )
+
+        for _, element in context:
+            tag = element.tag
+
+            if tag == TRACKPOINT_TAG:
+                values = self._read_trackpoint(element)
+                _free(element)
+                self.points += 1
+
+                time = values.get('time')
+                if time is not None:
+                    if first_time is None:
+                        first_time = time
+                    last_time = time
+
+                distance = values.pop('distance', None)
+                if distance is not None and (max_distance is None or distance > max_distance):
+                    max_distance = distance
+
+                speed = values.get('speed')
+                if speed is not None:
+                    max_speed = speed if max_speed is None else max(max_speed, speed)
+                    values['speed'] = speed * 3.6  # Convertir a km/h
+
+                yield TrackPointRecord(**values)
+
+            elif tag == LAP_TAG:
+                self.laps += 1
+                if self.started_at is None and element.get('StartTime'):
+                    self.started_at = parse_gpx_time(element.get('StartTime'))
+
+                for child in element:
+                    field = _LAP_FIELDS.get(child.tag)
+                    if field is None or child.text is None:
+                        continue
+                    try:
+                        value = float(child.text)
+                    except ValueError:
+                        continue
+                    if field == 'total_time':
+                        lap_time += value
+                    elif field == 'distance':
+                        lap_distance += value
+                    elif field == 'calories':
+                        lap_calories += int(value)
+                    elif field == 'max_speed':
+                        max_speed = value if max_speed is None else max(max_speed, value)
+                _free(element)
+
+            elif tag == ID_TAG and self.started_at is None and element.text:
+                try:
+                    self.started_at = parse_gpx_time(element.text.strip())
+                except ValueError:
+                    pass
+
+        del context
+
+        # Agregados finales de la sesión
+        if self.started_at is None:
+            self.started_at = first_time
+
+        if lap_time:
+            self.duration = lap_time
+        elif first_time is not None and last_time is not None:
+            self.duration = (last_time - first_time).total_seconds()
+
+        self.distance = lap_distance or max_distance
+        if self.distance and self.duration:
+            self.avg_speed = self.distance / self.duration
+        self.max_speed = max_speed
+        self.calories = lap_calories or None
+
+    @property
+    def summary(self):
+        """Agregados de la sesión con los nombres y unidades de Training (km, km/h)"""
+        summary = {
+            'start_time': self.started_at,
+            'duration': self.duration,
+            'distance': self.distance / 1000 if self.distance else None,
+            'avg_speed': self.avg_speed * 3.6 if self.avg_speed else None,
+            'max_speed': self.max_speed * 3.6 if self.max_speed else None,
+            'calories': self.calories,
+        }
+        return {key: value for key, value in summary.items() if value}
+
+    @staticmethod
+    def _read_trackpoint(trackpoint):
+        """Extrae los datos de un <Trackpoint> en un único recorrido de sus descendientes"""
+        values = {}
+        for child in trackpoint.iterdescendants():
+            field = _TRACKPOINT_FIELDS.get(child.tag)
+            if field is None or field in values or child.text is None:
+                continue
+            try:
+                values[field] = _CONVERTERS.get(field, float)(child.text.strip())
+            except (ValueError, OverflowError):
+                pass
+        return values
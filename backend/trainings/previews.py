@@ -0,0 +1,306 @@
+"""
+Previsualizaciones de archivos (upload_and_process -> create_from_processed_data).
+
+En la previsualización el archivo se analiza una vez y el resultado
+(resumen del entrenamiento y puntos de ruta en arrays compactos) se guarda
+en un archivo de staging bajo un token de un solo uso. Al confirmar, el
+entrenamiento y sus puntos se crean a partir de ese archivo sin volver a
+leer ni analizar el archivo original.
+
+Los archivos se guardan en TRAINING_PREVIEW_DIR, compartida por todos los
+procesos del servidor (igual que los fragmentos de las subidas), de modo
+que la confirmación puede atenderla un proceso distinto del que hizo la
+previsualización. Están acotados por tiempo de vida
+(TRAINING_PREVIEW_TIMEOUT), tamaño de cada uno (TRAINING_PREVIEW_MAX_BYTES;
+las rutas que no caben solo guardan el resumen) y tamaño total
+(TRAINING_PREVIEW_MAX_TOTAL_BYTES; se eliminan los más antiguos).
+"""
+
+import contextlib
+import datetime
+import logging
+import math
+import os
+import pickle
+import re
+import secrets
+import time as time_module
+import zlib
+from array import array
+
+from django.conf import settings
+
+from .dedup import PARSED_FIELDS
+from .ingestion import TRACKPOINT_FIELDS, TrackPointRecord, get_batch_size
+from .metrics import TrackMetrics
+
+logger = logging.getLogger(__name__)
+
+# Valores por defecto si no se configuran en settings
+DEFAULT_PREVIEW_TIMEOUT = 15 * 60
+DEFAULT_PREVIEW_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_PREVIEW_MAX_TOTAL_BYTES = 256 * 1024 * 1024
+
+# Extensión de los archivos de previsualización
+PREVIEW_SUFFIX = '.preview'
+
+# Tokens generados por store_preview (secrets.token_urlsafe)
+TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{32}$')
+
+NAN = float('nan')
+
+
+def _preview_dir():
+    default = os.path.join(settings.TRAINING_UPLOAD_STAGING_DIR, 'previews')
+    return getattr(settings, 'TRAINING_PREVIEW_DIR', None) or default
+
+
+def _preview_path(token):
+    return os.path.join(_preview_dir(), token + PREVIEW_SUFFIX)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _to_float(value):
+    return NAN if value is None else float(value)
+
+
+def _from_float(value):
+    return None if math.isnan(value) else value
+
+
+class TrackPointCollector:
+    """
+    Destino de puntos con la misma interfaz que TrackPointWriter que, en
+    lugar de escribir en la base de datos, los guarda en arrays compactos
+    (un array de float64 por campo, NaN para los valores vacíos).
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or get_batch_size()
+        self.count = 0
+        self.columns = {name: array('d') for name in TRACKPOINT_FIELDS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add(self, record):
+        columns = self.columns
+        time = record.time
+        if time.tzinfo is None:
+            # Igual que al guardar en la base de datos y en las métricas: sin zona horaria -> UTC
+            time = time.replace(tzinfo=datetime.timezone.utc)
+        columns['time'].append(time.timestamp())
+        for name in TRACKPOINT_FIELDS[1:]:
+            columns[name].append(_to_float(getattr(record, name)))
+        self.count += 1
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        """Nada que volcar: los puntos quedan en memoria"""
+
+    def dump(self):
+        """Serializa los arrays comprimidos (bytes)"""
+        raw = {name: column.tobytes() for name, column in self.columns.items()}
+        return zlib.compress(pickle.dumps(raw, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def iter_preview_records(data):
+    """Reconstruye los TrackPointRecord a partir de los arrays comprimidos"""
+    raw = pickle.loads(zlib.decompress(data))
+    columns = {}
+    for name in TRACKPOINT_FIELDS:
+        column = array('d')
+        column.frombytes(raw[name])
+        columns[name] = column
+
+    utc = datetime.timezone.utc
+    for values in zip(*(columns[name] for name in TRACKPOINT_FIELDS)):
+        time, latitude, longitude, elevation, heart_rate, speed, cadence, temperature = values
+        heart_rate = _from_float(heart_rate)
+        yield TrackPointRecord(
+            time=datetime.datetime.fromtimestamp(time, tz=utc),
+            latitude=latitude,
+            longitude=longitude,
+            elevation=_from_float(elevation),
+            heart_rate=None if heart_rate is None else int(heart_rate),
+            speed=_from_float(speed),
+            cadence=_from_float(cadence),
+            temperature=_from_float(temperature),
+        )
+
+
+def write_preview_points(data, writer):
+    """
+    Escribe los puntos de una previsualización y calcula a la vez su
+    perfil (una sola descompresión, bloques del tamaño de lote del escritor).
+
+    Returns:
+        TrackMetrics con el perfil de la ruta (keep_profile)
+    """
+    metrics = TrackMetrics(keep_profile=True)
+    chunk = []
+    for record in iter_preview_records(data):
+        chunk.append(record)
+        if len(chunk) >= writer.batch_size:
+            metrics.add_records(chunk)
+            writer.extend(chunk)
+            chunk = []
+    if chunk:
+        metrics.add_records(chunk)
+        writer.extend(chunk)
+    return metrics
+
+
+def purge_expired_previews(reserve=0):
+    """
+    Elimina las previsualizaciones caducadas y, si con las que quedan más
+    reserve bytes se supera TRAINING_PREVIEW_MAX_TOTAL_BYTES, las más
+    antiguas.
+
+    Returns:
+        Número de previsualizaciones eliminadas
+    """
+    timeout = getattr(settings, 'TRAINING_PREVIEW_TIMEOUT', DEFAULT_PREVIEW_TIMEOUT)
+    max_total = getattr(settings, 'TRAINING_PREVIEW_MAX_TOTAL_BYTES', DEFAULT_PREVIEW_MAX_TOTAL_BYTES)
+    limite = time_module.time() - timeout
+
+    vigentes = []
+    eliminadas = 0
+    try:
+        entradas = list(os.scandir(_preview_dir()))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        try:
+            info = entrada.stat()
+        except FileNotFoundError:
+            continue
+        if not entrada.name.endswith(PREVIEW_SUFFIX):
+            # Restos de escrituras o confirmaciones interrumpidas
+            if info.st_mtime < limite:
+                _remove(entrada.path)
+            continue
+        if info.st_mtime < limite:
+            _remove(entrada.path)
+            eliminadas += 1
+        else:
+            vigentes.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(size for _, size, _ in vigentes) + reserve
+    for _, size, path in sorted(vigentes):
+        if total <= max_total:
+            break
+        _remove(path)
+        total -= size
+        eliminadas += 1
+
+    if eliminadas:
+        logger.info(f"Eliminadas {eliminadas} previsualizaciones caducadas o sobrantes")
+    return eliminadas
+
+
+def store_preview(user, training, collector, file_hash=None, file_name=None):
+    """
+    Guarda el resultado de una previsualización en su archivo de staging.
+
+    Returns:
+        (token, bool indicando si se han guardado los puntos de ruta)
+    """
+    token = secrets.token_urlsafe(24)
+    points = collector.dump()
+
+    max_bytes = getattr(settings, 'TRAINING_PREVIEW_MAX_BYTES', DEFAULT_PREVIEW_MAX_BYTES)
+    if len(points) > max_bytes:
+        logger.warning(
+            f"Previsualización de {file_name}: {collector.count} puntos ({len(points)} bytes) "
+            f"superan TRAINING_PREVIEW_MAX_BYTES, solo se guarda el resumen"
+        )
+        points = None
+
+    payload = pickle.dumps({
+        'user_id': user.pk,
+        'summary': {field: getattr(training, field) for field in PARSED_FIELDS + ('activity_type', 'title')},
+        'file_hash': file_hash,
+        'file_name': file_name,
+        'point_count': collector.count if points is not None else 0,
+        'points': points,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Dejar sitio antes de escribir (caducadas y, si hace falta, las más antiguas)
+    purge_expired_previews(reserve=len(payload))
+
+    path = _preview_path(token)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporal = f"{path}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(payload)
+    os.replace(temporal, path)
+    return token, points is not None
+
+
+@contextlib.contextmanager
+def claim_preview(user, token):
+    """
+    Reclama una previsualización del usuario mientras dura el bloque.
+
+    El archivo se reclama renombrándolo antes de leerlo, de modo que si
+    llegan dos confirmaciones con el mismo token solo una lo obtiene. Si
+    el bloque termina bien se elimina (es de un solo uso); si termina con
+    una excepción (datos no válidos, error de la base de datos) se devuelve
+    a su sitio y se puede volver a confirmar.
+
+    Yields:
+        dict con summary, file_hash, point_count y points, o None si no
+        existe, ha caducado o pertenece a otro usuario
+    """
+    if not token or not TOKEN_RE.match(token):
+        yield None
+        return
+
+    path = _preview_path(token)
+    reclamado = f"{path}.{os.getpid()}.{secrets.token_hex(4)}.claimed"
+    try:
+        os.rename(path, reclamado)
+    except FileNotFoundError:
+        yield None
+        return
+
+    try:
+        timeout = getattr(settings, 'TRAINING_PREVIEW_TIMEOUT', DEFAULT_PREVIEW_TIMEOUT)
+        if os.path.getmtime(reclamado) < time_module.time() - timeout:
+            _remove(reclamado)
+            payload = None
+        else:
+            with open(reclamado, 'rb') as f:
+                payload = pickle.load(f)
+    except Exception:
+        _remove(reclamado)
+        raise
+
+    if payload is not None and payload['user_id'] != user.pk:
+        # No es suyo: devolverlo para que lo pueda confirmar su usuario
+        os.replace(reclamado, path)
+        payload = None
+
+    if payload is None:
+        yield None
+        return
+
+    try:
+        yield payload
+    except BaseException:
+        os.replace(reclamado, path)
+        raise
+    _remove(reclamado)
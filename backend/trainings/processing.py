@@ -0,0 +1,397 @@
+"""
+Cola de trabajos de procesamiento en base de datos.
+
+Permite sacar el procesamiento de archivos GPX/TCX/FIT de la petición HTTP:
+- enqueue_training_processing: crea el trabajo para un entrenamiento ya guardado
+- claim_job: reserva el siguiente trabajo pendiente (FOR UPDATE SKIP LOCKED)
+- run_job: ejecuta un trabajo reservado y guarda el resultado
+- process_training_file: procesa el archivo guardado de un entrenamiento
+- enqueue_archive_import: importa en segundo plano un zip de entrenamientos
+- enqueue_stats_refresh: recalcula en segundo plano las estadísticas de un usuario
+- schedule_heart_rate_zones: recalcula las zonas de FC de un usuario que
+  ha cambiado sus ajustes (en segundo plano si TRAINING_ASYNC_PROCESSING)
+
+No necesita broker: los trabajos viven en la tabla ProcessingJob y los
+ejecuta el comando run_processing_worker. Para repartir la carga basta
+con arrancar varios procesos del comando.
+"""
+
+import contextlib
+import datetime
+import logging
+import os
+import socket
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from stats.models import UserStats
+
+from .archives import import_archive
+from .dedup import find_duplicate, reuse_processed_result
+from .models import ProcessingJob, TrackPoint
+from .serializers import TrainingSerializer
+from .uploads import compute_file_hash
+from .zones import rebucket_heart_rate_zones
+
+logger = logging.getLogger(__name__)
+
+# Valores por defecto si no se configuran en settings
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_RETRY_DELAY_SECONDS = 30
+
+# Cada cuánto se guarda el progreso de una importación de zip
+PROGRESS_INTERVAL_SECONDS = 2
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def async_processing_enabled():
+    """Indica si los archivos subidos se procesan en segundo plano"""
+    return _setting('TRAINING_ASYNC_PROCESSING', False)
+
+
+def default_worker_name():
+    """Identificador del worker: máquina y PID"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_training_processing(training):
+    """
+    Crea un trabajo pendiente para procesar el archivo del entrenamiento.
+
+    Returns:
+        ProcessingJob creado
+    """
+    job = ProcessingJob.objects.create(
+        user=training.user,
+        training=training,
+        kind=ProcessingJob.KIND_PROCESS_FILE,
+    )
+    logger.info(f"Trabajo {job.id} en cola para el entrenamiento {training.id}")
+    return job
+
+
+def requeue_expired_jobs():
+    """
+    Devuelve a la cola los trabajos cuyo worker dejó de renovar la reserva
+    (proceso terminado a mitad). Los que ya agotaron sus intentos se marcan
+    como fallidos.
+
+    Returns:
+        int: número de trabajos recuperados
+    """
+    now = timezone.now()
+    expired = ProcessingJob.objects.filter(
+        status=ProcessingJob.STATUS_RUNNING,
+        lease_expires_at__lt=now,
+    )
+    max_attempts = _setting('PROCESSING_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+    expired.filter(attempts__gte=max_attempts).update(
+        status=ProcessingJob.STATUS_FAILED,
+        error="El worker dejó de responder y se agotaron los intentos",
+        finished_at=now,
+        lease_expires_at=None,
+    )
+    recovered = expired.filter(attempts__lt=max_attempts).update(
+        status=ProcessingJob.STATUS_PENDING,
+        worker=None,
+        lease_expires_at=None,
+        run_after=now,
+    )
+    if recovered:
+        logger.warning(f"{recovered} trabajos recuperados tras expirar su reserva")
+    return recovered
+
+
+def claim_job(worker=None, kinds=None):
+    """
+    Reserva el siguiente trabajo pendiente para este worker.
+
+    La fila se bloquea con SELECT ... FOR UPDATE SKIP LOCKED: si otro
+    worker está reservando la misma fila, se salta y se toma la siguiente.
+
+    Returns:
+        ProcessingJob reservado o None si no hay trabajos disponibles
+    """
+    now = timezone.now()
+    lease = datetime.timedelta(seconds=_setting('PROCESSING_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+    with transaction.atomic():
+        queryset = ProcessingJob.objects.select_for_update(skip_locked=True).filter(
+            status=ProcessingJob.STATUS_PENDING,
+            run_after__lte=now,
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+
+        job = queryset.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+
+        job.status = ProcessingJob.STATUS_RUNNING
+        job.attempts += 1
+        job.worker = worker or default_worker_name()
+        job.started_at = now
+        job.lease_expires_at = now + lease
+        job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'lease_expires_at'])
+
+    return job
+
+
+def process_training_file(training, reuse_duplicates=False):
+    """
+    Procesa (o vuelve a procesar) el archivo ya guardado de un entrenamiento.
+
+    Los puntos anteriores se borran y los nuevos se guardan en la misma
+    transacción: si el procesamiento falla, el entrenamiento conserva sus
+    datos previos y solo se guarda el error.
+
+    Con reuse_duplicates, si el usuario ya tiene procesado el mismo archivo
+    se copia ese resultado en lugar de analizarlo de nuevo (no se usa al
+    reprocesar a propósito, p. ej. tras corregir un parser).
+    """
+    if not training.gpx_file:
+        raise ValueError(f"El entrenamiento {training.id} no tiene archivo asociado")
+
+    if reuse_duplicates:
+        duplicate = find_duplicate(training.user, training.file_hash, exclude=training)
+        if duplicate is not None:
+            reuse_processed_result(training, duplicate)
+            return
+
+    training.processing_error = None
+    try:
+        with transaction.atomic():
+            TrackPoint.objects.filter(training=training).delete()
+            with training.gpx_file.open('rb') as file:
+                # Entrenamientos anteriores a la deduplicación no tienen hash
+                if not training.file_hash:
+                    training.file_hash = compute_file_hash(file)
+                TrainingSerializer().process_file(training, file)
+    except Exception as e:
+        # La transacción se deshizo: guardar el error fuera de ella
+        training.file_processed = False
+        training.processing_error = training.processing_error or str(e)
+        training.save(update_fields=['file_processed', 'processing_error'])
+        raise
+
+
+def enqueue_archive_import(user, archive_name, activity_type=None):
+    """
+    Crea un trabajo para importar un zip ya guardado en el almacenamiento.
+
+    Returns:
+        ProcessingJob creado
+    """
+    job = ProcessingJob.objects.create(
+        user=user,
+        kind=ProcessingJob.KIND_IMPORT_ARCHIVE,
+        payload={'archive': archive_name, 'activity_type': activity_type},
+    )
+    logger.info(f"Trabajo {job.id} en cola para importar {archive_name}")
+    return job
+
+
+@contextlib.contextmanager
+def _local_archive_path(name):
+    """Ruta local del zip guardado (se descarga a un temporal si el almacenamiento no es local)"""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.zip') as tmp:
+        with default_storage.open(name, 'rb') as source:
+            for chunk in source.chunks():
+                tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+def run_archive_import(job):
+    """
+    Importa el zip de un trabajo. El progreso se guarda en job.result
+    (como mucho cada PROGRESS_INTERVAL_SECONDS) y a la vez se renueva la
+    reserva del trabajo, porque una importación grande puede durar más
+    que PROCESSING_JOB_LEASE_SECONDS.
+    """
+    name = job.payload['archive']
+    lease = datetime.timedelta(seconds=_setting('PROCESSING_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+    ultimo = [0.0]
+
+    def on_result(resultado, hechos, total):
+        ahora = time.monotonic()
+        if hechos < total and ahora - ultimo[0] < PROGRESS_INTERVAL_SECONDS:
+            return
+        ultimo[0] = ahora
+        _update_job(
+            job,
+            result={'total': total, 'procesados': hechos, 'ultimo': resultado['archivo']},
+            lease_expires_at=timezone.now() + lease,
+        )
+
+    try:
+        with _local_archive_path(name) as path:
+            resumen = import_archive(
+                job.user,
+                path,
+                workers=_setting('TRAINING_ARCHIVE_IMPORT_WORKERS', 1),
+                activity_type=job.payload.get('activity_type'),
+                on_result=on_result,
+            )
+    except ValueError:
+        # Zip no válido: no se reintenta, así que no hace falta conservarlo
+        default_storage.delete(name)
+        raise
+
+    _update_job(job, result=resumen)
+    default_storage.delete(name)
+
+
+def enqueue_stats_refresh(user):
+    """
+    Crea un trabajo para recalcular por completo las estadísticas de un
+    usuario, salvo que ya haya uno pendiente o en curso.
+
+    Returns:
+        ProcessingJob creado, o None si ya había uno
+    """
+    pendientes = ProcessingJob.objects.filter(
+        user=user,
+        kind=ProcessingJob.KIND_REFRESH_STATS,
+        status__in=[ProcessingJob.STATUS_PENDING, ProcessingJob.STATUS_RUNNING],
+    )
+    if pendientes.exists():
+        return None
+
+    job = ProcessingJob.objects.create(user=user, kind=ProcessingJob.KIND_REFRESH_STATS)
+    logger.info(f"Trabajo {job.id} en cola para recalcular las estadísticas del usuario {user.pk}")
+    return job
+
+
+def run_stats_refresh(job):
+    """Recalcula por completo las estadísticas del usuario del trabajo"""
+    estadisticas, _ = UserStats.objects.get_or_create(user=job.user)
+    estadisticas.update_stats()
+    _update_job(job, result={'total_trainings': estadisticas.total_trainings})
+
+
+def enqueue_heart_rate_zones(user):
+    """
+    Crea un trabajo para recalcular las zonas de FC de un usuario, salvo
+    que ya haya uno pendiente (si hay uno en curso se crea otro: puede
+    haber empezado con los ajustes anteriores).
+
+    Returns:
+        ProcessingJob creado, o None si ya había uno
+    """
+    pendientes = ProcessingJob.objects.filter(
+        user=user,
+        kind=ProcessingJob.KIND_HEART_RATE_ZONES,
+        status=ProcessingJob.STATUS_PENDING,
+    )
+    if pendientes.exists():
+        return None
+
+    job = ProcessingJob.objects.create(user=user, kind=ProcessingJob.KIND_HEART_RATE_ZONES)
+    logger.info(f"Trabajo {job.id} en cola para recalcular las zonas de FC del usuario {user.pk}")
+    return job
+
+
+def run_heart_rate_zones(job):
+    """Recalcula las zonas de FC de los entrenamientos del usuario del trabajo"""
+    actualizados = rebucket_heart_rate_zones(
+        job.user,
+        batch_size=_setting('HEART_RATE_ZONES_BATCH_SIZE', 200),
+    )
+    _update_job(job, result={'entrenamientos': actualizados})
+
+
+def schedule_heart_rate_zones(user):
+    """
+    Recalcula las zonas de FC de un usuario tras cambiar sus ajustes: en
+    segundo plano si TRAINING_ASYNC_PROCESSING; si no, en el momento.
+    """
+    if async_processing_enabled():
+        enqueue_heart_rate_zones(user)
+    else:
+        rebucket_heart_rate_zones(user, batch_size=_setting('HEART_RATE_ZONES_BATCH_SIZE', 200))
+
+
+# Tipo de trabajo -> función que lo ejecuta
+JOB_HANDLERS = {
+    ProcessingJob.KIND_PROCESS_FILE: lambda job: process_training_file(job.training, reuse_duplicates=True),
+    ProcessingJob.KIND_IMPORT_ARCHIVE: run_archive_import,
+    ProcessingJob.KIND_REFRESH_STATS: run_stats_refresh,
+    ProcessingJob.KIND_HEART_RATE_ZONES: run_heart_rate_zones,
+}
+
+
+def _update_job(job, **fields):
+    """Guarda el estado del trabajo (sin fallar si se borró mientras se ejecutaba)"""
+    for field, value in fields.items():
+        setattr(job, field, value)
+    ProcessingJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def run_job(job):
+    """
+    Ejecuta un trabajo reservado y registra el resultado.
+
+    Si falla y le quedan intentos vuelve a la cola con un retraso
+    creciente; si no, queda como fallido con el error. Los ValueError
+    (formato no soportado, archivo inexistente...) no se reintentan.
+
+    Returns:
+        bool: True si terminó correctamente
+    """
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        now = timezone.now()
+
+        retry = not isinstance(e, ValueError)
+        if retry and job.attempts < _setting('PROCESSING_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS):
+            delay = _setting('PROCESSING_JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY_SECONDS) * job.attempts
+            _update_job(
+                job,
+                status=ProcessingJob.STATUS_PENDING,
+                error=str(e),
+                worker=None,
+                lease_expires_at=None,
+                run_after=now + datetime.timedelta(seconds=delay),
+            )
+            logger.warning(f"Trabajo {job.id} falló (intento {job.attempts}), se reintentará: {e}")
+        else:
+            _update_job(
+                job,
+                status=ProcessingJob.STATUS_FAILED,
+                error=str(e),
+                lease_expires_at=None,
+                finished_at=now,
+            )
+            logger.error(f"Trabajo {job.id} fallido tras {job.attempts} intentos: {e}")
+        return False
+
+    _update_job(
+        job,
+        status=ProcessingJob.STATUS_DONE,
+        error=None,
+        lease_expires_at=None,
+        finished_at=timezone.now(),
+    )
+    logger.info(f"Trabajo {job.id} completado")
+    return True
@@ -2,9 +2,13 @@
 Serializadores mejorados para el modelo de Training con procesamiento robusto de archivos.
 
 Este módulo incluye procesamiento especializado para:
-- Archivos GPX usando gpxpy
-- Archivos TCX usando python-tcxparser
-- Archivos FIT usando fitparse
+- Archivos GPX usando un lector en streaming sobre lxml
+- Archivos TCX usando un lector de una sola pasada sobre lxml
+- Archivos FIT usando un decodificador propio (solo mensajes record/session/lap)
+- Archivos comprimidos con gzip o zstd, descomprimidos en streaming
+- Formato reconocido por el contenido del archivo (parsers.registry)
+- Métricas de la ruta calculadas por bloques con NumPy (TrackMetrics)
+- Mejores esfuerzos (récords por distancia, duración y subida) al procesar
 - Mejor manejo de errores y logging
 
 Autor: Juan Manuel Ordás Periscal
@@ -15,30 +19,28 @@ import logging
 import datetime
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Training, TrackPoint, Goal
+from .models import HR_ZONE_FIELDS, Training, TrackPoint, BestEffort, Goal, ProcessingJob
+from .ingestion import get_track_point_writer
+from .metrics import TrackMetrics
+from .efforts import save_best_efforts
+from .zones import apply_heart_rate_zones
+from .dedup import find_duplicate, reuse_processed_result, reuse_stored_files
+from .uploads import compute_file_hash, upload_max_size
+from stats.updates import batch_stats_updates
 
-# Importar librerías para procesamiento de archivos
-try:
-    import gpxpy
-    import gpxpy.gpx
-    GPX_AVAILABLE = True
-except ImportError:
-    GPX_AVAILABLE = False
-    
-try:
-    from tcxparser import TCXParser
-    TCX_AVAILABLE = True
-except ImportError:
-    TCX_AVAILABLE = False
-
-try:
-    import fitparse
-    FIT_AVAILABLE = True
-except ImportError:
-    FIT_AVAILABLE = False
+# Formatos de archivo soportados (GPX, TCX, FIT) y descompresión
+from .parsers.registry import UnsupportedFormatError, detect_format
+from .parsers.compression import open_decompressed, spool_decompressed
 
 logger = logging.getLogger(__name__)
 
+# Campos del resumen de un archivo (vueltas TCX, sesión FIT) que se copian al entrenamiento
+SUMMARY_FIELDS = (
+    'distance', 'avg_speed', 'max_speed', 'avg_heart_rate', 'max_heart_rate',
+    'elevation_gain', 'calories', 'avg_cadence', 'max_cadence',
+    'avg_temperature', 'max_temperature',
+)
+
 class TrainingSerializer(serializers.ModelSerializer):
     """
     Serializador para entrenamientos con soporte completo de archivos GPX/TCX/FIT.
@@ -47,385 +49,226 @@ class TrainingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Training
         fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at', 'file_processed', 'processing_error')
+        read_only_fields = (
+            'user', 'created_at', 'updated_at', 'file_processed', 'processing_error', 'file_hash',
+            'hr_zones_max_hr', 'load_score',
+        ) + HR_ZONE_FIELDS
+    
+    def validate_gpx_file(self, value):
+        """
+        Rechaza al subirlo un archivo que no es de actividad, mirando solo
+        sus primeros bytes (antes de guardarlo y de leerlo entero).
+        """
+        if value:
+            try:
+                detect_format(value, value.name)
+            except (ValueError, OSError) as e:
+                raise serializers.ValidationError(str(e))
+        return value
     
     def create(self, validated_data):
         """
         Crea un entrenamiento y procesa el archivo GPX/TCX si está presente.
+        
+        Si el usuario ya subió el mismo archivo (mismo hash SHA-256) se
+        reutilizan sus métricas y puntos sin volver a analizarlo. Si el
+        contexto incluye defer_processing, el archivo solo se guarda y su
+        procesamiento queda para un trabajo en segundo plano.
         """
         gpx_file = validated_data.get('gpx_file')
+        duplicate = None
         
-        # Crear el entrenamiento
-        training = Training.objects.create(**validated_data)
-        
-        # Procesar archivo si existe
         if gpx_file:
-            try:
-                filename = gpx_file.name.lower()
-                
-                if filename.endswith('.gpx'):
-                    logger.info(f"Procesando archivo GPX: {filename}")
-                    self.process_gpx_file_improved(training, gpx_file)
-                elif filename.endswith('.tcx'):
-                    logger.info(f"Procesando archivo TCX: {filename}")
-                    self.process_tcx_file_improved(training, gpx_file)
-                elif filename.endswith('.fit'):
-                    logger.info(f"Procesando archivo FIT: {filename}")
-                    self.process_fit_file_improved(training, gpx_file)
-                else:
-                    training.processing_error = f"Formato no soportado: {filename}"
+            validated_data['file_hash'] = compute_file_hash(gpx_file)
+            duplicate = find_duplicate(validated_data.get('user'), validated_data['file_hash'])
+            if duplicate and duplicate.gpx_file and reuse_stored_files():
+                # Apuntar al archivo ya guardado en lugar de almacenar otra copia
+                validated_data['gpx_file'] = duplicate.gpx_file.name
+        
+        # El entrenamiento se guarda varias veces: las estadísticas se
+        # recalculan una sola vez al final
+        with batch_stats_updates():
+            # Crear el entrenamiento
+            training = Training.objects.create(**validated_data)
+            
+            if duplicate:
+                reuse_processed_result(training, duplicate)
+            elif gpx_file and not self.context.get('defer_processing'):
+                # Procesar archivo si existe
+                try:
+                    self.process_file(training, gpx_file)
+                except Exception as e:
+                    training.processing_error = str(e)
                     training.save()
-                    logger.warning(f"Formato no soportado: {filename}")
-                
-            except Exception as e:
-                training.processing_error = str(e)
-                training.save()
-                logger.error(f"Error procesando archivo: {e}")
+                    logger.error(f"Error procesando archivo: {e}")
         
         return training
     
-    def process_gpx_file_improved(self, training, gpx_file):
-        """
-        Procesa archivo GPX y extrae toda la información posible.
+    def process_file(self, training, gpx_file, writer=None, commit=True):
         """
-        if not GPX_AVAILABLE:
-            raise Exception("Librería gpxpy no está instalada. Ejecuta: pip install gpxpy")
+        Procesa el archivo con el lector de su formato.
         
+        El formato y la compresión se reconocen por los primeros bytes del
+        archivo (detect_format), no solo por la extensión. Los archivos
+        comprimidos (gzip, zstd) se descomprimen en streaming mientras el
+        lector los recorre; los lectores que necesitan el contenido completo
+        (FIT) lo reciben en un archivo temporal en disco. En ambos casos se
+        rechaza el archivo si descomprimido supera TRAINING_UPLOAD_MAX_SIZE.
+        
+        Args:
+            writer: destino de los puntos (por defecto, get_track_point_writer)
+            commit: si es False no se guarda el entrenamiento (previsualización)
+        
+        Raises:
+            UnsupportedFormatError: si el formato no está soportado
+        """
         try:
-            # Leer contenido del archivo
-            gpx_content = gpx_file.read()
-            if isinstance(gpx_content, bytes):
-                gpx_content = gpx_content.decode('utf-8')
-            
-            # Parsear GPX
-            gpx = gpxpy.parse(gpx_content)
-            
-            # Variables para cálculos
-            track_points = []
-            total_distance = 0
-            elevations = []
-            speeds = []
-            heart_rates = []
-            cadences = []
-            temperatures = []
-            
-            # Procesar tracks y segments
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    previous_point = None
-                    
-                    for point in segment.points:
-                        # Crear punto de seguimiento
-                        track_point_data = {
-                            'latitude': point.latitude,
-                            'longitude': point.longitude,
-                            'elevation': point.elevation,
-                            'time': point.time,
-                        }
-                        
-                        # Extraer datos adicionales de extensiones
-                        if hasattr(point, 'extensions') and point.extensions:
-                            for extension in point.extensions:
-                                # Ritmo cardíaco
-                                hr_elements = extension.findall('.//{*}hr')
-                                if hr_elements:
-                                    try:
-                                        track_point_data['heart_rate'] = int(hr_elements[0].text)
-                                    except (ValueError, AttributeError):
-                                        pass
-                                
-                                # Cadencia
-                                cadence_elements = extension.findall('.//{*}cad')
-                                if cadence_elements:
-                                    try:
-                                        track_point_data['cadence'] = float(cadence_elements[0].text)
-                                    except (ValueError, AttributeError):
-                                        pass
-                                
-                                # Temperatura
-                                temp_elements = extension.findall('.//{*}atemp')
-                                if temp_elements:
-                                    try:
-                                        track_point_data['temperature'] = float(temp_elements[0].text)
-                                    except (ValueError, AttributeError):
-                                        pass
-                        
-                        # Calcular velocidad si hay punto anterior
-                        if previous_point and point.time and previous_point.time:
-                            try:
-                                distance = point.distance_2d(previous_point)
-                                time_diff = (point.time - previous_point.time).total_seconds()
-                                
-                                if time_diff > 0:
-                                    speed_ms = distance / time_diff
-                                    speed_kmh = speed_ms * 3.6
-                                    track_point_data['speed'] = speed_kmh
-                                    speeds.append(speed_kmh)
-                                    total_distance += distance / 1000  # Convertir a km
-                            except Exception as e:
-                                logger.warning(f"Error calculando velocidad: {e}")
-                        
-                        track_points.append(track_point_data)
-                        
-                        # Recopilar datos para estadísticas
-                        if point.elevation:
-                            elevations.append(point.elevation)
-                        if track_point_data.get('heart_rate'):
-                            heart_rates.append(track_point_data['heart_rate'])
-                        if track_point_data.get('cadence'):
-                            cadences.append(track_point_data['cadence'])
-                        if track_point_data.get('temperature'):
-                            temperatures.append(track_point_data['temperature'])
-                        
-                        previous_point = point
-            
-            # Calcular estadísticas generales
-            if track_points:
-                # Fechas y tiempos
-                times = [tp['time'] for tp in track_points if tp.get('time')]
-                if times:
-                    training.date = times[0].date()
-                    training.start_time = times[0].time()
-                    duration_seconds = (times[-1] - times[0]).total_seconds()
-                    training.duration = datetime.timedelta(seconds=duration_seconds)
-                
-                # Distancia
-                if total_distance > 0:
-                    training.distance = total_distance
-                
-                # Velocidades
-                if speeds:
-                    training.avg_speed = sum(speeds) / len(speeds)
-                    training.max_speed = max(speeds)
-                
-                # Elevación
-                if elevations:
-                    # Calcular ganancia de elevación
-                    elevation_gain = 0
-                    for i in range(1, len(elevations)):
-                        diff = elevations[i] - elevations[i-1]
-                        if diff > 0:
-                            elevation_gain += diff
-                    training.elevation_gain = elevation_gain
-                
-                # Ritmo cardíaco
-                if heart_rates:
-                    training.avg_heart_rate = sum(heart_rates) / len(heart_rates)
-                    training.max_heart_rate = max(heart_rates)
-                
-                # Cadencia
-                if cadences:
-                    training.avg_cadence = sum(cadences) / len(cadences)
-                    training.max_cadence = max(cadences)
-                
-                # Temperatura
-                if temperatures:
-                    training.avg_temperature = sum(temperatures) / len(temperatures)
-                    training.min_temperature = min(temperatures)
-                    training.max_temperature = max(temperatures)
-                
-                # Estimación de calorías (fórmula básica)
-                if training.duration and hasattr(training.user, 'weight') and training.user.weight:
-                    hours = training.duration.total_seconds() / 3600
-                    # Fórmula aproximada basada en MET values
-                    met_value = 8.0 if training.activity_type == 'running' else 6.0
-                    training.calories = int(met_value * training.user.weight * hours)
-            
-            # Guardar puntos de seguimiento
-            for point_data in track_points:
-                if point_data.get('time'):  # Solo guardar puntos con tiempo válido
-                    TrackPoint.objects.create(
-                        training=training,
-                        **point_data
-                    )
-            
-            # Marcar como procesado exitosamente
-            training.file_processed = True
-            training.processing_error = None
-            training.save()
-            
-            logger.info(f"GPX procesado exitosamente: {len(track_points)} puntos, {total_distance:.2f} km")
-            
-        except Exception as e:
-            training.file_processed = False
-            training.processing_error = f"Error procesando GPX: {str(e)}"
-            training.save()
-            logger.error(f"Error procesando GPX: {e}")
+            handler, codec = detect_format(gpx_file, gpx_file.name)
+        except UnsupportedFormatError:
+            logger.warning(f"Formato no soportado: {gpx_file.name}")
             raise
+        
+        if codec:
+            logger.info(f"Procesando archivo {handler.label} comprimido ({codec}): {gpx_file.name}")
+            if handler.needs_buffer:
+                # El lector trabaja sobre el contenido completo: archivo temporal proyectado con mmap
+                with spool_decompressed(gpx_file, codec, max_size=upload_max_size()) as spooled:
+                    return self.process_activity(training, handler, spooled, writer=writer, commit=commit)
+            with open_decompressed(gpx_file, codec, max_size=upload_max_size()) as stream:
+                return self.process_activity(training, handler, stream, writer=writer, commit=commit)
+        
+        logger.info(f"Procesando archivo {handler.label}: {gpx_file.name}")
+        return self.process_activity(training, handler, gpx_file, writer=writer, commit=commit)
     
-    def process_tcx_file_improved(self, training, tcx_file):
+    def process_activity(self, training, handler, source, writer=None, commit=True):
         """
-        Procesa archivo TCX y extrae información.
+        Procesa un archivo de actividad con el lector de su formato.
+        
+        El archivo se lee en streaming: los puntos se guardan por lotes y las
+        estadísticas se calculan bloque a bloque con TrackMetrics, sin
+        mantener la ruta completa en memoria. Si el formato trae su propio
+        resumen (vueltas TCX, sesión FIT) sus valores tienen prioridad y
+        TrackMetrics solo completa los campos vacíos. Al guardar se calculan
+        también el tiempo en cada zona de frecuencia cardíaca
+        (trainings.zones) y los mejores esfuerzos de la ruta
+        (trainings.efforts).
         """
-        if not TCX_AVAILABLE:
-            raise Exception("Librería tcxparser no está instalada. Ejecuta: pip install python-tcx-parser")
+        if not handler.available():
+            raise Exception(handler.missing_dependency)
         
         try:
-            # Leer y parsear TCX
-            tcx_content = tcx_file.read()
-            if isinstance(tcx_content, bytes):
-                tcx_content = tcx_content.decode('utf-8')
-            
-            tcx = TCXParser(tcx_content)
-            
-            # Extraer información básica
-            if tcx.started_at:
-                training.date = tcx.started_at.date()
-                training.start_time = tcx.started_at.time()
-            
-            if tcx.duration:
-                training.duration = datetime.timedelta(seconds=tcx.duration)
-            
-            if tcx.distance:
-                training.distance = tcx.distance / 1000  # Convertir a km
-            
-            if tcx.avg_speed:
-                training.avg_speed = tcx.avg_speed * 3.6  # Convertir a km/h
-            
-            if tcx.max_speed:
-                training.max_speed = tcx.max_speed * 3.6
-            
-            if tcx.avg_hr:
-                training.avg_heart_rate = tcx.avg_hr
-            
-            if tcx.max_hr:
-                training.max_heart_rate = tcx.max_hr
-            
-            if tcx.ascent:
-                training.elevation_gain = tcx.ascent
-            
-            if tcx.calories:
-                training.calories = tcx.calories
-            
-            # Procesar puntos de seguimiento
-            if hasattr(tcx, 'trackpoints') and tcx.trackpoints:
-                for point in tcx.trackpoints:
-                    track_point_data = {
-                        'training': training,
-                        'time': point.time,
-                    }
-                    
-                    if point.latitude:
-                        track_point_data['latitude'] = point.latitude
-                    if point.longitude:
-                        track_point_data['longitude'] = point.longitude
-                    if point.elevation:
-                        track_point_data['elevation'] = point.elevation
-                    if point.hr_value:
-                        track_point_data['heart_rate'] = point.hr_value
-                    if point.speed:
-                        track_point_data['speed'] = point.speed * 3.6  # Convertir a km/h
+            with handler.open(source) as reader, writer or get_track_point_writer(training) as writer:
+                metrics = self._store_track_points(
+                    reader, writer,
+                    compute_speed=handler.compute_speed,
+                    require_position=handler.require_position,
+                    keep_profile=commit,
+                )
+                stats = metrics.result()
+                
+                if handler.has_summary:
+                    self._apply_summary(training, reader.summary)
+                    # Completar con las métricas calculadas a partir de los puntos
+                    self._apply_track_metrics(training, stats, only_missing=True)
+                elif metrics.points:
+                    self._apply_track_metrics(training, stats)
                     
-                    TrackPoint.objects.create(**track_point_data)
-            
-            training.file_processed = True
-            training.processing_error = None
-            training.save()
+                    # Estimación de calorías (fórmula básica)
+                    if training.duration and hasattr(training.user, 'weight') and training.user.weight:
+                        hours = training.duration.total_seconds() / 3600
+                        # Fórmula aproximada basada en MET values
+                        met_value = 8.0 if training.activity_type == 'running' else 6.0
+                        training.calories = int(met_value * training.user.weight * hours)
+                
+                # Marcar como procesado exitosamente
+                training.file_processed = True
+                training.processing_error = None
+                if commit:
+                    perfil = metrics.profile()
+                    apply_heart_rate_zones(training, perfil)
+                    training.save()
+                    save_best_efforts(training, perfil)
             
-            logger.info(f"TCX procesado exitosamente")
+            logger.info(f"{handler.label} procesado exitosamente: {writer.count} puntos, {stats.get('distance') or 0:.2f} km")
             
         except Exception as e:
             training.file_processed = False
-            training.processing_error = f"Error procesando TCX: {str(e)}"
-            training.save()
-            logger.error(f"Error procesando TCX: {e}")
+            training.processing_error = f"Error procesando {handler.label}: {str(e)}"
+            if commit:
+                training.save()
+            logger.error(f"Error procesando {handler.label}: {e}")
             raise
     
-    def process_fit_file_improved(self, training, fit_file):
+    @staticmethod
+    def _apply_summary(training, summary):
+        """Copia al entrenamiento el resumen que trae el propio archivo"""
+        if summary.get('start_time'):
+            training.date = summary['start_time'].date()
+            training.start_time = summary['start_time'].time()
+        
+        if summary.get('duration'):
+            training.duration = datetime.timedelta(seconds=summary['duration'])
+        
+        for field in SUMMARY_FIELDS:
+            if summary.get(field):
+                setattr(training, field, summary[field])
+    
+    def _store_track_points(self, records, writer, compute_speed=False, require_position=False, keep_profile=False):
         """
-        Procesa archivo FIT (Garmin, etc.) y extrae información.
+        Guarda los puntos por bloques del tamaño de lote del escritor y
+        calcula sus métricas con TrackMetrics.
+        
+        Las métricas incluyen todos los puntos leídos; solo se guardan los
+        que tienen tiempo (y posición si require_position).
+        
+        Args:
+            keep_profile: guardar también el perfil de la ruta (mejores esfuerzos)
+        
+        Returns:
+            TrackMetrics con las métricas acumuladas
+        """
+        metrics = TrackMetrics(keep_profile=keep_profile)
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= writer.batch_size:
+                self._store_chunk(chunk, writer, metrics, compute_speed, require_position)
+                chunk = []
+        if chunk:
+            self._store_chunk(chunk, writer, metrics, compute_speed, require_position)
+        return metrics
+    
+    @staticmethod
+    def _store_chunk(chunk, writer, metrics, compute_speed, require_position):
+        speeds = metrics.add_records(chunk)
+        for record, speed in zip(chunk, speeds.tolist()):
+            if record.time is None:
+                continue
+            if require_position and (record.latitude is None or record.longitude is None):
+                continue
+            if compute_speed and speed == speed:  # NaN si no se pudo calcular
+                record = record._replace(speed=speed)
+            writer.add(record)
+    
+    @staticmethod
+    def _apply_track_metrics(training, stats, only_missing=False):
         """
-        if not FIT_AVAILABLE:
-            raise Exception("Librería fitparse no está instalada. Ejecuta: pip install fitparse")
+        Copia al entrenamiento las métricas calculadas por TrackMetrics.
         
-        try:
-            # Parsear archivo FIT
-            fit_file.seek(0)
-            fitfile = fitparse.FitFile(fit_file)
-            
-            # Variables para almacenar datos
-            session_data = {}
-            track_points = []
-            
-            # Procesar mensajes del archivo FIT
-            for record in fitfile.get_messages():
-                # Información de sesión
-                if record.name == 'session':
-                    for record_data in record:
-                        if record_data.name == 'start_time':
-                            session_data['start_time'] = record_data.value
-                        elif record_data.name == 'total_elapsed_time':
-                            session_data['duration'] = record_data.value
-                        elif record_data.name == 'total_distance':
-                            session_data['distance'] = record_data.value / 1000  # Convertir a km
-                        elif record_data.name == 'avg_speed':
-                            session_data['avg_speed'] = record_data.value * 3.6  # Convertir a km/h
-                        elif record_data.name == 'max_speed':
-                            session_data['max_speed'] = record_data.value * 3.6
-                        elif record_data.name == 'avg_heart_rate':
-                            session_data['avg_heart_rate'] = record_data.value
-                        elif record_data.name == 'max_heart_rate':
-                            session_data['max_heart_rate'] = record_data.value
-                        elif record_data.name == 'total_ascent':
-                            session_data['elevation_gain'] = record_data.value
-                        elif record_data.name == 'total_calories':
-                            session_data['calories'] = record_data.value
-                
-                # Puntos de seguimiento
-                elif record.name == 'record':
-                    point_data = {}
-                    for record_data in record:
-                        if record_data.name == 'timestamp':
-                            point_data['time'] = record_data.value
-                        elif record_data.name == 'position_lat':
-                            point_data['latitude'] = record_data.value * (180.0 / 2**31)
-                        elif record_data.name == 'position_long':
-                            point_data['longitude'] = record_data.value * (180.0 / 2**31)
-                        elif record_data.name == 'altitude':
-                            point_data['elevation'] = record_data.value
-                        elif record_data.name == 'heart_rate':
-                            point_data['heart_rate'] = record_data.value
-                        elif record_data.name == 'speed':
-                            point_data['speed'] = record_data.value * 3.6  # Convertir a km/h
-                        elif record_data.name == 'cadence':
-                            point_data['cadence'] = record_data.value
-                        elif record_data.name == 'temperature':
-                            point_data['temperature'] = record_data.value
-                    
-                    if 'time' in point_data:
-                        track_points.append(point_data)
-            
-            # Aplicar datos de sesión al entrenamiento
-            if session_data.get('start_time'):
-                training.date = session_data['start_time'].date()
-                training.start_time = session_data['start_time'].time()
-            
-            if session_data.get('duration'):
-                training.duration = datetime.timedelta(seconds=session_data['duration'])
-            
-            for field in ['distance', 'avg_speed', 'max_speed', 'avg_heart_rate', 'max_heart_rate', 'elevation_gain', 'calories']:
-                if session_data.get(field):
-                    setattr(training, field, session_data[field])
-            
-            # Guardar puntos de seguimiento
-            for point_data in track_points:
-                TrackPoint.objects.create(
-                    training=training,
-                    **point_data
-                )
-            
-            training.file_processed = True
-            training.processing_error = None
-            training.save()
-            
-            logger.info(f"FIT procesado exitosamente: {len(track_points)} puntos")
-            
-        except Exception as e:
-            training.file_processed = False
-            training.processing_error = f"Error procesando FIT: {str(e)}"
-            training.save()
-            logger.error(f"Error procesando FIT: {e}")
-            raise
+        Con only_missing=True solo se rellenan los campos vacíos (p. ej.
+        cuando el archivo ya trae un resumen de sesión).
+        """
+        start = stats.get('start')
+        if start is not None and not (only_missing and training.date and training.start_time):
+            training.date = start.date()
+            training.start_time = start.time()
+        
+        for field, value in stats.items():
+            if field == 'start':
+                continue
+            if only_missing and getattr(training, field):
+                continue
+            setattr(training, field, value)
 
 
 class TrackPointSerializer(serializers.ModelSerializer):
@@ -439,6 +282,24 @@ class TrackPointSerializer(serializers.ModelSerializer):
         read_only_fields = ('training',)
 
 
+class BestEffortSerializer(serializers.ModelSerializer):
+    """
+    Serializador (solo lectura) para los mejores esfuerzos, con los datos
+    básicos del entrenamiento en el que se consiguieron.
+    """
+    
+    effort_display = serializers.CharField(source='get_effort_display', read_only=True)
+    training_title = serializers.CharField(source='training.title', read_only=True)
+    training_date = serializers.DateField(source='training.date', read_only=True)
+    activity_type = serializers.CharField(source='training.activity_type', read_only=True)
+    
+    class Meta:
+        model = BestEffort
+        fields = ('id', 'effort', 'effort_display', 'elapsed_time', 'distance', 'elevation_gain',
+                  'start_offset', 'training', 'training_title', 'training_date', 'activity_type')
+        read_only_fields = fields
+
+
 class GoalSerializer(serializers.ModelSerializer):
     """
     Serializador para objetivos de entrenamiento.
@@ -447,4 +308,18 @@ class GoalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Goal
         fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at')
\ No newline at end of file
+        read_only_fields = ('user', 'created_at', 'updated_at')
+
+
+class ProcessingJobSerializer(serializers.ModelSerializer):
+    """
+    Serializador (solo lectura) para el estado de los trabajos de procesamiento.
+    """
+    
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = ProcessingJob
+        fields = ('id', 'training', 'kind', 'status', 'status_display', 'attempts', 'error',
+                  'result', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
@@ -1,28 +1,55 @@
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from .models import Training
-from stats.models import UserStats
+from .processing import schedule_heart_rate_zones
+from stats.models import STATS_SOURCE_FIELDS
+from stats.updates import schedule_training_change, training_values
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Training)
+def guardar_valores_anteriores(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda en la instancia los valores que tenía el entrenamiento en la base
+    de datos antes de guardarlo, para aplicar solo la diferencia a las
+    estadísticas (y saber si ha cambiado de fecha).
+    """
+    instance._stats_previous = None
+    instance._stats_affected = update_fields is None or bool(set(update_fields) & set(STATS_SOURCE_FIELDS + ('user',)))
+    if instance._state.adding or instance.pk is None or not instance._stats_affected:
+        return
+    instance._stats_previous = Training.objects.filter(pk=instance.pk).values(*STATS_SOURCE_FIELDS).first()
+
 
 @receiver(post_save, sender=Training)
 def actualizar_estadisticas_al_guardar(sender, instance, created, **kwargs):
     """
     Esta función se ejecuta automáticamente cuando se guarda un entrenamiento.
     Sirve para mantener actualizadas las estadísticas del usuario.
+    
+    El recálculo se hace una sola vez al confirmar la transacción, aunque
+    el entrenamiento se guarde varias veces, y solo con la diferencia
+    respecto a los valores anteriores (ver stats.updates).
     """
+    if not getattr(instance, '_stats_affected', True):
+        return
+    
     try:
-        # Obtener o crear estadísticas para este usuario
-        estadisticas, _ = UserStats.objects.get_or_create(user=instance.user)
-        # Actualizar todas las estadísticas
-        estadisticas.update_stats()
+        schedule_training_change(getattr(instance, '_stats_previous', None), training_values(instance))
         
         if created:
-            print(f"Se ha creado un nuevo entrenamiento '{instance.title}' y se han actualizado las estadísticas.")
+            logger.debug(f"Entrenamiento {instance.pk} creado, las estadísticas se actualizarán al confirmar")
         else:
-            print(f"Se ha actualizado el entrenamiento '{instance.title}' y se han recalculado las estadísticas.")
+            logger.debug(f"Entrenamiento {instance.pk} actualizado, las estadísticas se actualizarán al confirmar")
             
     except Exception as e:
         # Si algo falla, lo registramos para poder solucionarlo
-        print(f"ERROR al actualizar estadísticas: {e}")
+        logger.error(f"ERROR al actualizar estadísticas: {e}")
         # Aquí podríamos enviar un email al administrador o hacer algo más
 
 @receiver(post_delete, sender=Training)
@@ -32,12 +59,42 @@ def actualizar_estadisticas_al_eliminar(sender, instance, **kwargs):
     Necesitamos actualizar las estadísticas porque han cambiado los datos.
     """
     try:
-        # Obtener o crear estadísticas para este usuario
-        estadisticas, _ = UserStats.objects.get_or_create(user=instance.user)
-        # Actualizar estadísticas
-        estadisticas.update_stats()
-        print(f"Se ha eliminado el entrenamiento '{instance.title}' y se han actualizado las estadísticas.")
+        schedule_training_change(training_values(instance), None)
+        logger.debug(f"Entrenamiento {instance.pk} eliminado, las estadísticas se actualizarán al confirmar")
         
     except Exception as e:
         # Registramos el error
-        print(f"ERROR al actualizar estadísticas después de eliminar: {e}")
\ No newline at end of file
+        logger.error(f"ERROR al actualizar estadísticas después de eliminar: {e}")
+
+
+# Campos del usuario de los que dependen sus zonas de frecuencia cardíaca
+HR_ZONE_SETTINGS = ('max_heart_rate', 'birth_date')
+
+
+@receiver(pre_save, sender=get_user_model())
+def guardar_ajustes_de_zonas(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda los ajustes de zonas que tenía el usuario antes de guardarlo,
+    para recalcular sus zonas solo si cambian (p. ej. no al iniciar sesión).
+    """
+    instance._hr_zone_settings = None
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(HR_ZONE_SETTINGS):
+        return
+    instance._hr_zone_settings = get_user_model().objects.filter(pk=instance.pk).values_list(*HR_ZONE_SETTINGS).first()
+
+
+@receiver(post_save, sender=get_user_model())
+def recalcular_zonas_al_cambiar_ajustes(sender, instance, created, **kwargs):
+    """
+    Si el usuario cambia su FC máxima o su fecha de nacimiento se vuelven a
+    repartir por zonas sus entrenamientos, en un trabajo por lotes al
+    confirmar la transacción (ver trainings.zones).
+    """
+    anteriores = getattr(instance, '_hr_zone_settings', None)
+    if created or anteriores is None:
+        return
+    if anteriores == tuple(getattr(instance, campo) for campo in HR_ZONE_SETTINGS):
+        return
+    transaction.on_commit(lambda: schedule_heart_rate_zones(instance))
@@ -0,0 +1,354 @@
+"""
+Manejadores de subida que calculan el hash SHA-256 del archivo mientras llega.
+
+Son los mismos manejadores de Django (memoria y archivo temporal) con un
+hash incremental: cada fragmento recibido se añade al hash antes de
+guardarlo, de modo que al terminar la subida el archivo ya trae su huella
+en el atributo content_hash sin volver a leerlo.
+
+Se activan en settings.FILE_UPLOAD_HANDLERS.
+
+También contiene las subidas por fragmentos (UploadSession): cada
+fragmento se copia del cuerpo de la petición al archivo de staging por
+bloques, de modo que la memoria usada por petición queda acotada por el
+tamaño de bloque y no por el del archivo.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.utils import timezone
+
+from .models import UploadSession
+from .parsers.compression import split_compression
+from .parsers.registry import supported_extensions
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque al calcular el hash de un archivo ya guardado
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Tamaño de bloque al copiar un fragmento de la petición al archivo de staging
+COPY_BLOCK_SIZE = 64 * 1024
+
+# Extensiones que se aceptan en las subidas por fragmentos (también comprimidas: .gpx.gz...)
+SUPPORTED_UPLOAD_EXTENSIONS = supported_extensions()
+
+# Valores por defecto si no se configuran en settings
+DEFAULT_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+DEFAULT_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+DEFAULT_UPLOAD_SESSION_TTL = 24 * 60 * 60
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class HashingUploadMixin:
+    """Añade el cálculo incremental de SHA-256 a un manejador de subida"""
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self._sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """Subidas pequeñas en memoria con hash SHA-256"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """Subidas grandes a archivo temporal con hash SHA-256"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def upload_chunk_size():
+    """Tamaño máximo de un fragmento en bytes"""
+    return _setting('TRAINING_UPLOAD_CHUNK_SIZE', DEFAULT_UPLOAD_CHUNK_SIZE)
+
+
+def upload_max_size():
+    """Tamaño máximo de un archivo de actividad en bytes (también ya descomprimido)"""
+    return _setting('TRAINING_UPLOAD_MAX_SIZE', DEFAULT_UPLOAD_MAX_SIZE)
+
+
+def compute_file_hash(file):
+    """
+    Devuelve el hash SHA-256 (hex) de un archivo.
+
+    Si el archivo llegó por uno de los manejadores anteriores se usa el
+    hash ya calculado; si no, se lee por bloques.
+    """
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+
+    sha256 = hashlib.sha256()
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    if hasattr(file, 'chunks'):
+        for chunk in file.chunks(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    else:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return sha256.hexdigest()
+
+
+def hash_path(path):
+    """Hash SHA-256 (hex) de un archivo en disco, leído por bloques"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class UploadOffsetError(ValueError):
+    """El fragmento no empieza donde termina lo ya recibido"""
+
+    def __init__(self, expected):
+        super().__init__(f"El fragmento debe empezar en el byte {expected}")
+        self.expected = expected
+
+
+class StagedUploadFile(File):
+    """
+    Archivo de staging ya completo y verificado.
+
+    Expone temporary_file_path() como los TemporaryUploadedFile de Django,
+    así que FileSystemStorage lo mueve a su destino en lugar de copiarlo, y
+    content_hash para que compute_file_hash no vuelva a leerlo.
+    """
+
+    def __init__(self, path, name, content_hash):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def _normalize_checksum(checksum):
+    checksum = (checksum or '').strip().lower()
+    if checksum and not SHA256_RE.match(checksum):
+        raise ValueError("El checksum debe ser un SHA-256 en hexadecimal")
+    return checksum or None
+
+
+def create_upload_session(user, file_name, total_size, checksum=None, metadata=None):
+    """
+    Abre una subida por fragmentos.
+
+    Raises:
+        ValueError: si el nombre, el tamaño o el checksum no son válidos
+    """
+    file_name = os.path.basename(file_name or '')
+    base_name, _ = split_compression(file_name.lower())
+    if not base_name.endswith(SUPPORTED_UPLOAD_EXTENSIONS):
+        raise ValueError("Formato no soportado. Solo se admiten archivos GPX, TCX y FIT")
+
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise ValueError("El tamaño del archivo debe ser un número de bytes")
+    max_size = upload_max_size()
+    if total_size <= 0 or total_size > max_size:
+        raise ValueError(f"El tamaño del archivo debe estar entre 1 y {max_size} bytes")
+
+    ttl = _setting('TRAINING_UPLOAD_SESSION_TTL', DEFAULT_UPLOAD_SESSION_TTL)
+    session = UploadSession.objects.create(
+        user=user,
+        file_name=file_name,
+        total_size=total_size,
+        checksum=_normalize_checksum(checksum),
+        metadata=metadata or {},
+        expires_at=timezone.now() + datetime.timedelta(seconds=ttl),
+    )
+
+    os.makedirs(os.path.dirname(session.staging_path), exist_ok=True)
+    open(session.staging_path, 'wb').close()
+    logger.info(f"Subida {session.id} iniciada: {file_name} ({total_size} bytes)")
+    return session
+
+
+def _check_open(session):
+    if session.status != UploadSession.STATUS_OPEN:
+        raise ValueError(f"La subida está {session.get_status_display().lower()}")
+    if session.is_expired:
+        raise ValueError("La subida ha caducado")
+
+
+def append_chunk(session, offset, stream, length):
+    """
+    Escribe un fragmento en el archivo de staging a partir de offset.
+
+    El fragmento se copia del stream por bloques de COPY_BLOCK_SIZE. Si la
+    conexión se corta a mitad, los bytes que llegaron cuentan como
+    recibidos y el cliente reanuda desde session.received.
+
+    La sesión debe estar bloqueada (select_for_update) por el llamador para
+    que dos peticiones no escriban a la vez en el mismo archivo.
+
+    Returns:
+        Bytes escritos
+
+    Raises:
+        UploadOffsetError: si offset no coincide con lo ya recibido
+        ValueError: si la subida no admite el fragmento
+    """
+    _check_open(session)
+    if offset != session.received:
+        raise UploadOffsetError(session.received)
+    if length <= 0:
+        raise ValueError("El fragmento está vacío")
+    if length > upload_chunk_size():
+        raise ValueError(f"El fragmento supera el máximo de {upload_chunk_size()} bytes")
+    if offset + length > session.total_size:
+        raise ValueError("El fragmento supera el tamaño declarado del archivo")
+
+    written = 0
+    with open(session.staging_path, 'r+b') as f:
+        # Descartar restos de un fragmento anterior que no llegó a registrarse
+        f.seek(offset)
+        f.truncate()
+        while written < length:
+            block = stream.read(min(COPY_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+
+    session.received = offset + written
+    session.save(update_fields=['received', 'updated_at'])
+    if written < length:
+        logger.warning(f"Subida {session.id}: fragmento incompleto ({written} de {length} bytes)")
+    return written
+
+
+def _restart_upload(session):
+    """Descarta lo recibido (archivo de staging vacío) para que el cliente empiece de nuevo"""
+    os.makedirs(os.path.dirname(session.staging_path), exist_ok=True)
+    open(session.staging_path, 'wb').close()
+    session.received = 0
+    session.save(update_fields=['received', 'updated_at'])
+
+
+def finalize_upload(session, checksum=None):
+    """
+    Comprueba que la subida está completa y su SHA-256 coincide, y la marca
+    como 'finalizing'.
+
+    El checksum puede enviarse al iniciar la subida o al finalizarla; si no
+    coincide (o el archivo de staging ya no existe) se descarta lo recibido
+    para que el cliente empiece de nuevo.
+
+    La sesión debe estar bloqueada por el llamador solo durante esta
+    comprobación: el entrenamiento se crea después, fuera de esa
+    transacción, y la subida se cierra con complete_upload o se vuelve a
+    abrir con reopen_upload.
+
+    Returns:
+        StagedUploadFile listo para asignarlo a Training.gpx_file
+
+    Raises:
+        ValueError: si faltan bytes, el checksum no coincide o se ha perdido el archivo
+    """
+    _check_open(session)
+    if session.received != session.total_size:
+        raise ValueError(f"Subida incompleta: recibidos {session.received} de {session.total_size} bytes")
+
+    expected = _normalize_checksum(checksum) or session.checksum
+    if not expected:
+        raise ValueError("Falta el checksum SHA-256 del archivo")
+
+    try:
+        digest = hash_path(session.staging_path)
+    except FileNotFoundError:
+        logger.warning(f"Subida {session.id}: el archivo de staging no existe, se descarta lo recibido")
+        _restart_upload(session)
+        raise ValueError("No se encuentra el archivo recibido. Vuelva a subirlo")
+
+    if digest != expected:
+        logger.warning(f"Subida {session.id}: checksum incorrecto, se descarta lo recibido")
+        _restart_upload(session)
+        raise ValueError("El checksum no coincide con el archivo recibido. Vuelva a subirlo")
+
+    session.status = UploadSession.STATUS_FINALIZING
+    session.save(update_fields=['status', 'updated_at'])
+    return StagedUploadFile(session.staging_path, session.file_name, digest)
+
+
+def reopen_upload(session):
+    """
+    Vuelve a abrir una subida cuyo entrenamiento no se pudo crear, para
+    poder finalizarla de nuevo. Si el archivo de staging ya no está (el
+    almacenamiento lo movió antes del error) se descarta lo recibido.
+    """
+    session.status = UploadSession.STATUS_OPEN
+    session.save(update_fields=['status', 'updated_at'])
+    if not os.path.exists(session.staging_path):
+        logger.warning(f"Subida {session.id}: el archivo de staging no existe, se descarta lo recibido")
+        _restart_upload(session)
+
+
+def discard_staging_file(session):
+    """Elimina el archivo de staging si sigue existiendo"""
+    try:
+        os.remove(session.staging_path)
+    except FileNotFoundError:
+        pass
+
+
+def complete_upload(session, training):
+    """Marca la subida como completada y elimina lo que quede en staging"""
+    discard_staging_file(session)
+    session.status = UploadSession.STATUS_COMPLETE
+    session.training = training
+    session.save(update_fields=['status', 'training', 'updated_at'])
+
+
+def cancel_upload(session):
+    """Cancela una subida y elimina su archivo de staging"""
+    discard_staging_file(session)
+    session.status = UploadSession.STATUS_CANCELLED
+    session.save(update_fields=['status', 'updated_at'])
+
+
+def purge_expired_uploads():
+    """
+    Elimina las subidas abiertas que han caducado y sus archivos de staging.
+
+    Returns:
+        Número de subidas eliminadas
+    """
+    expired = UploadSession.objects.filter(
+        status__in=(UploadSession.STATUS_OPEN, UploadSession.STATUS_FINALIZING), expires_at__lte=timezone.now()
+    )
+    count = 0
+    for session in expired.iterator():
+        discard_staging_file(session)
+        session.delete()
+        count += 1
+    if count:
+        logger.info(f"Eliminadas {count} subidas caducadas")
+    return count
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TrainingViewSet, GoalViewSet
+from .views import TrainingViewSet, GoalViewSet, ProcessingJobViewSet
 
 router = DefaultRouter()
 router.register(r'trainings', TrainingViewSet, basename='training')
 router.register(r'goals', GoalViewSet, basename='goal')
+router.register(r'processing-jobs', ProcessingJobViewSet, basename='processing-job')
 
 urlpatterns = [
     path('', include(router.urls)),
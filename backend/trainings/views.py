@@ -5,6 +5,9 @@ Este módulo contiene las vistas API que permiten a los usuarios:
 - Crear, ver, editar y eliminar entrenamientos
 - Exportar datos a CSV y PDF
 - Gestionar objetivos de entrenamiento
+- Consultar el estado del procesamiento de archivos en segundo plano
+- Subir archivos grandes por fragmentos (subidas reanudables)
+- Importar de una vez un zip con el historial de actividades
 
 Autor: Juan Manuel Ordás Periscal
 Fecha: Mayo 2025
@@ -13,17 +16,36 @@ Fecha: Mayo 2025
 import io
 import csv
 import logging
+import uuid
+import zipfile
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from django.core.files.storage import default_storage
+from django.db import transaction
 from django.http import HttpResponse
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
-from .models import Training, TrackPoint, Goal
-from .serializers import TrainingSerializer, TrackPointSerializer, GoalSerializer
+from stats.updates import batch_stats_updates
+
+from .models import Training, TrackPoint, Goal, ProcessingJob, UploadSession
+from .serializers import TrainingSerializer, TrackPointSerializer, BestEffortSerializer, GoalSerializer, ProcessingJobSerializer
+from .processing import async_processing_enabled, enqueue_archive_import, enqueue_training_processing
+from .archives import import_archive
+from .dedup import find_duplicate
+from .efforts import save_best_efforts
+from .zones import apply_heart_rate_zones
+from .ingestion import get_track_point_writer
+from .parsers.registry import UnsupportedFormatError
+from .previews import TrackPointCollector, claim_preview, store_preview, write_preview_points
+from .uploads import (
+    UploadOffsetError, append_chunk, cancel_upload, complete_upload, compute_file_hash,
+    create_upload_session, finalize_upload, reopen_upload, upload_chunk_size,
+)
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -87,8 +109,23 @@ class TrainingViewSet(viewsets.ModelViewSet):
             file_extension = gpx_file.name.lower().split('.')[-1]
             logger.debug(f"Tipo de archivo: {file_extension}")
         
+        return self._crear_entrenamiento(request, data, 'gpx_file' in request.FILES)[1]
+    
+    def _crear_entrenamiento(self, request, data, con_archivo):
+        """
+        Valida y guarda un entrenamiento (manual o con archivo) y construye la
+        respuesta de creación. Lo usan create y la finalización de las
+        subidas por fragmentos.
+        
+        Returns:
+            (entrenamiento creado o None si hubo error, Response)
+        """
+        # Con archivo y procesamiento en segundo plano, solo se guarda y se encola
+        diferir = con_archivo and async_processing_enabled()
+        
         # Crear el serializador con los datos
         serializer = self.get_serializer(data=data)
+        serializer.context['defer_processing'] = diferir
         
         try:
             serializer.is_valid(raise_exception=True)
@@ -98,14 +135,36 @@ class TrainingViewSet(viewsets.ModelViewSet):
             self.perform_create(serializer)
             logger.info(f"Entrenamiento creado con ID: {serializer.instance.id}")
             
+            # Mismo archivo que otro entrenamiento del usuario (si ya estaba procesado, se reutilizó)
+            duplicado = find_duplicate(
+                request.user, serializer.instance.file_hash, exclude=serializer.instance, processed=False
+            )
+            
+            if diferir and not serializer.instance.file_processed:
+                job = enqueue_training_processing(serializer.instance)
+                return serializer.instance, Response(
+                    {
+                        "id": serializer.instance.id,
+                        "job_id": job.id,
+                        "status": job.status,
+                        "status_url": reverse('processing-job-detail', args=[job.id], request=request),
+                        "message": "Entrenamiento creado. El archivo se está procesando",
+                        "training": serializer.data,
+                        "file_processed": False,
+                        "duplicate_of": duplicado.id if duplicado else None
+                    },
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
             # Devolver la respuesta con los datos del entrenamiento creado
             headers = self.get_success_headers(serializer.data)
-            return Response(
+            return serializer.instance, Response(
                 {
                     "id": serializer.instance.id,
                     "message": "Entrenamiento creado exitosamente",
                     "training": serializer.data,
-                    "file_processed": serializer.instance.file_processed
+                    "file_processed": serializer.instance.file_processed,
+                    "duplicate_of": duplicado.id if duplicado else None
                 },
                 status=status.HTTP_201_CREATED, 
                 headers=headers
@@ -113,11 +172,215 @@ class TrainingViewSet(viewsets.ModelViewSet):
             
         except Exception as e:
             logger.error(f"Error al crear el entrenamiento: {e}")
-            return Response(
+            return None, Response(
                 {"error": "Error al crear el entrenamiento", "detalle": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    # =========================================================================
+    # SUBIDAS POR FRAGMENTOS (REANUDABLES)
+    # =========================================================================
+    
+    def _get_upload_session(self, upload_id, lock=False):
+        """Subida abierta por el usuario autenticado (o None)"""
+        queryset = UploadSession.objects.filter(user=self.request.user)
+        if lock:
+            queryset = queryset.select_for_update()
+        return queryset.filter(pk=upload_id).first()
+    
+    def _upload_session_data(self, upload_session):
+        """Estado de una subida para las respuestas del protocolo"""
+        return {
+            "upload_id": str(upload_session.id),
+            "file_name": upload_session.file_name,
+            "size": upload_session.total_size,
+            "offset": upload_session.received,
+            "chunk_size": upload_chunk_size(),
+            "status": upload_session.status,
+            "expires_at": upload_session.expires_at,
+            "training": upload_session.training_id,
+        }
+    
+    @action(detail=False, methods=['post'], url_path='uploads')
+    def upload_init(self, request):
+        """
+        Inicia una subida por fragmentos.
+        
+        Campos:
+        - file_name: nombre del archivo (GPX, TCX o FIT)
+        - size: tamaño total en bytes
+        - sha256: hash SHA-256 del archivo (también puede enviarse al finalizar)
+        - resto de campos del entrenamiento (title, activity_type, ...)
+        
+        Después, cada fragmento se envía con PUT a uploads/<upload_id>/
+        con el cuerpo en crudo y la cabecera Upload-Offset (o ?offset=), y
+        la subida se cierra con POST a uploads/<upload_id>/finalize/.
+        """
+        metadata = {
+            key: value for key, value in request.data.items()
+            if key not in ('file_name', 'size', 'sha256', 'user', 'gpx_file')
+        }
+        
+        # Validar los campos del entrenamiento antes de recibir el archivo
+        serializer = self.get_serializer(data=metadata, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            upload_session = create_upload_session(
+                request.user,
+                request.data.get('file_name'),
+                request.data.get('size'),
+                checksum=request.data.get('sha256'),
+                metadata=metadata,
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response_data = self._upload_session_data(upload_session)
+        response_data["upload_url"] = reverse(
+            'training-upload-chunk', args=[upload_session.id], request=request
+        )
+        return Response(response_data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def upload_chunk(self, request, upload_id=None):
+        """
+        Fragmentos de una subida.
+        
+        - GET: estado de la subida (offset desde el que reanudar)
+        - PUT: añade el cuerpo de la petición a partir de Upload-Offset
+        - DELETE: cancela la subida
+        
+        El cuerpo se lee directamente del stream de la petición y se escribe
+        por bloques en el archivo de staging, sin cargar el fragmento en memoria.
+        """
+        if request.method == 'GET':
+            upload_session = self._get_upload_session(upload_id)
+            if upload_session is None:
+                return Response({"error": "Subida no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self._upload_session_data(upload_session))
+        
+        with transaction.atomic():
+            upload_session = self._get_upload_session(upload_id, lock=True)
+            if upload_session is None:
+                return Response({"error": "Subida no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+            
+            if request.method == 'DELETE':
+                cancel_upload(upload_session)
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            
+            try:
+                offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+                length = int(request.headers.get('Content-Length') or 0)
+            except ValueError:
+                return Response(
+                    {"error": "Upload-Offset y Content-Length deben ser números de bytes"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            try:
+                append_chunk(upload_session, offset, request.stream, length)
+            except UploadOffsetError as e:
+                return Response(
+                    {"error": str(e), "offset": e.expected},
+                    status=status.HTTP_409_CONFLICT
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(self._upload_session_data(upload_session))
+    
+    @action(detail=False, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})/finalize')
+    def upload_finalize(self, request, upload_id=None):
+        """
+        Cierra una subida por fragmentos: comprueba tamaño y SHA-256 y crea
+        el entrenamiento igual que create (procesando el archivo o encolándolo).
+        
+        La sesión solo está bloqueada mientras se comprueba el archivo y se
+        marca como 'finalizing'; el entrenamiento se crea fuera de esa
+        transacción. Si no se puede crear, la subida se vuelve a abrir para
+        finalizarla de nuevo.
+        """
+        with transaction.atomic():
+            upload_session = self._get_upload_session(upload_id, lock=True)
+            if upload_session is None:
+                return Response({"error": "Subida no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+            
+            try:
+                staged_file = finalize_upload(upload_session, checksum=request.data.get('sha256'))
+            except ValueError as e:
+                return Response(
+                    {"error": str(e), **self._upload_session_data(upload_session)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        data = dict(upload_session.metadata)
+        data['user'] = request.user.id
+        data['gpx_file'] = staged_file
+        logger.info(f"Subida {upload_session.id} completa: {staged_file.name}, {upload_session.total_size} bytes")
+        
+        training = None
+        try:
+            training, response = self._crear_entrenamiento(request, data, True)
+        finally:
+            staged_file.close()
+            if training is None:
+                reopen_upload(upload_session)
+        
+        if training is not None:
+            complete_upload(upload_session, training)
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import-archive')
+    def import_zip(self, request):
+        """
+        Importa todos los archivos GPX/TCX/FIT de un zip (p. ej. la
+        exportación completa de una plataforma de relojes).
+        
+        Campos:
+        - archive: archivo zip
+        - activity_type: tipo de actividad para todos (opcional)
+        
+        Con el procesamiento en segundo plano activo se devuelve 202 y el
+        progreso y el resultado de cada archivo se consultan en el trabajo
+        (status_url); si no, se importa en la petición y se devuelve el resumen.
+        """
+        archive = request.FILES.get('archive')
+        if archive is None:
+            return Response({"error": "Falta el archivo zip (campo archive)"}, status=status.HTTP_400_BAD_REQUEST)
+        if not zipfile.is_zipfile(archive):
+            return Response({"error": "El archivo no es un zip válido"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        activity_type = request.data.get('activity_type') or None
+        if activity_type and activity_type not in dict(Training.ACTIVITY_CHOICES):
+            return Response({"error": f"Tipo de actividad no válido: {activity_type}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        logger.info(f"Importación de zip para {request.user.username}: {archive.name}, {archive.size} bytes")
+        archive.seek(0)
+        nombre = default_storage.save(f"entrenamientos/importaciones/{uuid.uuid4()}.zip", archive)
+        
+        if async_processing_enabled():
+            job = enqueue_archive_import(request.user, nombre, activity_type)
+            return Response(
+                {
+                    "job_id": job.id,
+                    "status": job.status,
+                    "status_url": reverse('processing-job-detail', args=[job.id], request=request),
+                    "message": "Importación en cola. El progreso se consulta en status_url"
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        try:
+            resumen = import_archive(request.user, default_storage.path(nombre), activity_type=activity_type)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            default_storage.delete(nombre)
+        
+        return Response(resumen, status=status.HTTP_201_CREATED)
+    
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def upload_and_process(self, request):
         """
@@ -137,20 +400,16 @@ class TrainingViewSet(viewsets.ModelViewSet):
             # Crear entrenamiento temporal (no guardado en BD)
             temp_training = Training(user=request.user)
             
-            # Procesar archivo usando la lógica existente
+            # Procesar archivo usando la lógica existente, pero guardando los
+            # puntos en memoria en lugar de en la base de datos
             serializer = TrainingSerializer()
             filename = gpx_file.name.lower()
+            collector = TrackPointCollector()
             
-            if filename.endswith('.gpx'):
-                logger.info(f"Procesando archivo GPX: {filename}")
-                serializer.process_gpx_file_improved(temp_training, gpx_file)
-            elif filename.endswith('.tcx'):
-                logger.info(f"Procesando archivo TCX: {filename}")
-                serializer.process_tcx_file_improved(temp_training, gpx_file)
-            elif filename.endswith('.fit'):
-                logger.info(f"Procesando archivo FIT: {filename}")
-                serializer.process_fit_file_improved(temp_training, gpx_file)
-            else:
+            try:
+                serializer.process_file(temp_training, gpx_file, writer=collector, commit=False)
+            except UnsupportedFormatError:
+                # Los errores al leer un formato reconocido llegan al manejador general con su mensaje
                 return Response(
                     {"error": "Formato no soportado. Solo se admiten archivos GPX, TCX y FIT"},
                     status=status.HTTP_400_BAD_REQUEST
@@ -164,9 +423,17 @@ class TrainingViewSet(viewsets.ModelViewSet):
                 else:
                     temp_training.title = f"{tipo_actividad} - Importado"
             
+            # Guardar el resultado para crear el entrenamiento sin volver a analizar el archivo
+            preview_token, puntos_guardados = store_preview(
+                request.user, temp_training, collector,
+                file_hash=compute_file_hash(gpx_file), file_name=gpx_file.name
+            )
+            
             # Devolver datos extraídos para previsualización
             extracted_data = {
                 "file_processed": True,
+                "preview_token": preview_token,
+                "track_points": collector.count if puntos_guardados else 0,
                 "extracted_data": {
                     "title": temp_training.title,
                     "activity_type": temp_training.activity_type,
@@ -211,6 +478,13 @@ class TrainingViewSet(viewsets.ModelViewSet):
         """
         Crea un entrenamiento final usando datos ya procesados de un archivo.
         Usado después de upload_and_process para confirmar la creación.
+        
+        Si se envía el preview_token de la previsualización, los datos
+        extraídos y los puntos de ruta se toman de ella (los campos
+        enviados tienen prioridad sobre los extraídos). Si el token ya se
+        usó o ha caducado se responde 410 en lugar de crear un
+        entrenamiento sin puntos; si los datos no son válidos o falla la
+        creación, la previsualización se conserva para volver a intentarlo.
         """
         logger.info(f"Creando entrenamiento desde datos procesados para usuario: {request.user.username}")
         
@@ -219,25 +493,56 @@ class TrainingViewSet(viewsets.ModelViewSet):
             data = request.data.copy()
             data['user'] = request.user.id
             
-            # Crear serializador sin archivo (datos ya procesados)
-            serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            
-            # Guardar entrenamiento
-            self.perform_create(serializer)
-            
-            # Marcar como procesado (datos vienen de archivo procesado)
-            training = serializer.instance
-            training.file_processed = True
-            training.save()
-            
-            logger.info(f"Entrenamiento creado desde datos procesados con ID: {training.id}")
+            token = request.data.get('preview_token')
+            data.pop('preview_token', None)
+            # La previsualización solo se consume si el entrenamiento se crea: si no, se conserva
+            with claim_preview(request.user, token) as preview:
+                if token and preview is None:
+                    return Response(
+                        {"error": "La previsualización ha caducado o ya se usó. Vuelva a subir el archivo"},
+                        status=status.HTTP_410_GONE
+                    )
+                if preview:
+                    for field, value in preview['summary'].items():
+                        if data.get(field) in (None, '') and value is not None:
+                            data[field] = value
+                
+                # Crear serializador sin archivo (datos ya procesados)
+                serializer = self.get_serializer(data=data)
+                serializer.is_valid(raise_exception=True)
+                
+                # El entrenamiento se guarda dos veces: las estadísticas se actualizan una sola
+                with batch_stats_updates(), transaction.atomic():
+                    # Guardar entrenamiento
+                    self.perform_create(serializer)
+                    training = serializer.instance
+                    
+                    # Guardar los puntos de ruta de la previsualización
+                    puntos = 0
+                    perfil = None
+                    if preview and preview['points']:
+                        with get_track_point_writer(training) as writer:
+                            metrics = write_preview_points(preview['points'], writer)
+                        puntos = writer.count
+                        perfil = metrics.profile()
+                        apply_heart_rate_zones(training, perfil)
+                    
+                    # Marcar como procesado (datos vienen de archivo procesado)
+                    training.file_processed = True
+                    if preview:
+                        training.file_hash = preview['file_hash']
+                    training.save()
+                    if perfil is not None:
+                        save_best_efforts(training, perfil)
+            
+            logger.info(f"Entrenamiento creado desde datos procesados con ID: {training.id} ({puntos} puntos)")
             
             return Response(
                 {
                     "id": training.id,
                     "message": "Entrenamiento creado exitosamente desde archivo procesado",
-                    "training": serializer.data
+                    "training": serializer.data,
+                    "track_points": puntos
                 },
                 status=status.HTTP_201_CREATED
             )
@@ -277,6 +582,17 @@ class TrainingViewSet(viewsets.ModelViewSet):
         serializer = TrackPointSerializer(puntos, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def best_efforts(self, request, pk=None):
+        """
+        Devuelve los mejores esfuerzos de un entrenamiento (tiempos en
+        distancias estándar, distancias en duraciones estándar y subida
+        más larga), calculados al procesar su archivo.
+        """
+        entrenamiento = self.get_object()
+        esfuerzos = entrenamiento.best_efforts.select_related('training')
+        return Response(BestEffortSerializer(esfuerzos, many=True).data)
+    
     @action(detail=True, methods=['get'])
     def export_csv(self, request, pk=None):
         """
@@ -553,4 +869,17 @@ class GoalViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Error al marcar el objetivo como completado"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class ProcessingJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet de solo lectura para consultar los trabajos de procesamiento
+    del usuario (estado, intentos y error si lo hubo).
+    """
+    serializer_class = ProcessingJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        """Filtrar trabajos por usuario autenticado"""
+        return ProcessingJob.objects.filter(user=self.request.user).order_by('-created_at')
@@ -0,0 +1,280 @@
+"""
+Tiempo en cada zona de frecuencia cardíaca.
+
+Las zonas de un usuario son porcentajes de su frecuencia cardíaca máxima
+(HR_ZONE_LIMITS): la que indica en su perfil (User.max_heart_rate) o, si
+no, la estimada con su edad el día del entrenamiento (220 - edad).
+
+- Al procesar el archivo, apply_heart_rate_zones reparte el tiempo entre
+  puntos consecutivos por zonas con un histograma vectorizado (NumPy) y
+  lo guarda en los campos HR_ZONE_FIELDS del entrenamiento; los
+  resúmenes de actividad lo acumulan como el resto de totales.
+- Si el usuario cambia sus ajustes (FC máxima o fecha de nacimiento),
+  rebucket_heart_rate_zones recalcula por lotes solo los entrenamientos
+  cuya FC máxima ha cambiado (trabajo en segundo plano, ver
+  processing.schedule_heart_rate_zones), junto con su carga
+  (trainings.load). Las muestras se vuelven a leer del archivo guardado
+  con el lector de su formato, como al procesarlo: los puntos guardados
+  no las incluyen todas (TCX y FIT solo guardan los que tienen posición).
+  Sin archivo se usan los puntos guardados, solo si reproducen las zonas
+  actuales; si no, el entrenamiento se deja como está.
+
+La FC máxima usada se guarda en hr_zones_max_hr en todo entrenamiento con
+datos de ritmo cardíaco (muestras o solo el medio, del que depende su
+carga), para no recalcularlo mientras no cambie.
+"""
+
+import contextlib
+import datetime
+import logging
+
+import numpy as np
+from django.db.models import Q
+
+from .ingestion import get_batch_size
+from .metrics import TrackMetrics
+from .models import HR_ZONE_FIELDS, Training, TrackPoint
+from .parsers.compression import open_decompressed, spool_decompressed
+from .parsers.registry import detect_format
+from .uploads import upload_max_size
+
+logger = logging.getLogger(__name__)
+
+# Fracción de la FC máxima a la que empieza cada zona (zona 1 ... zona 5)
+HR_ZONE_LIMITS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+# Intervalo máximo (segundos) entre dos puntos que se cuenta como tiempo en zona (pausas)
+MAX_SAMPLE_GAP_SECONDS = 30
+
+NAN = float('nan')
+
+# Campos que se leen al recalcular las zonas y la carga de un entrenamiento
+REBUCKET_FIELDS = (
+    'id', 'user_id', 'date', 'duration', 'activity_type', 'avg_heart_rate', 'hr_zones_max_hr', 'load_score',
+    'gpx_file',
+) + HR_ZONE_FIELDS
+
+# Diferencia máxima (segundos por zona) para dar por buenos los puntos guardados
+ZONE_MATCH_TOLERANCE = 1.0
+
+
+def max_heart_rate(user, fecha=None):
+    """
+    FC máxima del usuario: la de su perfil o la estimada con su edad en esa
+    fecha (fórmula 220 - edad). None si no hay datos para calcularla.
+    """
+    if user.max_heart_rate:
+        return float(user.max_heart_rate)
+    if user.birth_date:
+        fecha = fecha or datetime.date.today()
+        nacimiento = user.birth_date
+        edad = fecha.year - nacimiento.year - ((fecha.month, fecha.day) < (nacimiento.month, nacimiento.day))
+        return float(220 - edad)
+    return None
+
+
+def zone_bounds(max_hr):
+    """Pulsaciones a las que empieza cada zona"""
+    return np.array(HR_ZONE_LIMITS) * max_hr
+
+
+def time_in_zones(time, hr, max_hr):
+    """
+    Segundos en cada zona de una serie de muestras.
+
+    Cada intervalo entre dos muestras consecutivas se asigna a la zona del
+    ritmo cardíaco de la muestra final (np.bincount con el intervalo como
+    peso); no cuentan los intervalos sin ritmo cardíaco, por debajo de la
+    zona 1 o más largos que MAX_SAMPLE_GAP_SECONDS.
+
+    Returns:
+        ndarray con los segundos de cada zona (5 valores)
+    """
+    if len(time) < 2:
+        return np.zeros(len(HR_ZONE_LIMITS))
+
+    with np.errstate(invalid='ignore'):
+        dt = np.diff(time)
+        pulsaciones = hr[1:]
+        validos = np.isfinite(dt) & (dt > 0) & (dt <= MAX_SAMPLE_GAP_SECONDS) & np.isfinite(pulsaciones)
+        zona = np.searchsorted(zone_bounds(max_hr), pulsaciones[validos], side='right') - 1
+    en_zona = zona >= 0
+    return np.bincount(zona[en_zona], weights=dt[validos][en_zona], minlength=len(HR_ZONE_LIMITS))
+
+
+def apply_heart_rate_zones(training, profile, max_hr=None):
+    """
+    Calcula el tiempo en cada zona de un entrenamiento y lo copia a sus
+    campos (sin guardarlo).
+
+    Args:
+        profile: dict con arrays time y hr (TrackMetrics.profile)
+        max_hr: FC máxima a usar (por defecto, la del usuario en la fecha
+            del entrenamiento)
+    """
+    if max_hr is None:
+        max_hr = max_heart_rate(training.user, training.date)
+
+    tiene_pulso = len(profile['hr']) and np.isfinite(profile['hr']).any()
+    if max_hr is None or not tiene_pulso:
+        segundos = np.zeros(len(HR_ZONE_LIMITS))
+    else:
+        segundos = time_in_zones(profile['time'], profile['hr'], max_hr)
+    # Sin muestras, la FC máxima sigue contando para la carga con el ritmo cardíaco medio
+    training.hr_zones_max_hr = max_hr if tiene_pulso or training.avg_heart_rate else None
+
+    for campo, valor in zip(HR_ZONE_FIELDS, segundos.tolist()):
+        setattr(training, campo, round(valor, 1))
+
+
+def rebucket_heart_rate_zones(user, batch_size=200):
+    """
+    Recalcula las zonas de los entrenamientos del usuario tras cambiar sus
+    ajustes, desde sus archivos (o los puntos de ruta guardados).
+
+    Solo se leen los entrenamientos cuya FC máxima ha cambiado; cada lote
+    lee los puntos que necesita con una consulta y se guarda con
+    bulk_update (también su carga). Al terminar se rehacen una vez los
+    resúmenes del usuario y la serie de carga desde el primer día
+    afectado (bulk_update no pasa por las señales).
+
+    Returns:
+        int: número de entrenamientos actualizados
+    """
+    # Importar aquí para evitar importación circular (stats importa trainings.models)
+    from stats.load import recompute_training_load
+    from stats.rollups import rebuild_summaries
+
+    entrenamientos = Training.objects.filter(user=user).filter(
+        Q(avg_heart_rate__gt=0) | Q(hr_zones_max_hr__isnull=False)
+    ).only(*REBUCKET_FIELDS).order_by('id')
+
+    actualizados = 0
+    primer_dia = None
+    lote = []
+    for training in entrenamientos.iterator(chunk_size=batch_size):
+        if max_heart_rate(user, training.date) != training.hr_zones_max_hr:
+            lote.append(training)
+            if training.date is not None and (primer_dia is None or training.date < primer_dia):
+                primer_dia = training.date
+        if len(lote) >= batch_size:
+            actualizados += _rebucket_batch(user, lote)
+            lote = []
+    if lote:
+        actualizados += _rebucket_batch(user, lote)
+
+    if actualizados:
+        rebuild_summaries([user.pk])
+        if primer_dia is not None:
+            recompute_training_load(user, primer_dia)
+    logger.info(f"Zonas de FC recalculadas para el usuario {user.pk}: {actualizados} entrenamientos")
+    return actualizados
+
+
+def file_profile(training):
+    """
+    Perfil (time, hr) de todas las muestras del archivo del entrenamiento,
+    leído con el lector de su formato como al procesarlo (TrackMetrics).
+
+    Returns:
+        dict como TrackMetrics.profile, o None si no hay archivo o no se
+        puede leer
+    """
+    if not training.gpx_file:
+        return None
+
+    try:
+        with training.gpx_file.open('rb') as archivo, contextlib.ExitStack() as stack:
+            handler, codec = detect_format(archivo, training.gpx_file.name)
+            if not handler.available():
+                return None
+            source = archivo
+            if codec and handler.needs_buffer:
+                source = stack.enter_context(spool_decompressed(archivo, codec, max_size=upload_max_size()))
+            elif codec:
+                source = stack.enter_context(open_decompressed(archivo, codec, max_size=upload_max_size()))
+
+            metrics = TrackMetrics(keep_profile=True)
+            bloque = []
+            batch_size = get_batch_size()
+            for record in stack.enter_context(handler.open(source)):
+                bloque.append(record)
+                if len(bloque) >= batch_size:
+                    metrics.add_records(bloque)
+                    bloque = []
+            if bloque:
+                metrics.add_records(bloque)
+            return metrics.profile()
+    except Exception as e:
+        logger.warning(f"No se pudo leer el archivo del entrenamiento {training.pk}: {e}")
+        return None
+
+
+def _stored_profiles(lote):
+    """Perfil (time, hr) de los puntos guardados de cada entrenamiento del lote, con una sola consulta"""
+    puntos = TrackPoint.objects.filter(
+        training__in=lote,
+    ).order_by('training', 'time').values_list('training_id', 'time', 'heart_rate')
+
+    muestras = {}
+    for training_id, momento, pulso in puntos.iterator(chunk_size=5000):
+        tiempos, pulsos = muestras.setdefault(training_id, ([], []))
+        tiempos.append(momento.timestamp())
+        pulsos.append(NAN if pulso is None else pulso)
+
+    return {
+        training_id: {'time': np.array(tiempos, dtype=np.float64), 'hr': np.array(pulsos, dtype=np.float64)}
+        for training_id, (tiempos, pulsos) in muestras.items()
+    }
+
+
+def _matches_current_zones(training, profile):
+    """
+    Si el perfil reproduce las zonas guardadas con la FC máxima con la que
+    se calcularon (es decir, contiene las mismas muestras que al procesar
+    el archivo).
+    """
+    actuales = np.array([getattr(training, campo) or 0 for campo in HR_ZONE_FIELDS], dtype=np.float64)
+    if training.hr_zones_max_hr is None or not np.isfinite(profile['hr']).any():
+        recalculadas = np.zeros(len(HR_ZONE_FIELDS))
+    else:
+        recalculadas = time_in_zones(profile['time'], profile['hr'], training.hr_zones_max_hr)
+    return np.allclose(recalculadas, actuales, rtol=0, atol=ZONE_MATCH_TOLERANCE)
+
+
+def _rebucket_batch(user, lote):
+    """
+    Recalcula las zonas y la carga de un lote de entrenamientos.
+
+    Las muestras salen del archivo de cada entrenamiento (file_profile);
+    los que no lo tienen usan sus puntos guardados, leídos con una sola
+    consulta, solo si reproducen sus zonas actuales: una previsualización
+    confirmada sin puntos (o solo con los que tienen posición) no tiene
+    todas las muestras, y sus zonas y su FC máxima se dejan como están.
+
+    Returns:
+        int: número de entrenamientos actualizados
+    """
+    # Importar aquí para evitar importación circular (trainings.load importa este módulo)
+    from .load import training_load
+
+    perfiles = {training.pk: file_profile(training) for training in lote}
+    sin_archivo = [training for training in lote if perfiles[training.pk] is None]
+    guardados = _stored_profiles(sin_archivo) if sin_archivo else {}
+
+    vacio = {'time': np.empty(0), 'hr': np.empty(0)}
+    actualizados = []
+    for training in lote:
+        perfil = perfiles[training.pk]
+        if perfil is None:
+            perfil = guardados.get(training.pk, vacio)
+            if not _matches_current_zones(training, perfil):
+                logger.info(f"Entrenamiento {training.pk} sin todas sus muestras, se mantienen sus zonas de FC")
+                continue
+        max_hr = max_heart_rate(user, training.date)
+        apply_heart_rate_zones(training, perfil, max_hr=max_hr)
+        training.load_score = training_load(training, max_hr=max_hr)
+        actualizados.append(training)
+
+    Training.objects.bulk_update(actualizados, HR_ZONE_FIELDS + ('hr_zones_max_hr', 'load_score'))
+    return len(actualizados)
@@ -8,7 +8,7 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'is_staff', 'date_joined')
     fieldsets = (
         (None, {'fields': ('email', 'username', 'password')}),
-        ('Información personal', {'fields': ('first_name', 'last_name', 'height', 'weight', 'birth_date', 'profile_picture')}),
+        ('Información personal', {'fields': ('first_name', 'last_name', 'height', 'weight', 'birth_date', 'max_heart_rate', 'profile_picture')}),
         ('Permisos', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
     )
     add_fieldsets = (
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='max_heart_rate',
+            field=models.PositiveSmallIntegerField(blank=True, db_column='frecuencia_cardíaca_máxima', help_text='Frecuencia cardíaca máxima (ppm); si no se indica se estima con la edad', null=True, verbose_name='Frecuencia cardíaca máxima'),
+        ),
+    ]
@@ -42,6 +42,7 @@ class User(AbstractUser):
     height = models.FloatField(null=True, blank=True, help_text="Altura en cm", verbose_name="Altura", db_column="altura")
     weight = models.FloatField(null=True, blank=True, help_text="Peso en kg", verbose_name="Peso", db_column="peso")
     birth_date = models.DateField(null=True, blank=True, verbose_name="Fecha de nacimiento", db_column="fecha_de_nacimiento")
+    max_heart_rate = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Frecuencia cardíaca máxima (ppm); si no se indica se estima con la edad", verbose_name="Frecuencia cardíaca máxima", db_column="frecuencia_cardíaca_máxima")
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True, verbose_name="Foto de perfil", db_column="foto_de_perfil")
     
     # Configuración de autenticación
@@ -33,7 +33,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'id', 'email', 'username', 'password', 'first_name', 'last_name', 
-            'height', 'weight', 'birth_date', 'profile_picture', 'date_joined',
+            'height', 'weight', 'birth_date', 'max_heart_rate', 'profile_picture', 'date_joined',
             'is_active'
         ]
         read_only_fields = ['id', 'date_joined']
@@ -43,6 +43,7 @@ class UserSerializer(serializers.ModelSerializer):
             'height': {'required': False, 'allow_null': True},
             'weight': {'required': False, 'allow_null': True},
             'birth_date': {'required': False, 'allow_null': True},
+            'max_heart_rate': {'required': False, 'allow_null': True},
             'first_name': {'required': False, 'allow_blank': True},
             'last_name': {'required': False, 'allow_blank': True},
         }
@@ -235,7 +236,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'id', 'email', 'username', 'password', 'first_name', 'last_name', 
-            'height', 'weight', 'birth_date', 'profile_picture', 'date_joined',
+            'height', 'weight', 'birth_date', 'max_heart_rate', 'profile_picture', 'date_joined',
             'is_active'
         ]
         read_only_fields = ['id', 'email', 'username', 'date_joined']
@@ -253,6 +254,11 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'birth_date': {
                 'help_text': 'Fecha de nacimiento (YYYY-MM-DD)'
             },
+            'max_heart_rate': {
+                'help_text': 'Frecuencia cardíaca máxima (ppm); si no se indica se estima con la edad',
+                'min_value': 100,
+                'max_value': 240
+            },
         }
     
     def validate_height(self, value):
@@ -271,6 +277,14 @@ class UserProfileSerializer(serializers.ModelSerializer):
             )
         return value
     
+    def validate_max_heart_rate(self, value):
+        """Valida que la frecuencia cardíaca máxima esté en un rango razonable"""
+        if value is not None and (value < 100 or value > 240):
+            raise serializers.ValidationError(
+                "La frecuencia cardíaca máxima debe estar entre 100 y 240 ppm."
+            )
+        return value
+    
     def validate_password(self, value):
         """Valida la nueva contraseña si se proporciona"""
         if value: